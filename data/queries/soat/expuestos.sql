@@ -280,7 +280,17 @@ CREATE MULTISET VOLATILE TABLE expuestos AS
                 , COALESCE(vpc.fecha_cancelacion, (DATE '3000-01-01'))
             ) AS fecha_fin
             , SUM(
-                CAST(fecha_fin - fecha_inicio + 1 AS FLOAT)
+                CAST(
+                    LEAST(
+                        vpc.fecha_exclusion_cobertura
+                        , fechas.ultimo_dia_mes
+                        , COALESCE(vpc.fecha_cancelacion, (DATE '3000-01-01'))
+                    )
+                    - GREATEST(
+                        vpc.fecha_inclusion_cobertura, fechas.primer_dia_mes
+                    )
+                    + 1 AS FLOAT
+                )
                 / fechas.num_dias_mes
             ) AS expuestos
             , SUM(1) AS vigentes
@@ -0,0 +1,43 @@
+import argparse
+import sys
+
+import polars as pl
+from src.logger_config import logger
+from tests.benchmarks import suite
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Mide tiempo y memoria de las etapas principales con datos "
+            "sinteticos y reporta regresiones frente al ultimo commit medido."
+        )
+    )
+    parser.add_argument(
+        "--escalas", type=float, nargs="+", default=[1], help="Ej: 1 10 100"
+    )
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--casos", nargs="+", help="Solo corre estos casos")
+    parser.add_argument(
+        "--umbral",
+        type=float,
+        default=0.2,
+        help="Aumento relativo a partir del cual se reporta una regresion",
+    )
+    args = parser.parse_args()
+
+    @logger.catch
+    def main() -> bool:
+        actuales = suite.correr_suite(
+            args.escalas, args.repeticiones, args.semilla, args.casos
+        )
+        reporte = suite.reporte_regresiones(
+            suite.leer_resultados(), actuales, args.umbral
+        )
+        suite.guardar_resultados(actuales)
+
+        with pl.Config(tbl_rows=-1, tbl_width_chars=200):
+            print(reporte)
+        return reporte.filter(pl.col("estado") == "regresion").is_empty()
+
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,20 @@
+import argparse
+
+from src.logger_config import logger
+from src.lotes import correr_lote
+from src.models import Lote
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Corre en paralelo varios trabajos (negocio, mes de corte)."
+    )
+    parser.add_argument("archivo", help="JSON con la definicion del lote")
+    args = parser.parse_args()
+
+    @logger.catch
+    def main(archivo: str):
+        with open(archivo) as f:
+            lote = Lote.model_validate_json(f.read())
+        print(correr_lote(lote))
+
+    main(args.archivo)
@@ -0,0 +1,39 @@
+import argparse
+
+import polars as pl
+from src import perfiles
+from src.logger_config import logger
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Muestra los nodos mas lentos de las consultas de polars perfiladas "
+            "con PERFILAR_CONSULTAS activo."
+        )
+    )
+    parser.add_argument(
+        "--corrida",
+        help="Carpeta de la corrida en logs/perfiles (por defecto la ultima)",
+    )
+    parser.add_argument("--nodos", type=int, default=20, help="Numero de nodos")
+    parser.add_argument(
+        "--plan", help="Muestra el plan optimizado de la consulta indicada"
+    )
+    args = parser.parse_args()
+
+    @logger.catch
+    def main(corrida: str | None, num_nodos: int, consulta: str | None):
+        corridas = perfiles.listar_corridas()
+        if not corridas:
+            logger.warning(f"No hay perfiles guardados en {perfiles.RUTA_PERFILES}.")
+            return
+
+        df = perfiles.leer_perfiles(corrida or corridas[-1])
+        if consulta is not None:
+            print(df.filter(pl.col("consulta") == consulta).get_column("plan")[0])
+            return
+
+        with pl.Config(tbl_rows=num_nodos, fmt_str_lengths=80, tbl_width_chars=200):
+            print(perfiles.nodos_mas_lentos(df, num_nodos))
+
+    main(args.corrida, args.nodos, args.plan)
@@ -1,9 +1,11 @@
+import asyncio
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
-from typing import Annotated
+from typing import Annotated, Any
 from uuid import uuid4
 
-from fastapi import Cookie, Depends, FastAPI, Form, Request
+import polars as pl
+from fastapi import Cookie, Depends, FastAPI, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
@@ -13,16 +15,11 @@ from sqlmodel import Session, SQLModel, create_engine, select
 from sse_starlette.sse import EventSourceResponse
 
 from src import constantes as ct
-from src import main, utils
-from src.logger_config import log_queue, logger
-from src.metodos_plantilla import abrir, generar, preparar, resultados
-from src.metodos_plantilla import almacenar_analisis as almacenar
-from src.metodos_plantilla.guardar_traer import (
-    guardar_apertura,
-    traer_apertura,
-    traer_guardar_todo,
-)
-from src.models import ModosPlantilla, Parametros
+from src import espacio_trabajo as et
+from src import etapas, lotes, main, metricas, tareas, utils
+from src.logger_config import difusor_logs, logger
+from src.metodos_plantilla import resultados
+from src.models import Lote, ModosPlantilla, Parametros, Tarea
 
 engine = create_engine(
     "sqlite:///data/database.db", connect_args={"check_same_thread": False}
@@ -76,16 +73,30 @@ async def generar_base(request: Request):
     return templates.TemplateResponse(request, "index.html")
 
 
+def formatear_log(registro: dict[str, str]) -> str:
+    color_log = ct.COLORES_LOGS[registro["nivel"]]
+    texto = f"{registro['fecha_hora']} | {registro['nivel']} | {registro['mensaje']}"
+    return f"""<span style="color: {color_log}">{texto}</span><br>"""
+
+
 async def obtener_logs(request: Request) -> AsyncIterator[str]:
-    while True:
-        if await request.is_disconnected():
-            break
-        message = await log_queue.get()
-        nivel_log = message.record["level"].name
-        color_log = ct.COLORES_LOGS[nivel_log]
-        fecha_hora = message.record["time"].strftime("%Y-%m-%d %H:%M:%S")
-        texto = f"{fecha_hora} | {nivel_log} | {message.record['message']}"
-        yield f"""<span style="color: {color_log}">{texto}</span><br>"""
+    cliente = difusor_logs.suscribir(asyncio.get_running_loop())
+    try:
+        while not await request.is_disconnected():
+            registros, descartados = await cliente.siguiente_lote()
+            if descartados:
+                registros.insert(
+                    0,
+                    {
+                        "nivel": "WARNING",
+                        "fecha_hora": "",
+                        "mensaje": f"Se omitieron {descartados} mensajes.",
+                    },
+                )
+            if registros:
+                yield "".join(formatear_log(registro) for registro in registros)
+    finally:
+        difusor_logs.desuscribir(cliente)
 
 
 @app.get("/stream-logs")
@@ -184,9 +195,14 @@ async def correr_query_expuestos(
 @app.post("/generar-controles")
 async def generar_controles(
     session: SessionDep, session_id: Annotated[str | None, Cookie()] = None
-) -> None:
+) -> Tarea:
     params = obtener_parametros_usuario(session, session_id)
-    await main.generar_controles(params)
+    return tareas.gestor.enviar(
+        "generar_controles",
+        tareas.llave_tarea("generar_controles", params),
+        main.generar_controles,
+        params,
+    )
 
 
 @app.get("/generar-aperturas")
@@ -207,19 +223,29 @@ async def generar_aperturas(
 @app.post("/abrir-plantilla")
 async def abrir_plantilla(
     session: SessionDep, session_id: Annotated[str | None, Cookie()] = None
-) -> None:
+) -> Tarea:
     p = obtener_parametros_usuario(session, session_id)
-    _ = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
+    return tareas.gestor.enviar(
+        "abrir_plantilla",
+        tareas.llave_tarea("abrir_plantilla", p),
+        main.abrir_plantilla,
+        p,
+        com=True,
+    )
 
 
 @app.post("/preparar-plantilla")
 async def preparar_plantilla(
     session: SessionDep, session_id: Annotated[str | None, Cookie()] = None
-) -> None:
+) -> Tarea:
     p = obtener_parametros_usuario(session, session_id)
-    main.generar_bases_plantilla(p)
-    wb = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
-    preparar.preparar_plantilla(wb, p.mes_corte, p.tipo_analisis, p.negocio)
+    return tareas.gestor.enviar(
+        "preparar_plantilla",
+        tareas.llave_tarea("preparar_plantilla", p),
+        main.preparar_plantilla,
+        p,
+        com=True,
+    )
 
 
 @app.post("/modos-plantilla")
@@ -227,40 +253,107 @@ async def modos_plantilla(
     modos: Annotated[ModosPlantilla, Form()],
     session: SessionDep,
     session_id: Annotated[str | None, Cookie()] = None,
-) -> None:
+) -> Tarea:
     p = obtener_parametros_usuario(session, session_id)
-    wb = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
+    return tareas.gestor.enviar(
+        f"modos_plantilla_{modos.modo}",
+        tareas.llave_tarea("modos_plantilla", p, modos),
+        main.modos_plantilla,
+        p,
+        modos,
+        com=True,
+    )
 
-    if modos.modo == "generar":
-        if modos.plantilla == "severidad":
-            modos_frec = modos.model_copy(update={"plantilla": "frecuencia"})
-            generar.generar_plantilla(
-                wb, p.negocio, modos_frec, p.mes_corte, solo_triangulo=True
-            )
-        generar.generar_plantilla(wb, p.negocio, modos, p.mes_corte)
-    elif modos.modo == "guardar":
-        guardar_apertura.guardar_apertura(wb, modos)
-    elif modos.modo == "traer":
-        traer_apertura.traer_apertura(wb, modos)
-    elif modos.modo in ("traer_guardar_todo", "guardar_todo"):
-        traer = True if modos.modo == "traer_guardar_todo" else False
-        await traer_guardar_todo.traer_y_guardar_todas_las_aperturas(
-            wb, modos, p.mes_corte, p.negocio, traer
-        )
+
+@app.get("/traza-etapas")
+async def traza_etapas(
+    session: SessionDep, session_id: Annotated[str | None, Cookie()] = None
+) -> list[dict[str, Any]]:
+    p = obtener_parametros_usuario(session, session_id)
+    with et.usar_espacio(p):
+        return etapas.leer_traza().to_dicts()
+
+
+@app.get("/metricas")
+async def obtener_metricas(
+    etapa: str | None = None, resumen: bool = False, limite: int = 1000
+) -> list[dict[str, Any]]:
+    df = metricas.leer_metricas()
+    if etapa is not None:
+        df = df.filter(pl.col("etapa") == etapa)
+    if resumen:
+        return metricas.resumir_metricas(df).to_dicts()
+    return df.sort("fecha", descending=True).head(limite).to_dicts()
 
 
 @app.post("/almacenar-analisis")
 async def almacenar_analisis(
     session: SessionDep, session_id: Annotated[str | None, Cookie()] = None
-) -> None:
+) -> Tarea:
     p = obtener_parametros_usuario(session, session_id)
-    wb = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
-    almacenar.almacenar_analisis(wb, p.nombre_plantilla, p.mes_corte)
+    return tareas.gestor.enviar(
+        "almacenar_analisis",
+        tareas.llave_tarea("almacenar_analisis", p),
+        main.almacenar_analisis,
+        p,
+        com=True,
+    )
 
 
 @app.post("/actualizar-wb-resultados")
-async def actualizar_wb_resultados() -> None:
-    _ = resultados.actualizar_wb_resultados()
+async def actualizar_wb_resultados(incremental: bool = True) -> Tarea:
+    return tareas.gestor.enviar(
+        "actualizar_wb_resultados",
+        f"actualizar_wb_resultados_{incremental}",
+        main.actualizar_wb_resultados,
+        incremental,
+        com=True,
+    )
+
+
+@app.post("/correr-lote")
+async def correr_lote(lote: Lote) -> Tarea:
+    return tareas.gestor.enviar(
+        "correr_lote",
+        tareas.llave_tarea("correr_lote", lote),
+        lambda: lotes.correr_lote(lote).to_dicts(),
+    )
+
+
+@app.get("/tareas")
+async def listar_tareas() -> list[Tarea]:
+    return list(tareas.gestor.tareas.values())
+
+
+@app.get("/tareas/{id_tarea}")
+async def estado_tarea(id_tarea: str) -> Tarea:
+    return obtener_tarea(id_tarea)
+
+
+@app.post("/tareas/{id_tarea}/cancelar")
+async def cancelar_tarea(id_tarea: str) -> Tarea:
+    obtener_tarea(id_tarea)
+    return tareas.gestor.cancelar(id_tarea)
+
+
+@app.get("/tareas/{id_tarea}/resultado")
+async def resultado_tarea(id_tarea: str) -> Any:
+    tarea = obtener_tarea(id_tarea)
+    if tarea.estado != "completada":
+        raise HTTPException(
+            status_code=409,
+            detail=f"La tarea {id_tarea} no ha terminado (estado: {tarea.estado}).",
+        )
+    return tarea.resultado
+
+
+def obtener_tarea(id_tarea: str) -> Tarea:
+    try:
+        return tareas.gestor.obtener(id_tarea)
+    except KeyError:
+        raise HTTPException(
+            status_code=404, detail=f"No existe la tarea {id_tarea}."
+        ) from None
 
 
 @app.post("/generar-informe-ar")
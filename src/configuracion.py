@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -15,6 +16,41 @@ class Configuracion(BaseSettings):
     teradata_host: str = Field(alias="TERADATA_HOST")
     teradata_user: str = Field(alias="TERADATA_USER")
     teradata_password: str = Field(alias="TERADATA_PASSWORD")
+    # "local" ejecuta las queries sobre tablas DuckDB, sin conexion a Teradata
+    teradata_backend: Literal["teradata", "local"] = Field(
+        default="teradata", alias="TERADATA_BACKEND"
+    )
+    teradata_local_ruta: str = Field(
+        default="data/teradata_local", alias="TERADATA_LOCAL_RUTA"
+    )
+
+    ejecutor_tipo: Literal["proceso", "hilo"] = Field(
+        default="proceso", alias="EJECUTOR_TIPO"
+    )
+    ejecutor_max_trabajadores: int = Field(
+        default=2, ge=1, alias="EJECUTOR_MAX_TRABAJADORES"
+    )
+
+    espacios_aislados: bool = Field(default=False, alias="ESPACIOS_AISLADOS")
+
+    # Diferencia relativa entre SAP y Teradata a partir de la cual se alerta,
+    # con umbrales opcionales por cantidad, ej: {"aviso_retenido": 0.1}
+    umbral_diferencia_sap: float = Field(
+        default=0.05, ge=0, alias="UMBRAL_DIFERENCIA_SAP"
+    )
+    umbrales_diferencia_sap: dict[str, float] = Field(
+        default={}, alias="UMBRALES_DIFERENCIA_SAP"
+    )
+
+    consistencia_historica_excel: bool = Field(
+        default=True, alias="CONSISTENCIA_HISTORICA_EXCEL"
+    )
+
+    adds_segmentacion_excel: bool = Field(default=True, alias="ADDS_SEGMENTACION_EXCEL")
+
+    versiones_raw_csv: bool = Field(default=True, alias="VERSIONES_RAW_CSV")
+
+    perfilar_consultas: bool = Field(default=False, alias="PERFILAR_CONSULTAS")
 
 
 configuracion = Configuracion()
@@ -76,6 +76,7 @@ FILA_INI_PARAMS = 4
 
 LISTA_QUERIES_CUADRE = Literal["siniestros", "primas"]
 LISTA_QUERIES = Literal["siniestros", "primas", "expuestos"]
+VERSIONES_RAW = Literal["raw", "pre_cuadre", "post_cuadre", "post_fraude"]
 LISTA_PLANTILLAS = Literal["frecuencia", "severidad", "plata", "completar_diagonal"]
 
 
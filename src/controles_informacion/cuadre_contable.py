@@ -1,7 +1,9 @@
+import asyncio
+
 import polars as pl
 
 from src import constantes as ct
-from src import utils
+from src import ejecucion, metricas, perfiles, utils, versiones_raw
 from src.logger_config import logger
 
 
@@ -10,7 +12,28 @@ async def realizar_cuadre_contable(
     file: ct.LISTA_QUERIES_CUADRE,
     base: pl.DataFrame,
     dif_sap_vs_tera: pl.DataFrame,
-) -> pl.DataFrame:
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    base_cuadrada, cambios, diferencias = await ejecucion.ejecutor.correr(
+        cuadrar_base, negocio, file, base, dif_sap_vs_tera
+    )
+
+    await asyncio.to_thread(guardar_archivos, file, cambios)
+    logger.success(f"Cuadre contable para {file} realizado exitosamente.")
+
+    return base_cuadrada, diferencias
+
+
+@metricas.instrumentar()
+def cuadrar_base(
+    negocio: str,
+    file: ct.LISTA_QUERIES_CUADRE,
+    base: pl.DataFrame,
+    dif_sap_vs_tera: pl.DataFrame,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """Devuelve la base cuadrada, las filas que cambiaron y las diferencias
+    que se le agregaron, con las que se actualizan los controles sin volver a
+    agrupar la base.
+    """
     if negocio == "soat":
         dif_sap_vs_tera = dif_sap_vs_tera.filter(
             pl.col("fecha_registro") == pl.col("fecha_registro").max()
@@ -24,12 +47,8 @@ async def realizar_cuadre_contable(
         .select(base.collect_schema().names())
     )
 
-    base_cuadrada = agregar_diferencias(base, diferencias)
-
-    await guardar_archivos(file, base_cuadrada)
-    logger.success(f"Cuadre contable para {file} realizado exitosamente.")
-
-    return base_cuadrada
+    cambios = versiones_raw.calcular_cambios(base, diferencias)
+    return versiones_raw.aplicar_cambios(base, cambios), cambios, diferencias
 
 
 def obtener_aperturas_para_asignar_diferencia(
@@ -94,7 +113,7 @@ def repartir_diferencias(
         .with_columns(
             [pl.col(col) * pl.col(f"peso_{col}") for col in columnas_cantidades]
         )
-        .collect()
+        .pipe(perfiles.recolectar)
     )
 
 
@@ -112,18 +131,5 @@ def agregar_columnas_faltantes(
     return diferencias
 
 
-def agregar_diferencias(df: pl.DataFrame, diferencias: pl.DataFrame) -> pl.DataFrame:
-    columns = df.collect_schema().names()
-    return (
-        pl.concat([df, diferencias], how="vertical_relaxed")
-        .group_by(columns[: columns.index("fecha_registro") + 1])
-        .sum()
-        .sort(columns[: columns.index("fecha_registro") + 1])
-    )
-
-
-async def guardar_archivos(
-    file: ct.LISTA_QUERIES_CUADRE, df_cuadre: pl.DataFrame
-) -> None:
-    df_cuadre.write_csv(f"data/raw/{file}.csv", separator="\t")
-    df_cuadre.write_parquet(f"data/raw/{file}.parquet")
+def guardar_archivos(file: ct.LISTA_QUERIES_CUADRE, cambios: pl.DataFrame) -> None:
+    versiones_raw.guardar_version(file, "post_cuadre", cambios)
@@ -1,9 +1,12 @@
 import asyncio
 import os
 
+from src import espacio_trabajo as et
+from src import metricas
 from src.logger_config import logger
 
 
+@metricas.instrumentar()
 async def generar_evidencias_parametros(negocio: str, mes_corte: int):
     import shutil
     from datetime import datetime
@@ -12,7 +15,9 @@ async def generar_evidencias_parametros(negocio: str, mes_corte: int):
     import pyautogui
 
     original_file = f"data/segmentacion_{negocio}.xlsx"
-    stored_file = f"data/controles_informacion/{mes_corte}_segmentacion_{negocio}.xlsx"
+    stored_file = et.ruta(
+        f"data/controles_informacion/{mes_corte}_segmentacion_{negocio}.xlsx"
+    )
 
     shutil.copyfile(original_file, stored_file)
 
@@ -31,7 +36,9 @@ async def generar_evidencias_parametros(negocio: str, mes_corte: int):
         pyautogui.hotkey("winleft", "alt", "d")
         await asyncio.sleep(0.5)
 
-    pyautogui.screenshot(f"data/controles_informacion/{mes_corte}_extraccion.png")
+    pyautogui.screenshot(
+        et.ruta(f"data/controles_informacion/{mes_corte}_extraccion.png")
+    )
 
     if os.name == "nt":
         pyautogui.hotkey("winleft", "alt", "d")
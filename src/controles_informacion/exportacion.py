@@ -0,0 +1,62 @@
+import asyncio
+import math
+import os
+
+import polars as pl
+import xlsxwriter
+
+from src import metricas
+from src.logger_config import logger
+
+FILAS_POR_LOTE = 50_000
+# Limite de filas de una hoja de Excel, sin contar el encabezado
+MAX_FILAS_HOJA = 1_048_575
+
+
+def escribir_excel(df: pl.DataFrame, ruta: str) -> None:
+    """Escribe el DataFrame por lotes con xlsxwriter en modo de memoria
+    constante, donde cada fila pasa directo al archivo en lugar de armar el
+    libro completo en memoria. Si no cabe en una hoja, sigue en otras.
+    """
+    opciones = {
+        "constant_memory": True,
+        "nan_inf_to_errors": True,
+        "default_date_format": "yyyy-mm-dd",
+    }
+    with xlsxwriter.Workbook(ruta, opciones) as wb:
+        formato_encabezado = wb.add_format({"bold": True})
+        for n_hoja in range(max(1, math.ceil(df.height / MAX_FILAS_HOJA))):
+            hoja = wb.add_worksheet(f"Sheet{n_hoja + 1}")
+            hoja.write_row(0, 0, df.columns, formato_encabezado)
+
+            parte = df.slice(n_hoja * MAX_FILAS_HOJA, MAX_FILAS_HOJA)
+            fila = 1
+            for lote in parte.iter_slices(FILAS_POR_LOTE):
+                # Cada lote se convierte por columnas; las filas se arman al
+                # escribir, porque en memoria constante cada fila se vuelca al
+                # archivo apenas empieza la siguiente y no admite write_column
+                columnas = [serie.to_list() for serie in lote.iter_columns()]
+                for valores in zip(*columnas, strict=True):
+                    hoja.write_row(fila, 0, valores)
+                    fila += 1
+
+
+def exportar_control(df: pl.DataFrame, carpeta: str, nombre: str) -> None:
+    """El Parquet es la salida de referencia del control; el Excel es la
+    vista para revisarlo.
+    """
+    df.write_parquet(f"{carpeta}/{nombre}.parquet")
+    escribir_excel(df, f"{carpeta}/{nombre}.xlsx")
+    logger.debug(f"Control {nombre} exportado en {carpeta}.")
+
+
+@metricas.instrumentar()
+async def exportar_controles(salidas: dict[str, pl.DataFrame], carpeta: str) -> None:
+    """Exporta los controles en paralelo, cada uno en un hilo."""
+    os.makedirs(carpeta, exist_ok=True)
+    await asyncio.gather(
+        *[
+            asyncio.to_thread(exportar_control, df, carpeta, nombre)
+            for nombre, df in salidas.items()
+        ]
+    )
@@ -1,95 +1,86 @@
 import asyncio
-import os
 from typing import Literal
 
 import polars as pl
 
 from src import constantes as ct
-from src import utils
-from src.controles_informacion import sap
+from src import ejecucion, metricas, perfiles, utils, versiones_raw
+from src import espacio_trabajo as et
+from src.configuracion import configuracion
+from src.controles_informacion import exportacion, historico, sap
 from src.controles_informacion.cuadre_contable import realizar_cuadre_contable
 from src.logger_config import logger
-from src.models import Parametros
+from src.models import LlaveControl, Parametros
 
+COLUMNAS_CUADRE = ["codigo_op", "codigo_ramo_op", "fecha_registro"]
 
+
+@metricas.instrumentar()
 async def generar_controles(
     file: Literal["siniestros", "primas", "expuestos"], p: Parametros
 ) -> None:
     logger.info(f"Generando controles de informacion para {file}...")
-    df = await asyncio.to_thread(pl.read_parquet, f"data/raw/{file}.parquet")
-
-    difs_sap_tera_pre_cuadre = await generar_controles_estado_cuadre(
-        df,
-        p.negocio,
-        file,
-        p.mes_corte,
-        estado_cuadre="pre_cuadre_contable",
+    df = await asyncio.to_thread(pl.read_parquet, et.ruta(f"data/raw/{file}.parquet"))
+    versiones_raw.iniciar_versiones(file)
+
+    difs_sap_tera_pre_cuadre, df_tera = await generar_controles_estado_cuadre(
+        df, file, p, estado_cuadre="pre_cuadre_contable"
     )
 
     if (file == "siniestros" and p.cuadre_contable_sinis) or (
         file == "primas" and p.cuadre_contable_primas
     ):
-        await asyncio.to_thread(
-            df.write_csv, f"data/raw/{file}_pre_cuadre.csv", separator="\t"
-        )
-        await asyncio.to_thread(df.write_parquet, f"data/raw/{file}_pre_cuadre.parquet")
-        df = await realizar_cuadre_contable(
+        versiones_raw.guardar_version(file, "pre_cuadre")
+        df, diferencias = await realizar_cuadre_contable(
             p.negocio, file, df, difs_sap_tera_pre_cuadre
         )
+        qtys, _ = definir_cantidades_control(p.negocio, file)
         _ = await generar_controles_estado_cuadre(
             df,
-            p.negocio,
             file,
-            p.mes_corte,
+            p,
             estado_cuadre="post_cuadre_contable",
+            df_tera=aplicar_diferencias_cuadre(df_tera, diferencias, qtys),
         )
 
     if p.negocio == "soat" and file == "siniestros" and p.add_fraude_soat:
-        await asyncio.to_thread(
-            df.write_csv,
-            "data/raw/siniestros_post_cuadre.csv",
-            separator="\t",
-        )
-        await asyncio.to_thread(
-            df.write_parquet, "data/raw/siniestros_post_cuadre.parquet"
-        )
-        df = await ajustar_fraude(df, p.mes_corte)
+        df = await ejecucion.ejecutor.correr(ajustar_fraude, df, p.mes_corte)
         _ = await generar_controles_estado_cuadre(
-            df,
-            p.negocio,
-            file,
-            p.mes_corte,
-            estado_cuadre="post_ajustes_fraude",
+            df, file, p, estado_cuadre="post_ajustes_fraude"
         )
 
+    await asyncio.to_thread(versiones_raw.materializar, file)
+
 
 async def generar_controles_estado_cuadre(
     df: pl.DataFrame,
-    negocio: str,
     file: Literal["siniestros", "primas", "expuestos"],
-    mes_corte: int,
+    p: Parametros,
     estado_cuadre: Literal[
         "pre_cuadre_contable", "post_cuadre_contable", "post_ajustes_fraude"
     ],
-) -> pl.DataFrame:
+    df_tera: pl.DataFrame | None = None,
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Devuelve las diferencias contra SAP y la base agrupada por compania,
+    ramo y fecha de registro. Si ya se tiene esa base agrupada, no se vuelve
+    a calcular.
+    """
+    negocio, mes_corte = p.negocio, p.mes_corte
     qtys, group_cols = definir_cantidades_control(negocio, file)
-    await asyncio.to_thread(
-        agrupar_tera(df, group_cols, qtys).write_excel,
-        f"data/controles_informacion/{estado_cuadre}/{file}_tera_{mes_corte}.xlsx",
+    df_agrupado, df_tera, df_integridad = await ejecucion.ejecutor.correr(
+        calcular_agregados, df, group_cols, qtys, df_tera
     )
+    salidas = {
+        f"{file}_tera_{mes_corte}": df_agrupado,
+        f"{file}_integridad_exactitud_{mes_corte}": df_integridad,
+    }
     await asyncio.to_thread(
-        generar_consistencia_historica,
-        file,
-        group_cols,
+        historico.generar_consistencia_historica,
+        df_agrupado,
         qtys,
-        estado_cuadre,
-        fuente="tera",
-    )
-
-    df_tera = agrupar_tera(
-        df,
-        group_cols=["codigo_op", "codigo_ramo_op", "fecha_registro"],
-        qtys=qtys,
+        LlaveControl(
+            estado_cuadre=estado_cuadre, file=file, fuente="tera", mes_corte=mes_corte
+        ),
     )
 
     if file in ("siniestros", "primas"):
@@ -99,29 +90,31 @@ async def generar_controles_estado_cuadre(
             pl.col("codigo_ramo_op").is_in(df.get_column("codigo_ramo_op").unique())
         )
         await asyncio.to_thread(
-            df_sap.write_excel,
-            f"data/controles_informacion/{estado_cuadre}/{file}_sap_{mes_corte}.xlsx",
-        )
-        await asyncio.to_thread(
-            generar_consistencia_historica,
-            file,
-            ["codigo_op", "codigo_ramo_op", "fecha_registro"],
+            historico.generar_consistencia_historica,
+            df_sap,
             qtys,
-            estado_cuadre,
-            fuente="sap",
+            LlaveControl(
+                estado_cuadre=estado_cuadre,
+                file=file,
+                fuente="sap",
+                mes_corte=mes_corte,
+            ),
         )
 
-        difs_sap_tera = await comparar_sap_tera(df_tera, df_sap, int(mes_corte), qtys)
-        await asyncio.to_thread(
-            difs_sap_tera.write_excel,
-            f"data/controles_informacion/{estado_cuadre}/{file}_sap_vs_tera_{mes_corte}.xlsx",
+        difs_sap_tera, alertas_sap_tera = await comparar_sap_tera(
+            df_tera, df_sap, int(mes_corte), qtys
         )
+        salidas |= {
+            f"{file}_sap_{mes_corte}": df_sap,
+            f"{file}_sap_vs_tera_{mes_corte}": difs_sap_tera,
+            f"{file}_alertas_sap_vs_tera_{mes_corte}": alertas_sap_tera,
+        }
 
     elif file == "expuestos":
         difs_sap_tera = pl.DataFrame()
 
-    await asyncio.to_thread(
-        generar_integridad_exactitud, df, estado_cuadre, file, mes_corte, qtys
+    await exportacion.exportar_controles(
+        salidas, et.ruta(f"data/controles_informacion/{estado_cuadre}")
     )
 
     logger.success(
@@ -133,7 +126,7 @@ async def generar_controles_estado_cuadre(
         )
     )
 
-    return difs_sap_tera
+    return difs_sap_tera, df_tera
 
 
 def definir_cantidades_control(
@@ -164,106 +157,80 @@ async def comparar_sap_tera(
     df_sap: pl.DataFrame,
     mes_corte: int,
     qtys: list[str],
-) -> pl.DataFrame:
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    return await ejecucion.ejecutor.correr(
+        calcular_diferencias_sap_tera, df_tera, df_sap, mes_corte, qtys
+    )
+
+
+def umbral_diferencia(qty: str) -> float:
+    return configuracion.umbrales_diferencia_sap.get(
+        qty, configuracion.umbral_diferencia_sap
+    )
+
+
+def alertas_cantidad(base_comp: pl.LazyFrame, qty: str) -> pl.LazyFrame:
+    return base_comp.select(
+        *COLUMNAS_CUADRE,
+        cantidad=pl.lit(qty),
+        valor_tera=pl.col(qty),
+        valor_sap=pl.col(f"{qty}_SAP"),
+        diferencia=pl.col(f"diferencia_{qty}"),
+        dif_pct=pl.col(f"dif%_{qty}"),
+        umbral=pl.lit(umbral_diferencia(qty)),
+    ).filter(pl.col("dif_pct").abs() > pl.col("umbral"))
+
+
+@metricas.instrumentar()
+def calcular_diferencias_sap_tera(
+    df_tera: pl.DataFrame,
+    df_sap: pl.DataFrame,
+    mes_corte: int,
+    qtys: list[str],
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Devuelve la comparacion completa y una tabla con las diferencias que
+    superan el umbral de cada cantidad, en todos los meses. Ambas salen de un
+    mismo plan, que se calcula una sola vez.
+    """
     base_comp = (
         df_tera.lazy()
         .join(
             df_sap.lazy(),
-            on=["codigo_op", "codigo_ramo_op", "fecha_registro"],
+            on=COLUMNAS_CUADRE,
             how="left",
             validate="1:1",
             suffix="_SAP",
         )
         .fill_null(0)
-    )
-
-    for qty in qtys:
-        base_comp = base_comp.with_columns(
-            (pl.col(f"{qty}_SAP") - pl.col(qty)).alias(f"diferencia_{qty}"),
-        ).with_columns(
-            (pl.col(f"diferencia_{qty}") / pl.col(f"{qty}_SAP"))
-            .alias(f"dif%_{qty}")
-            .fill_nan(0)
-        )
-
-        comp_mes = (
-            base_comp.filter(
-                pl.col("fecha_registro") == utils.yyyymm_to_date(mes_corte)
+        .with_columns(
+            expr
+            for qty in qtys
+            for expr in (
+                (pl.col(f"{qty}_SAP") - pl.col(qty)).alias(f"diferencia_{qty}"),
+                ((pl.col(f"{qty}_SAP") - pl.col(qty)) / pl.col(f"{qty}_SAP"))
+                .fill_nan(0)
+                .alias(f"dif%_{qty}"),
             )
-            .filter(pl.col(f"dif%_{qty}").abs() > 0.05)
-            .collect()
         )
+    )
+    plan_alertas = pl.concat([alertas_cantidad(base_comp, qty) for qty in qtys]).sort(
+        ["fecha_registro", "cantidad", "codigo_op", "codigo_ramo_op"]
+    )
 
-        if comp_mes.shape[0] != 0:
-            dif = comp_mes.select(
-                [
-                    "codigo_op",
-                    "codigo_ramo_op",
-                    qty,
-                    f"{qty}_SAP",
-                    f"diferencia_{qty}",
-                    f"dif%_{qty}",
-                ]
-            )
-            logger.warning(f"""¡Alerta! Diferencias significativas en {qty}: {dif}""")
-
-    return base_comp.collect()
-
-
-def generar_consistencia_historica(
-    file: str,
-    group_cols: list[str],
-    qtys: list[str],
-    estado_cuadre: str,
-    fuente: str,
-) -> None:
-    available_files = [
-        f
-        for f in os.listdir(f"data/controles_informacion/{estado_cuadre}")
-        if f"{file}_{fuente}" in f
-        and "sap_vs_tera" not in f
-        and "ramo" not in f
-        and "consistencia" not in f
-    ]
-
-    dfs = pl.LazyFrame(schema=group_cols)
-    meses = set()
-    for i, f in enumerate(available_files):
-        mes_file = f[-11:-5]
-        df = (
-            pl.read_excel(f"data/controles_informacion/{estado_cuadre}/{f}")
-            .lazy()
-            .rename({qty: f"{qty}_{mes_file}" for qty in qtys})
-        )
-
-        dfs = (
-            df
-            if i == 0
-            else dfs.join(df, on=group_cols, how="full", coalesce=True).fill_null(0)
-        )
-
-        meses.add(mes_file)
-
-    meses_list = list(meses)
-    for qty in qtys:
-        for n_mes, mes in enumerate(meses_list[1:]):
-            dfs = dfs.with_columns(
-                (pl.col(f"{qty}_{mes}") - pl.col(f"{qty}_{meses_list[n_mes]}")).alias(
-                    f"diferencia_{qty}_{mes}_{meses_list[n_mes]}"
-                )
-            )
+    comparacion, alertas = perfiles.recolectar_todos([base_comp, plan_alertas])
 
-    dfs.sort(group_cols).collect().write_excel(
-        f"data/controles_informacion/{estado_cuadre}/{file}_{fuente}_consistencia_historica.xlsx"
+    alertas_mes = alertas.filter(
+        pl.col("fecha_registro") == utils.yyyymm_to_date(mes_corte)
     )
+    if not alertas_mes.is_empty():
+        logger.warning(
+            f"""¡Alerta! Diferencias significativas contra SAP: {alertas_mes}"""
+        )
 
-
-def agrupar_tera(
-    df: pl.DataFrame, group_cols: list[str], qtys: list[str]
-) -> pl.DataFrame:
-    return df.select(group_cols + qtys).group_by(group_cols).sum().sort(group_cols)
+    return comparacion, alertas
 
 
+@metricas.instrumentar()
 def ajustar_fraude(df: pl.DataFrame, mes_corte: int):
     fraude = (
         pl.LazyFrame(
@@ -273,37 +240,81 @@ def ajustar_fraude(df: pl.DataFrame, mes_corte: int):
         .filter(pl.col("fecha_registro") <= utils.yyyymm_to_date(mes_corte))
     )
 
-    df = (
-        pl.concat([df.lazy(), fraude], how="vertical_relaxed")
-        .group_by(
-            df.collect_schema().names()[
-                : df.collect_schema().names().index("fecha_registro") + 1
-            ]
-        )
-        .sum()
-        .collect()
+    cambios = versiones_raw.calcular_cambios(df.lazy(), fraude).pipe(
+        perfiles.recolectar
     )
-    df.write_csv("data/raw/siniestros.csv", separator="\t")
-    df.write_parquet("data/raw/siniestros.parquet")
+    versiones_raw.guardar_version("siniestros", "post_fraude", cambios)
 
-    return df
+    return versiones_raw.aplicar_cambios(df, cambios)
 
 
-def generar_integridad_exactitud(
-    df: pl.DataFrame, estado_cuadre: str, file: str, mes_corte: int, qtys: list[str]
-) -> None:
-    apr_cols = df.collect_schema().names()[: df.collect_schema().names().index(qtys[0])]
-    qty_cols = df.collect_schema().names()[df.collect_schema().names().index(qtys[0]) :]
+def columnas_agregados(
+    columnas: list[str], group_cols: list[str], qtys: list[str]
+) -> tuple[list[str], list[str], list[str]]:
+    """Llaves de la agrupacion base, cantidades que suma y aperturas de la
+    revision de integridad y exactitud.
+    """
+    aperturas = columnas[: columnas.index(qtys[0])]
+    llaves = aperturas + [
+        col for col in group_cols + COLUMNAS_CUADRE if col not in aperturas
+    ]
+    cantidades = [col for col in columnas if col not in llaves]
+    return llaves, cantidades, [col for col in aperturas if "fecha" not in col]
 
-    apr_cols = [col for col in apr_cols if "fecha" not in col]
 
+def reagrupar(
+    base: pl.DataFrame, group_cols: list[str], cantidades: list[str]
+) -> pl.DataFrame:
     return (
-        df.select(apr_cols + qty_cols)
-        .with_columns(numero_registros=1)
-        .group_by(apr_cols)
-        .sum()
-        .sort(apr_cols)
-        .write_excel(
-            f"data/controles_informacion/{estado_cuadre}/{file}_integridad_exactitud_{mes_corte}.xlsx",
+        base.lazy()
+        .group_by(group_cols)
+        .agg(pl.col(cantidades).sum())
+        .sort(group_cols)
+        .pipe(perfiles.recolectar)
+    )
+
+
+@metricas.instrumentar()
+def calcular_agregados(
+    df: pl.DataFrame,
+    group_cols: list[str],
+    qtys: list[str],
+    df_tera: pl.DataFrame | None = None,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """Calcula los agregados de los controles (por aperturas y fechas, por
+    compania, ramo y fecha de registro, y de integridad y exactitud) con una
+    sola lectura de la base: se agrupa una vez por todas las llaves y cada
+    control se obtiene reagrupando ese resultado, que es mucho mas pequeno.
+    """
+    llaves, cantidades, aperturas = columnas_agregados(
+        df.collect_schema().names(), group_cols, qtys
+    )
+    base = (
+        df.lazy()
+        .group_by(llaves)
+        .agg(pl.col(cantidades).sum(), numero_registros=pl.len())
+        .pipe(perfiles.recolectar)
+    )
+
+    return (
+        reagrupar(base, group_cols, qtys),
+        reagrupar(base, COLUMNAS_CUADRE, qtys) if df_tera is None else df_tera,
+        reagrupar(base, aperturas, cantidades + ["numero_registros"]),
+    )
+
+
+def aplicar_diferencias_cuadre(
+    df_tera: pl.DataFrame, diferencias: pl.DataFrame, qtys: list[str]
+) -> pl.DataFrame:
+    """La base agrupada despues del cuadre contable es la de antes mas las
+    diferencias repartidas, que son pocas filas.
+    """
+    return (
+        pl.concat(
+            [df_tera, diferencias.select(COLUMNAS_CUADRE + qtys)],
+            how="vertical_relaxed",
         )
+        .group_by(COLUMNAS_CUADRE)
+        .sum()
+        .sort(COLUMNAS_CUADRE)
     )
@@ -0,0 +1,152 @@
+import os
+import re
+
+import polars as pl
+
+from src import espacio_trabajo as et
+from src import perfiles
+from src.configuracion import configuracion
+from src.controles_informacion import exportacion
+from src.logger_config import logger
+from src.models import LlaveControl
+
+RUTA_HISTORICO = "data/controles_informacion/historico"
+
+
+def ruta_particion(llave: LlaveControl, mes_corte: int | None = None) -> str:
+    """Los controles se guardan particionados al estilo hive, para leer solo
+    los de un archivo, fuente y estado de cuadre.
+    """
+    ruta = (
+        f"{RUTA_HISTORICO}/estado_cuadre={llave.estado_cuadre}/file={llave.file}"
+        f"/fuente={llave.fuente}"
+    )
+    return ruta if mes_corte is None else f"{ruta}/mes_corte={mes_corte}"
+
+
+def guardar_control(df: pl.DataFrame, qtys: list[str], llave: LlaveControl) -> None:
+    """Guarda el control en formato largo: una fila por llave de agrupacion
+    y cantidad. Volver a correr el mismo mes reemplaza su particion.
+    """
+    carpeta = et.ruta(ruta_particion(llave, llave.mes_corte))
+    os.makedirs(carpeta, exist_ok=True)
+    ruta_temporal = f"{carpeta}/datos.parquet.tmp"
+    df.unpivot(
+        index=[col for col in df.collect_schema().names() if col not in qtys],
+        on=qtys,
+        variable_name="cantidad",
+        value_name="valor",
+    ).with_columns(pl.col("valor").cast(pl.Float64)).write_parquet(ruta_temporal)
+    os.replace(ruta_temporal, f"{carpeta}/datos.parquet")
+
+
+def meses_guardados(llave: LlaveControl) -> list[int]:
+    carpeta = et.ruta(ruta_particion(llave))
+    if not os.path.exists(carpeta):
+        return []
+    return sorted(
+        int(particion.removeprefix("mes_corte="))
+        for particion in os.listdir(carpeta)
+        if os.path.exists(f"{carpeta}/{particion}/datos.parquet")
+    )
+
+
+def migrar_excel(df: pl.DataFrame, qtys: list[str], llave: LlaveControl) -> None:
+    """Pasa al historico los controles de meses anteriores que solo estan en
+    Excel, con los tipos del control actual. Cada mes se lee una sola vez.
+    """
+    carpeta = et.ruta(f"data/controles_informacion/{llave.estado_cuadre}")
+    guardados = meses_guardados(llave)
+    patron = re.compile(rf"{llave.file}_{llave.fuente}_(\d{{6}})\.xlsx")
+    for archivo in os.listdir(carpeta):
+        coincidencia = patron.fullmatch(archivo)
+        if coincidencia is None:
+            continue
+        mes_corte = int(coincidencia.group(1))
+        if mes_corte in guardados or mes_corte == llave.mes_corte:
+            continue
+        logger.info(f"Migrando {archivo} al historico de controles...")
+        control = pl.read_excel(f"{carpeta}/{archivo}")
+        guardar_control(
+            control.cast(
+                {col: df.schema[col] for col in control.columns if col in df.schema}
+            ),
+            qtys,
+            llave.model_copy(update={"mes_corte": mes_corte}),
+        )
+
+
+def leer_historico(llave: LlaveControl) -> pl.LazyFrame:
+    return pl.scan_parquet(
+        f"{et.ruta(ruta_particion(llave))}/*/datos.parquet",
+        hive_partitioning=True,
+    ).select(pl.exclude("estado_cuadre", "file", "fuente"))
+
+
+def calcular_consistencia(historico: pl.LazyFrame) -> pl.LazyFrame:
+    """Diferencia de cada cantidad contra el mes de corte anterior. Una
+    llave que no aparece en un mes cuenta como cero en ese mes.
+    """
+    columnas = historico.collect_schema().names()
+    llaves = [col for col in columnas if col not in ("mes_corte", "valor")]
+    completo = (
+        historico.select(llaves)
+        .unique()
+        .join(historico.select("mes_corte").unique(), how="cross")
+        .join(historico, on=[*llaves, "mes_corte"], how="left", nulls_equal=True)
+        .with_columns(pl.col("valor").fill_null(0))
+    )
+    return completo.with_columns(
+        mes_anterior=pl.col("mes_corte").shift().over(llaves, order_by="mes_corte"),
+        diferencia=(pl.col("valor") - pl.col("valor").shift()).over(
+            llaves, order_by="mes_corte"
+        ),
+    ).sort([*llaves, "mes_corte"])
+
+
+def vista_consistencia(consistencia: pl.DataFrame) -> pl.DataFrame:
+    """Vista ancha para Excel: una columna por cantidad y mes, y una por la
+    diferencia de cada par de meses consecutivos.
+    """
+    group_cols = [
+        col
+        for col in consistencia.collect_schema().names()
+        if col not in ("cantidad", "mes_corte", "valor", "mes_anterior", "diferencia")
+    ]
+    valores = consistencia.with_columns(
+        columna=pl.format("{}_{}", "cantidad", "mes_corte")
+    ).pivot("columna", index=group_cols, values="valor")
+    diferencias = (
+        consistencia.filter(pl.col("mes_anterior").is_not_null())
+        .with_columns(
+            columna=pl.format(
+                "diferencia_{}_{}_{}", "cantidad", "mes_corte", "mes_anterior"
+            )
+        )
+        .pivot("columna", index=group_cols, values="diferencia")
+    )
+    if diferencias.is_empty():
+        return valores.sort(group_cols)
+    return valores.join(diferencias, on=group_cols, how="left", nulls_equal=True).sort(
+        group_cols
+    )
+
+
+def generar_consistencia_historica(
+    df: pl.DataFrame, qtys: list[str], llave: LlaveControl
+) -> pl.DataFrame:
+    migrar_excel(df, qtys, llave)
+    guardar_control(df, qtys, llave)
+    consistencia = (
+        leer_historico(llave).pipe(calcular_consistencia).pipe(perfiles.recolectar)
+    )
+
+    if configuracion.consistencia_historica_excel:
+        exportacion.escribir_excel(
+            vista_consistencia(consistencia),
+            et.ruta(
+                f"data/controles_informacion/{llave.estado_cuadre}/"
+                f"{llave.file}_{llave.fuente}_consistencia_historica.xlsx"
+            ),
+        )
+    return consistencia
@@ -1,24 +1,29 @@
+import asyncio
+import functools
+import os
+from pathlib import Path
+
 import polars as pl
 
 from src import constantes as ct
-from src import utils
+from src import espacio_trabajo as et
+from src import etapas, perfiles, utils
 from src.logger_config import logger
 
+RUTA_AFO = "data/afo"
+RUTA_CACHE_AFO = f"{RUTA_AFO}/cache"
+
 
 async def consolidar_sap(
     cias: list[str], qtys: list[str], mes_corte: int
 ) -> pl.DataFrame:
-    dfs_sap = []
-    for cia in cias:
-        for hoja_afo in definir_hojas_afo(qtys):
-            dfs_sap.append(
-                await transformar_hoja_afo(
-                    pl.read_excel(f"data/afo/{cia}.xlsx", sheet_name=hoja_afo),
-                    cia,
-                    hoja_afo,
-                    mes_corte,
-                )
-            )
+    dfs_sap = await asyncio.gather(
+        *[
+            leer_hoja_afo(cia, hoja_afo, mes_corte)
+            for cia in cias
+            for hoja_afo in sorted(definir_hojas_afo(qtys))
+        ]
+    )
 
     df_sap_full = (
         pl.concat(dfs_sap, how="diagonal")
@@ -32,13 +37,72 @@ async def consolidar_sap(
     return df_sap_full.select(["codigo_op", "codigo_ramo_op", "fecha_registro"] + qtys)
 
 
+@functools.lru_cache
+def hash_afo(ruta: str, firma: str) -> str:
+    # La firma hace parte de la llave para volver a calcular el hash solo
+    # cuando el archivo cambia
+    return et.hash_archivo(ruta)
+
+
+def ruta_cache_afo(cia: str, hoja_afo: str) -> str | None:
+    ruta = f"{RUTA_AFO}/{cia}.xlsx"
+    if not os.path.exists(ruta):
+        return None
+    hash_archivo = hash_afo(ruta, etapas.firma_archivo(ruta))
+    return f"{RUTA_CACHE_AFO}/{cia}/{hoja_afo}/{hash_archivo[:16]}.parquet"
+
+
+def guardar_cache_afo(df: pl.DataFrame, ruta_cache: str) -> None:
+    """Reemplaza la cache de versiones anteriores del AFO para la misma hoja.
+    Cada compania y hoja tiene su carpeta, para no borrar la cache de hojas
+    cuyo nombre empieza igual, como prima_bruta y prima_bruta_devengada.
+    """
+    carpeta = Path(ruta_cache).parent
+    carpeta.mkdir(parents=True, exist_ok=True)
+    for anterior in carpeta.glob("*.parquet"):
+        if anterior != Path(ruta_cache):
+            anterior.unlink(missing_ok=True)
+    df.write_parquet(f"{ruta_cache}.tmp")
+    os.replace(f"{ruta_cache}.tmp", ruta_cache)
+
+
+def decodificar_hoja_afo(cia: str, hoja_afo: str) -> pl.DataFrame:
+    df = pl.read_excel(f"{RUTA_AFO}/{cia}.xlsx", sheet_name=hoja_afo)
+    return normalizar_hoja_afo(df, cia, hoja_afo).pipe(perfiles.recolectar)
+
+
+async def leer_hoja_afo(cia: str, hoja_afo: str, mes_corte: int) -> pl.DataFrame:
+    """Cada hoja del AFO se decodifica una sola vez por version del archivo;
+    las siguientes lecturas salen de la cache en Parquet.
+    """
+    ruta_cache = ruta_cache_afo(cia, hoja_afo)
+    if ruta_cache is not None and os.path.exists(ruta_cache):
+        normalizada = pl.scan_parquet(ruta_cache)
+    else:
+        df = await asyncio.to_thread(decodificar_hoja_afo, cia, hoja_afo)
+        if ruta_cache is not None:
+            await asyncio.to_thread(guardar_cache_afo, df, ruta_cache)
+        normalizada = df.lazy()
+
+    return await filtrar_hoja_afo(normalizada, cia, hoja_afo, mes_corte)
+
+
 async def transformar_hoja_afo(
     df: pl.DataFrame, cia: str, qty: str, mes_corte: int
 ) -> pl.DataFrame:
-    if (
-        f"{ct.NOMBRE_MES[mes_corte % 100]} {mes_corte // 100}"
-        not in df.get_column("Ejercicio/Período").unique()
-    ):
+    return await filtrar_hoja_afo(
+        normalizar_hoja_afo(df, cia, qty), cia, qty, mes_corte
+    )
+
+
+async def filtrar_hoja_afo(
+    normalizada: pl.LazyFrame, cia: str, qty: str, mes_corte: int
+) -> pl.DataFrame:
+    df = normalizada.filter(
+        pl.col("fecha_registro") <= utils.yyyymm_to_date(mes_corte)
+    ).pipe(perfiles.recolectar)
+
+    if not (df.get_column("fecha_registro") == utils.yyyymm_to_date(mes_corte)).any():
         logger.error(
             utils.limpiar_espacios_log(
                 f"""
@@ -49,6 +113,10 @@ async def transformar_hoja_afo(
         )
         raise ValueError
 
+    return df.filter(pl.col(qty) != 0)
+
+
+def normalizar_hoja_afo(df: pl.DataFrame, cia: str, qty: str) -> pl.LazyFrame:
     return (
         df.lazy()
         .fill_null(0)
@@ -84,12 +152,7 @@ async def transformar_hoja_afo(
             fecha_registro=pl.date(pl.col("Anno"), pl.col("Mes"), 1),
         )
         .fill_null(0)
-        .filter(
-            (pl.col("fecha_registro") <= utils.yyyymm_to_date(mes_corte))
-            & (pl.col(qty) != 0)
-        )
         .select(["codigo_op", "codigo_ramo_op", "fecha_registro", qty])
-        .collect()
     )
 
 
@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import multiprocessing
+import tempfile
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Literal
+
+import polars as pl
+from pydantic import BaseModel
+
+from src import espacio_trabajo as et
+from src import metricas
+from src.configuracion import configuracion
+from src.logger_config import logger
+
+
+class FrameEnDisco(BaseModel):
+    ruta: str
+
+
+def guardar_frames(
+    args: tuple[Any, ...], carpeta: str, prefijo: str = "arg"
+) -> tuple[Any, ...]:
+    """Los DataFrames viajan entre procesos como archivos IPC, en lugar de
+    serializarse con pickle.
+    """
+    return tuple(
+        guardar_frame(arg, f"{carpeta}/{prefijo}_{n}.arrow")
+        if isinstance(arg, pl.DataFrame)
+        else arg
+        for n, arg in enumerate(args)
+    )
+
+
+def guardar_frame(df: pl.DataFrame, ruta: str) -> FrameEnDisco:
+    df.write_ipc(ruta)
+    return FrameEnDisco(ruta=ruta)
+
+
+def leer_frames(args: tuple[Any, ...]) -> tuple[Any, ...]:
+    # Sin memory map, para poder borrar los archivos temporales en Windows
+    return tuple(
+        pl.read_ipc(arg.ruta, memory_map=False)
+        if isinstance(arg, FrameEnDisco)
+        else arg
+        for arg in args
+    )
+
+
+def ejecutar_en_proceso(
+    funcion: Callable[..., Any],
+    args: tuple[Any, ...],
+    carpeta: str,
+    raiz_espacio: str,
+) -> tuple[Any, list[tuple[str, str]], list[dict[str, Any]]]:
+    """Los logs y las metricas del proceso se devuelven para registrarlos en
+    el proceso principal, que es el que los transmite a la interfaz.
+    """
+    et.raiz_actual.set(raiz_espacio)
+    metricas.diferir_guardado = True
+    mensajes: list[tuple[str, str]] = []
+    id_sink = logger.add(
+        lambda m: mensajes.append((m.record["level"].name, m.record["message"])),
+        level="INFO",
+    )
+    try:
+        resultado = funcion(*leer_frames(args))
+    finally:
+        logger.remove(id_sink)
+
+    if isinstance(resultado, pl.DataFrame):
+        resultado = guardar_frame(resultado, f"{carpeta}/resultado.arrow")
+    elif isinstance(resultado, tuple):
+        resultado = guardar_frames(resultado, carpeta, prefijo="resultado")
+    return resultado, mensajes, metricas.tomar_pendientes()
+
+
+class Ejecutor:
+    """Ejecuta etapas pesadas de DataFrames fuera del hilo que las llama,
+    en un pool de procesos o de hilos segun la configuracion.
+    """
+
+    def __init__(self, tipo: Literal["proceso", "hilo"], max_trabajadores: int) -> None:
+        self.tipo = tipo
+        self.max_trabajadores = max_trabajadores
+        self.pool: Executor | None = None
+
+    def obtener_pool(self) -> Executor:
+        if self.pool is None:
+            self.pool = (
+                ProcessPoolExecutor(
+                    self.max_trabajadores,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                if self.tipo == "proceso"
+                else ThreadPoolExecutor(
+                    self.max_trabajadores, thread_name_prefix="ejecutor"
+                )
+            )
+        return self.pool
+
+    def ejecutar(self, funcion: Callable[..., Any], *args: Any) -> Any:
+        if self.tipo == "hilo":
+            return (
+                self.obtener_pool()
+                .submit(contextvars.copy_context().run, funcion, *args)
+                .result()
+            )
+
+        with tempfile.TemporaryDirectory(prefix="ejecutor_") as carpeta:
+            resultado, mensajes, filas_metricas = (
+                self.obtener_pool()
+                .submit(
+                    ejecutar_en_proceso,
+                    funcion,
+                    guardar_frames(args, carpeta),
+                    carpeta,
+                    et.raiz_actual.get(),
+                )
+                .result()
+            )
+            for nivel, mensaje in mensajes:
+                logger.log(nivel, mensaje)
+            metricas.agregar(filas_metricas)
+            if isinstance(resultado, tuple):
+                return leer_frames(resultado)
+            return leer_frames((resultado,))[0]
+
+    async def correr(self, funcion: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(self.ejecutar, funcion, *args)
+
+    def cerrar(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+ejecutor = Ejecutor(
+    configuracion.ejecutor_tipo, configuracion.ejecutor_max_trabajadores
+)
+
+
+def usar_hilos() -> None:
+    """Para procesos que ya corren en paralelo, como los trabajos de un lote,
+    donde abrir un pool de procesos adicional no aporta.
+    """
+    global ejecutor  # noqa: PLW0603
+    ejecutor = Ejecutor("hilo", configuracion.ejecutor_max_trabajadores)
@@ -0,0 +1,136 @@
+import functools
+import hashlib
+import inspect
+import os
+import re
+import shutil
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from src.configuracion import configuracion
+from src.logger_config import logger
+from src.models import Parametros
+
+RUTA_ESPACIOS = "data/espacios"
+RUTA_COMPARTIDOS = f"{RUTA_ESPACIOS}/_compartidos"
+
+# Carpetas que cada espacio tiene por separado. El resto de rutas (queries,
+# segmentaciones, AFO, resultados) se comparten entre todos los usuarios.
+CARPETAS_AISLADAS = [
+    "data/raw",
+    "data/processed",
+    "data/db",
+    "data/controles_informacion",
+    "data/catalogos",
+]
+ESTADOS_CUADRE = ["pre_cuadre_contable", "post_cuadre_contable", "post_ajustes_fraude"]
+
+raiz_actual: ContextVar[str] = ContextVar("raiz_espacio_trabajo", default="")
+
+
+def ruta(relativa: str) -> str:
+    """Traduce una ruta del proyecto a la del espacio de trabajo actual. Sin
+    espacio activo, la ruta queda igual.
+    """
+    raiz = raiz_actual.get()
+    if raiz and any(
+        relativa == carpeta or relativa.startswith(f"{carpeta}/")
+        for carpeta in CARPETAS_AISLADAS
+    ):
+        return f"{raiz}/{relativa}"
+    return relativa
+
+
+def ruta_salida(relativa: str) -> str:
+    """Ruta para escribir un archivo. Si el archivo es un enlace a una
+    extraccion compartida, se desvincula para no modificar la copia comun.
+    """
+    destino = ruta(relativa)
+    if os.path.exists(destino) and os.stat(destino).st_nlink > 1:
+        os.remove(destino)
+    return destino
+
+
+def nombre_espacio(p: Parametros) -> str:
+    nombre = (
+        f"{p.session_id or 'local'}_{p.negocio}_{p.mes_inicio}_"
+        f"{p.mes_corte}_{p.tipo_analisis}"
+    )
+    return re.sub(r"[^\w\-]", "_", nombre)
+
+
+def preparar_espacio(raiz: str) -> None:
+    for carpeta in CARPETAS_AISLADAS + [
+        f"data/controles_informacion/{estado}" for estado in ESTADOS_CUADRE
+    ]:
+        os.makedirs(f"{raiz}/{carpeta}", exist_ok=True)
+
+
+@contextmanager
+def usar_espacio(p: Parametros) -> Iterator[str]:
+    if not configuracion.espacios_aislados:
+        yield ""
+        return
+
+    raiz = f"{RUTA_ESPACIOS}/{nombre_espacio(p)}"
+    preparar_espacio(raiz)
+    token = raiz_actual.set(raiz)
+    try:
+        yield raiz
+    finally:
+        raiz_actual.reset(token)
+
+
+def en_espacio(funcion: Callable[..., Any]) -> Callable[..., Any]:
+    """Corre la funcion en el espacio de trabajo de los parametros que
+    recibe como primer argumento.
+    """
+    if inspect.iscoroutinefunction(funcion):
+
+        @functools.wraps(funcion)
+        async def envoltura_async(p: Parametros, *args: Any, **kwargs: Any) -> Any:
+            with usar_espacio(p):
+                return await funcion(p, *args, **kwargs)
+
+        return envoltura_async
+
+    @functools.wraps(funcion)
+    def envoltura(p: Parametros, *args: Any, **kwargs: Any) -> Any:
+        with usar_espacio(p):
+            return funcion(p, *args, **kwargs)
+
+    return envoltura
+
+
+def hash_archivo(ruta_archivo: str) -> str:
+    hash_contenido = hashlib.sha256()
+    with open(ruta_archivo, "rb") as f:
+        for bloque in iter(lambda: f.read(2**20), b""):
+            hash_contenido.update(bloque)
+    return hash_contenido.hexdigest()
+
+
+def deduplicar(ruta_archivo: str) -> None:
+    """Las extracciones identicas de distintos espacios quedan como enlaces
+    a una sola copia, identificada por el hash de su contenido.
+    """
+    if not raiz_actual.get():
+        return
+
+    os.makedirs(RUTA_COMPARTIDOS, exist_ok=True)
+    extension = os.path.splitext(ruta_archivo)[1]
+    compartido = f"{RUTA_COMPARTIDOS}/{hash_archivo(ruta_archivo)}{extension}"
+
+    if os.path.exists(compartido):
+        os.remove(ruta_archivo)
+    else:
+        shutil.move(ruta_archivo, compartido)
+
+    try:
+        os.link(compartido, ruta_archivo)
+    except OSError:
+        # Sistemas de archivos sin enlaces duros
+        shutil.copyfile(compartido, ruta_archivo)
+    logger.debug(f"{ruta_archivo} enlazado a {compartido}.")
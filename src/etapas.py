@@ -0,0 +1,171 @@
+import os
+from collections.abc import Callable
+from datetime import datetime
+from types import ModuleType
+from typing import Any
+
+import polars as pl
+
+from src import espacio_trabajo as et
+from src import utils
+from src.logger_config import logger
+from src.models import Etapa
+
+RUTA_HUELLAS = "data/db/huellas_etapas.parquet"
+RUTA_TRAZA = "data/db/traza_etapas.parquet"
+
+ESQUEMA_HUELLAS = pl.Schema(
+    {
+        "etapa": pl.String,
+        "entrada": pl.String,
+        "firma": pl.String,
+        "huella": pl.String,
+    }
+)
+ESQUEMA_TRAZA = pl.Schema(
+    {
+        "etapa": pl.String(),
+        "fecha": pl.Datetime("us"),
+        "reconstruida": pl.Boolean(),
+        "razones": pl.List(pl.String()),
+    }
+)
+
+
+def archivos_codigo(*modulos: ModuleType) -> list[str]:
+    """Los modulos que implementan una etapa tambien son entradas, para que
+    un cambio en el codigo la vuelva a ejecutar.
+    """
+    return [os.path.relpath(str(modulo.__file__)) for modulo in modulos]
+
+
+def leer_parquet(ruta: str, esquema: pl.Schema) -> pl.DataFrame:
+    if not os.path.exists(et.ruta(ruta)):
+        return pl.DataFrame(schema=esquema)
+    return pl.read_parquet(et.ruta(ruta))
+
+
+def guardar_parquet(df: pl.DataFrame, ruta: str) -> None:
+    ruta_temporal = f"{et.ruta(ruta)}.tmp"
+    df.write_parquet(ruta_temporal)
+    os.replace(ruta_temporal, et.ruta(ruta))
+
+
+def firma_archivo(ruta: str) -> str:
+    if not os.path.exists(ruta):
+        return "ausente"
+    stat = os.stat(ruta)
+    return f"{stat.st_size}_{stat.st_mtime_ns}"
+
+
+def huellas_entradas(etapa: Etapa, anteriores: pl.DataFrame) -> pl.DataFrame:
+    """El contenido de un archivo solo se vuelve a leer si cambio su tamano
+    o su fecha de modificacion desde la ultima ejecucion.
+    """
+    conocidas = {
+        entrada: (firma, huella)
+        for entrada, firma, huella in anteriores.select(
+            ["entrada", "firma", "huella"]
+        ).iter_rows()
+    }
+
+    filas = []
+    for archivo in etapa.entradas:
+        ruta = et.ruta(archivo)
+        firma = firma_archivo(ruta)
+        if firma == "ausente":
+            huella = "ausente"
+        elif conocidas.get(archivo, ("", ""))[0] == firma:
+            huella = conocidas[archivo][1]
+        else:
+            huella = et.hash_archivo(ruta)
+        filas.append((etapa.nombre, archivo, firma, huella))
+
+    for nombre, valor in etapa.parametros.items():
+        filas.append((etapa.nombre, f"parametro:{nombre}", "", str(valor)))
+
+    return pl.DataFrame(filas, schema=ESQUEMA_HUELLAS, orient="row")
+
+
+def razones_reconstruccion(
+    etapa: Etapa, actuales: pl.DataFrame, anteriores: pl.DataFrame
+) -> list[str]:
+    if anteriores.is_empty():
+        return ["sin ejecucion anterior"]
+
+    razones = [
+        f"falta la salida {salida}"
+        for salida in etapa.salidas
+        if not os.path.exists(et.ruta(salida))
+    ]
+
+    comparacion = actuales.join(
+        anteriores, on="entrada", how="full", coalesce=True, suffix="_anterior"
+    )
+    for entrada, huella, huella_anterior in comparacion.select(
+        ["entrada", "huella", "huella_anterior"]
+    ).iter_rows():
+        if huella_anterior is None:
+            razones.append(f"nueva entrada {entrada}")
+        elif huella is None:
+            razones.append(f"ya no se usa {entrada}")
+        elif huella != huella_anterior:
+            detalle = (
+                f" ({huella_anterior} -> {huella})"
+                if entrada.startswith("parametro:")
+                else ""
+            )
+            razones.append(f"cambio {entrada}{detalle}")
+
+    return razones
+
+
+def registrar_traza(nombre: str, razones: list[str]) -> None:
+    traza = leer_parquet(RUTA_TRAZA, ESQUEMA_TRAZA).filter(pl.col("etapa") != nombre)
+    fila = pl.DataFrame(
+        {
+            "etapa": [nombre],
+            "fecha": [datetime.now()],
+            "reconstruida": [bool(razones)],
+            "razones": [razones],
+        },
+        schema=ESQUEMA_TRAZA,
+    )
+    guardar_parquet(pl.concat([traza, fila]), RUTA_TRAZA)
+
+
+def leer_traza() -> pl.DataFrame:
+    """Ultima ejecucion de cada etapa, con las razones por las que se volvio
+    a construir.
+    """
+    return leer_parquet(RUTA_TRAZA, ESQUEMA_TRAZA).sort("fecha")
+
+
+def correr_etapa(etapa: Etapa, funcion: Callable[[], Any]) -> bool:
+    """Ejecuta la etapa solo si cambio alguna de sus entradas o falta alguna
+    de sus salidas. Las huellas se guardan una vez la etapa termina, para que
+    una ejecucion fallida se repita la proxima vez.
+    """
+    huellas = leer_parquet(RUTA_HUELLAS, ESQUEMA_HUELLAS)
+    anteriores = huellas.filter(pl.col("etapa") == etapa.nombre)
+    actuales = huellas_entradas(etapa, anteriores)
+    razones = razones_reconstruccion(etapa, actuales, anteriores)
+
+    if not razones:
+        logger.info(f"Etapa {etapa.nombre} sin cambios, se omite.")
+    else:
+        logger.info(
+            utils.limpiar_espacios_log(
+                f"""
+                Ejecutando etapa {etapa.nombre}: {"; ".join(razones)}.
+                """
+            )
+        )
+        funcion()
+        guardar_parquet(
+            pl.concat([huellas.filter(pl.col("etapa") != etapa.nombre), actuales]),
+            RUTA_HUELLAS,
+        )
+
+    registrar_traza(etapa.nombre, razones)
+    return bool(razones)
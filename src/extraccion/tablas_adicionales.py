@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import polars as pl
+import xlwings as xw
+
+from src import espacio_trabajo as et
+from src import tareas
+from src.configuracion import configuracion
+from src.logger_config import logger
+
+# Tablas adicionales calculadas durante la corrida, por espacio de trabajo,
+# archivo de segmentacion y hoja. Se usan en lugar de la hoja del Excel.
+registro: dict[tuple[str, str, str], pl.DataFrame] = {}
+
+# Excel no admite llamadas concurrentes, las hojas se escriben de a una. Las
+# lecturas del archivo pasan por el mismo pool, despues de las escrituras pendientes
+pool_excel = ThreadPoolExecutor(
+    1, thread_name_prefix="adds_excel", initializer=tareas.inicializar_com
+)
+
+
+def crear_hoja_segmentacion(df: pl.DataFrame, nombre_hoja: str, path_segm: str) -> None:
+    xw.Book(f"{os.getcwd()}/{path_segm}").set_mock_caller()
+    wb = xw.Book.caller()
+
+    try:
+        wb.sheets.add(name=nombre_hoja)
+    except ValueError:
+        wb.sheets[nombre_hoja].delete()
+        wb.sheets.add(name=nombre_hoja)
+
+    wb.sheets[nombre_hoja].range("A1:A500").number_format = "@"
+    wb.sheets[nombre_hoja].range("B1:B500").number_format = "@"
+    wb.sheets[nombre_hoja]["A1"].options(index=False).value = df.to_pandas()
+
+    wb.save()
+    wb.close()
+
+
+def reportar_error_excel(futuro: Future[None]) -> None:
+    error = futuro.exception()
+    if error is not None:
+        logger.error(f"No se pudo guardar la tabla adicional en el Excel: {error}")
+
+
+def registrar(
+    nombre_hoja: str, df: pl.DataFrame, path_segm: str
+) -> Future[None] | None:
+    """La tabla queda disponible de inmediato para las queries. Guardarla en
+    el Excel de segmentacion es opcional y no se espera.
+    """
+    registro[(et.raiz_actual.get(), path_segm, nombre_hoja)] = df
+    logger.debug(f"Tabla adicional {nombre_hoja} registrada en memoria.")
+
+    if not configuracion.adds_segmentacion_excel:
+        return None
+    futuro = pool_excel.submit(crear_hoja_segmentacion, df, nombre_hoja, path_segm)
+    futuro.add_done_callback(reportar_error_excel)
+    return futuro
+
+
+def limpiar_registro() -> None:
+    """Quita las tablas del espacio de trabajo actual, para que una corrida
+    no use las calculadas en la anterior.
+    """
+    raiz = et.raiz_actual.get()
+    for llave in [llave for llave in registro if llave[0] == raiz]:
+        del registro[llave]
+
+
+def hojas_registradas(path_segm: str) -> list[str]:
+    return [
+        hoja
+        for raiz, path, hoja in registro
+        if raiz == et.raiz_actual.get() and path == path_segm
+    ]
+
+
+def leer_excel(path_segm: str, hojas: list[str]) -> dict[str, pl.DataFrame]:
+    return pl.read_excel(path_segm, sheet_id=None, sheet_name=hojas)
+
+
+def leer_hojas(path_segm: str, hojas: list[str]) -> dict[str, pl.DataFrame]:
+    """Solo se leen del Excel las hojas que no estan registradas en memoria."""
+    registradas = {
+        hoja: registro[(et.raiz_actual.get(), path_segm, hoja)]
+        for hoja in hojas_registradas(path_segm)
+        if hoja in hojas
+    }
+    faltantes = [hoja for hoja in hojas if hoja not in registradas]
+    leidas = (
+        pool_excel.submit(leer_excel, path_segm, faltantes).result()
+        if faltantes
+        else {}
+    )
+    return {
+        hoja: registradas[hoja] if hoja in registradas else leidas[hoja]
+        for hoja in hojas
+    }
@@ -4,17 +4,28 @@ from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from typing import Literal
 
+import duckdb
 import pandas as pd
 import polars as pl
 import teradatasql as td
 from tqdm import tqdm
 
-from src import utils
+from src import espacio_trabajo as et
+from src import metricas, utils
 from src.configuracion import configuracion
+from src.extraccion import tablas_adicionales, teradata_local
 from src.logger_config import logger
 from src.models import Parametros
 
+ERRORES_QUERY = (td.OperationalError, duckdb.Error)
 
+type Conexion = (
+    tuple[td.TeradataConnection, td.TeradataCursor]
+    | tuple[duckdb.DuckDBPyConnection, teradata_local.CursorLocal]
+)
+
+
+@metricas.instrumentar()
 async def correr_query(
     file_path: str, save_path: str, save_format: str, p: Parametros
 ) -> None:
@@ -43,6 +54,7 @@ async def correr_query(
                 pl.all(),
             )
 
+    metricas.reportar(filas_salida=df.height, detalle=file_path)
     await guardar_resultado(df, save_path, save_format, tipo_query)
 
 
@@ -67,15 +79,18 @@ async def obtener_segmentaciones(
         logger.error(f"No se encuentra el archivo {path_archivo_segm}.")
         raise
 
+    # Las tablas calculadas en la corrida que aun no estan en el Excel van al final
+    hojas_segm += [
+        hoja
+        for hoja in tablas_adicionales.hojas_registradas(path_archivo_segm)
+        if hoja not in hojas_segm
+    ]
     if hojas_segm:
         await verificar_nombre_hojas_segmentacion(hojas_segm)
 
     hojas_query = [hoja for hoja in hojas_segm if tipo_query[0] in hoja.split("_")[1]]
 
-    return [
-        pl.read_excel(path_archivo_segm, sheet_name=hoja_query)
-        for hoja_query in hojas_query
-    ]
+    return list(tablas_adicionales.leer_hojas(path_archivo_segm, hojas_query).values())
 
 
 def reemplazar_parametros_queries(queries: str, p: Parametros) -> str:
@@ -93,7 +108,7 @@ async def ejecutar_queries(
     fechas_chunks: list[tuple[date, date]],
     segm: list[pl.DataFrame],
 ) -> pl.DataFrame:
-    con, cur = conectar_teradata()
+    con, cur = conectar()
 
     loop = asyncio.get_running_loop()
     executor = ThreadPoolExecutor()
@@ -111,25 +126,28 @@ async def ejecutar_queries(
                 await loop.run_in_executor(executor, cur.executemany, query, add.rows())
                 add_num += 1
 
-        except td.OperationalError:
+        except ERRORES_QUERY:
             logger.error(utils.limpiar_espacios_log(f"Error en {query[:100]}"))
             raise
 
-    resultado = pl.read_database(queries[-1], con)
-    return pl.DataFrame(utils.lowercase_columns(resultado))
+    return pl.DataFrame(utils.lowercase_columns(leer_resultado(queries[-1], con)))
 
 
 def ejecutar_query_de_procesamiento(
-    cur: td.TeradataCursor, query: str, particiones_fechas: list[tuple[date, date]]
+    cur: td.TeradataCursor | teradata_local.CursorLocal,
+    query: str,
+    particiones_fechas: list[tuple[date, date]],
 ) -> None:
     if "{chunk_ini}" in query:
         ejecutar_query_particionado_en_fechas(cur, query, particiones_fechas)
     else:
-        cur.execute(query)  # type: ignore
+        cur.execute(query)
 
 
 def ejecutar_query_particionado_en_fechas(
-    cur: td.TeradataCursor, query: str, particiones_fechas: list[tuple[date, date]]
+    cur: td.TeradataCursor | teradata_local.CursorLocal,
+    query: str,
+    particiones_fechas: list[tuple[date, date]],
 ) -> None:
     for chunk_ini, chunk_fin in tqdm(particiones_fechas):
         cur.execute(
@@ -137,7 +155,7 @@ def ejecutar_query_particionado_en_fechas(
                 chunk_ini=chunk_ini.strftime(format="%Y%m"),
                 chunk_fin=chunk_fin.strftime(format="%Y%m"),
             )
-        )  # type: ignore
+        )
 
 
 async def verificar_tabla_a_cargar(query: str, add: pl.DataFrame) -> pl.DataFrame:
@@ -147,6 +165,20 @@ async def verificar_tabla_a_cargar(query: str, add: pl.DataFrame) -> pl.DataFram
     return add
 
 
+def conectar() -> Conexion:
+    if configuracion.teradata_backend == "local":
+        return teradata_local.conectar()
+    return conectar_teradata()
+
+
+def leer_resultado(
+    query: str, con: td.TeradataConnection | duckdb.DuckDBPyConnection
+) -> pl.DataFrame:
+    if isinstance(con, duckdb.DuckDBPyConnection):
+        return teradata_local.leer_resultado(query, con)
+    return pl.read_database(query, con)
+
+
 def conectar_teradata() -> tuple[td.TeradataConnection, td.TeradataCursor]:
     creds = {
         "host": configuracion.teradata_host,
@@ -199,12 +231,14 @@ async def guardar_resultado(
 ) -> None:
     # Para poder visualizarlo facil, en caso de ser necesario
     if tipo_query != "otro" and save_format != "csv":
-        df.write_csv(f"{save_path}.csv", separator="\t")
+        df.write_csv(et.ruta_salida(f"{save_path}.csv"), separator="\t")
+        et.deduplicar(et.ruta(f"{save_path}.csv"))
 
     if save_format == "parquet":
-        df.write_parquet(f"{save_path}.parquet")
+        df.write_parquet(et.ruta_salida(f"{save_path}.parquet"))
     elif save_format in ("csv", "txt"):
-        df.write_csv(f"{save_path}.{save_format}", separator="\t")
+        df.write_csv(et.ruta_salida(f"{save_path}.{save_format}"), separator="\t")
+    et.deduplicar(et.ruta(f"{save_path}.{save_format}"))
 
     logger.success(f"Datos almacenados en {save_path}.{save_format}.")
 
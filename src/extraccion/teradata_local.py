@@ -0,0 +1,100 @@
+import glob
+import os
+import re
+from collections.abc import Iterable
+from typing import Any
+
+import duckdb
+import polars as pl
+
+from src.configuracion import configuracion
+from src.logger_config import logger
+
+# DuckDB ya soporta QUALIFY, LAST_DAY, GREATEST, la aritmetica de fechas y las
+# referencias a alias dentro del mismo SELECT; solo se traduce lo propio de
+# Teradata que no entiende
+TRADUCCIONES = [
+    (r"\bCREATE\s+(?:MULTISET\s+|SET\s+)?VOLATILE\s+TABLE\b", "CREATE TEMP TABLE"),
+    (r"\bON\s+COMMIT\s+PRESERVE\s+ROWS\b", ""),
+    (r"\b(?:NO\s+)?PRIMARY\s+INDEX\s*\([^)]*\)", ""),
+    (r"\bWITH\s+(?:NO\s+)?DATA\b", ""),
+    (r"^\s*SEL\b", "SELECT"),
+]
+
+MACROS = {
+    "zeroifnull(x)": "COALESCE(x, 0)",
+    "nullifzero(x)": "NULLIF(x, 0)",
+    "add_months(fecha, meses)": "CAST(fecha + TO_MONTHS(CAST(meses AS INT)) AS DATE)",
+}
+
+
+def traducir_query(query: str) -> str:
+    if re.search(r"^\s*COLLECT\s+STAT", query, flags=re.IGNORECASE | re.MULTILINE):
+        return ""
+    for patron, reemplazo in TRADUCCIONES:
+        query = re.sub(patron, reemplazo, query, flags=re.IGNORECASE | re.MULTILINE)
+    return query
+
+
+def tiene_sentencia(query: str) -> bool:
+    return bool(re.sub(r"--[^\n]*", "", query).strip())
+
+
+class CursorLocal:
+    """Cursor con la misma interfaz que usa la extraccion del de teradatasql,
+    que traduce cada query antes de ejecutarla. Usa la misma conexion y no un
+    cursor de DuckDB, porque las tablas temporales son propias de cada conexion.
+    """
+
+    def __init__(self, con: duckdb.DuckDBPyConnection) -> None:
+        self.con = con
+
+    def execute(self, query: str) -> None:
+        traducida = traducir_query(query)
+        if tiene_sentencia(traducida):
+            self.con.execute(traducida)
+
+    def executemany(self, query: str, filas: Iterable[tuple[Any, ...]]) -> None:
+        self.con.executemany(traducir_query(query), list(filas))
+
+
+def rutas_esquemas(carpeta: str) -> dict[str, str]:
+    return {
+        os.path.splitext(os.path.basename(ruta))[0]: ruta
+        for ruta in sorted(glob.glob(f"{carpeta}/*.duckdb"))
+    }
+
+
+def conectar() -> tuple[duckdb.DuckDBPyConnection, CursorLocal]:
+    """Cada archivo de la carpeta local se adjunta como un esquema, para que
+    las tablas se lean con el mismo nombre que en Teradata.
+    """
+    carpeta = configuracion.teradata_local_ruta
+    esquemas = rutas_esquemas(carpeta)
+    if not esquemas:
+        logger.warning(f"No hay tablas locales de Teradata en {carpeta}.")
+
+    con = duckdb.connect()
+    for esquema, ruta in esquemas.items():
+        # Solo lectura, para que varias corridas puedan usar los mismos archivos
+        con.execute(f"ATTACH '{ruta}' AS {esquema} (READ_ONLY)")
+    for firma, cuerpo in MACROS.items():
+        con.execute(f"CREATE MACRO {firma} AS {cuerpo}")
+    return con, CursorLocal(con)
+
+
+def leer_resultado(query: str, con: duckdb.DuckDBPyConnection) -> pl.DataFrame:
+    return con.execute(traducir_query(query)).pl()
+
+
+def cargar_tablas(tablas: dict[str, pl.DataFrame], carpeta: str | None = None) -> None:
+    """Crea o reemplaza tablas locales. Las llaves son nombres completos de
+    Teradata, por ejemplo "mdb_seguros_colombia.v_dia".
+    """
+    carpeta = carpeta or configuracion.teradata_local_ruta
+    os.makedirs(carpeta, exist_ok=True)
+    for nombre, df in tablas.items():
+        esquema, tabla = nombre.split(".")
+        with duckdb.connect(f"{carpeta}/{esquema}.duckdb") as con:
+            con.register("df", df)
+            con.execute(f"CREATE OR REPLACE TABLE {tabla} AS SELECT * FROM df")  # noqa: S608
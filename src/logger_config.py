@@ -1,4 +1,6 @@
 import asyncio
+import threading
+from collections import deque
 from typing import Any
 
 from loguru import logger
@@ -23,13 +25,94 @@ prod = logger.add(
     format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
 )
 
-log_queue: asyncio.Queue[Any] = asyncio.Queue()
+CAPACIDAD_CLIENTE = 1000
+CAPACIDAD_HISTORIAL = 200
 
 
-async def log_handler(message):
-    asyncio.create_task(log_queue.put(message))
+class ClienteLogs:
+    """Buffer circular de una conexion. Si el cliente no alcanza a leer,
+    se descartan los mensajes mas antiguos.
+    """
 
+    def __init__(self, loop: asyncio.AbstractEventLoop, capacidad: int) -> None:
+        self.loop = loop
+        self.buffer: deque[dict[str, str]] = deque(maxlen=capacidad)
+        self.descartados = 0
+        self.evento = asyncio.Event()
+        self.lock = threading.Lock()
 
-logger.add(log_handler, level="INFO")
+    def agregar(self, registro: dict[str, str]) -> None:
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.descartados += 1
+            estaba_vacio = not self.buffer
+            self.buffer.append(registro)
+
+        # Solo se despierta al cliente cuando pasa de vacio a tener mensajes
+        if estaba_vacio:
+            try:
+                self.loop.call_soon_threadsafe(self.evento.set)
+            except RuntimeError:
+                pass  # El loop del cliente ya se cerro
+
+    async def siguiente_lote(
+        self, espera: float = 0.2, timeout: float = 1
+    ) -> tuple[list[dict[str, str]], int]:
+        """Espera mensajes y los entrega agrupados, junto con el numero de
+        mensajes descartados desde el ultimo lote.
+        """
+        try:
+            await asyncio.wait_for(self.evento.wait(), timeout)
+        except TimeoutError:
+            return [], 0
+        await asyncio.sleep(espera)
+
+        with self.lock:
+            self.evento.clear()
+            registros, descartados = list(self.buffer), self.descartados
+            self.buffer.clear()
+            self.descartados = 0
+        return registros, descartados
+
+
+class DifusorLogs:
+    def __init__(
+        self,
+        capacidad_cliente: int = CAPACIDAD_CLIENTE,
+        capacidad_historial: int = CAPACIDAD_HISTORIAL,
+    ) -> None:
+        self.capacidad_cliente = capacidad_cliente
+        self.historial: deque[dict[str, str]] = deque(maxlen=capacidad_historial)
+        self.clientes: set[ClienteLogs] = set()
+        self.lock = threading.Lock()
+
+    def publicar(self, message: Any) -> None:
+        registro = {
+            "nivel": message.record["level"].name,
+            "fecha_hora": message.record["time"].strftime("%Y-%m-%d %H:%M:%S"),
+            "mensaje": message.record["message"],
+        }
+        with self.lock:
+            self.historial.append(registro)
+            clientes = list(self.clientes)
+        for cliente in clientes:
+            cliente.agregar(registro)
+
+    def suscribir(self, loop: asyncio.AbstractEventLoop) -> ClienteLogs:
+        cliente = ClienteLogs(loop, self.capacidad_cliente)
+        with self.lock:
+            for registro in self.historial:
+                cliente.agregar(registro)
+            self.clientes.add(cliente)
+        return cliente
+
+    def desuscribir(self, cliente: ClienteLogs) -> None:
+        with self.lock:
+            self.clientes.discard(cliente)
+
+
+difusor_logs = DifusorLogs()
+
+logger.add(difusor_logs.publicar, level="INFO")
 
 __all__ = ["logger"]
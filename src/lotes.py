@@ -0,0 +1,281 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import polars as pl
+
+from src import constantes as ct
+from src import ejecucion, main, utils
+from src.configuracion import configuracion
+from src.controles_informacion import generacion as ctrl
+from src.logger_config import logger
+from src.metodos_plantilla import resultados
+from src.models import Lote, Parametros, TrabajoLote
+
+RUTA_LOTES = "data/lotes"
+ARCHIVOS_RAW: list[ct.LISTA_QUERIES] = ["siniestros", "primas", "expuestos"]
+ESTADOS_CUADRE = ["pre_cuadre_contable", "post_cuadre_contable", "post_ajustes_fraude"]
+
+type ResultadoTrabajo = dict[str, str | int | float]
+
+
+def inicializar_proceso() -> None:
+    """Cada trabajo ya tiene su propio directorio, por lo que los espacios de
+    trabajo por sesion no aplican dentro de un lote.
+    """
+    configuracion.espacios_aislados = False
+    ejecucion.usar_hilos()
+
+
+def parametros_trabajo(trabajos: list[TrabajoLote]) -> Parametros:
+    """Parametros que cubren el rango de meses de todos los trabajos."""
+    return Parametros(
+        negocio=trabajos[0].negocio,
+        mes_inicio=min(t.mes_inicio for t in trabajos),
+        mes_corte=max(t.mes_corte for t in trabajos),
+        tipo_analisis=trabajos[0].tipo_analisis,
+        nombre_plantilla="lote",
+        session_id="lote",
+    )
+
+
+def nombre_trabajo(trabajo: TrabajoLote) -> str:
+    return (
+        f"{trabajo.negocio}_{trabajo.mes_inicio}_{trabajo.mes_corte}"
+        f"_{trabajo.tipo_analisis}"
+    )
+
+
+def agrupar_extracciones(trabajos: list[TrabajoLote]) -> list[list[TrabajoLote]]:
+    """Agrupa los trabajos de un mismo negocio cuyos rangos de meses se
+    traslapan, para que la informacion de cada grupo se extraiga una sola vez.
+    """
+    grupos: list[list[TrabajoLote]] = []
+    for trabajo in sorted(trabajos, key=lambda t: (t.negocio, t.mes_inicio)):
+        if (
+            grupos
+            and grupos[-1][0].negocio == trabajo.negocio
+            and trabajo.mes_inicio <= max(t.mes_corte for t in grupos[-1])
+        ):
+            grupos[-1].append(trabajo)
+        else:
+            grupos.append([trabajo])
+    return grupos
+
+
+def vincular(origen: str, destino: str) -> None:
+    if not os.path.exists(origen) or os.path.lexists(destino):
+        return
+    try:
+        os.symlink(origen, destino, target_is_directory=os.path.isdir(origen))
+    except OSError:
+        # En Windows crear enlaces puede requerir permisos de administrador
+        if os.path.isdir(origen):
+            shutil.copytree(origen, destino)
+        else:
+            shutil.copy2(origen, destino)
+
+
+def preparar_directorio(ruta: str, negocio: str) -> str:
+    """Cada proceso trabaja en su propia copia de la estructura de carpetas
+    del proyecto, compartiendo los insumos que solo se leen.
+    """
+    for carpeta in ["data/raw", "data/processed", "output"] + [
+        f"data/controles_informacion/{estado}" for estado in ESTADOS_CUADRE
+    ]:
+        os.makedirs(os.path.join(ruta, carpeta), exist_ok=True)
+
+    for compartido in [
+        "data/queries",
+        "data/catalogos",
+        "data/afo",
+        f"data/segmentacion_{negocio}.xlsx",
+        resultados.RUTA_RESULTADOS,
+    ]:
+        vincular(os.path.abspath(compartido), os.path.join(ruta, compartido))
+
+    return ruta
+
+
+async def extraer(p: Parametros) -> None:
+    await main.correr_query_siniestros(p)
+    await main.correr_query_primas(p)
+    await main.correr_query_expuestos(p)
+
+
+def extraer_grupo(grupo: list[TrabajoLote], ruta: str) -> None:
+    os.chdir(ruta)
+    asyncio.run(extraer(parametros_trabajo(grupo)))
+
+
+def filtrar_raw(ruta_raw: str, p: Parametros) -> None:
+    for archivo in ARCHIVOS_RAW:
+        pl.scan_parquet(f"{ruta_raw}/{archivo}.parquet").filter(
+            pl.col("fecha_registro")
+            .dt.month_start()
+            .is_between(
+                utils.yyyymm_to_date(p.mes_inicio), utils.yyyymm_to_date(p.mes_corte)
+            )
+        ).sink_parquet(f"data/raw/{archivo}.parquet")
+
+
+async def generar_controles(p: Parametros) -> None:
+    # Las evidencias requieren capturas de pantalla, por lo que no se generan
+    for archivo in ARCHIVOS_RAW:
+        await ctrl.generar_controles(archivo, p)
+
+
+def generar_resultados(p: Parametros) -> None:
+    if (
+        resultados.leer_manifiesto_resultados()
+        .filter(pl.col("mes_corte") == p.mes_corte)
+        .is_empty()
+    ):
+        logger.warning(
+            utils.limpiar_espacios_log(
+                f"""
+                No hay resultados almacenados para el mes de corte {p.mes_corte},
+                no se genera el informe del actuario responsable.
+                """
+            )
+        )
+        return
+    resultados.generar_informe_actuario_responsable(p.negocio, p.mes_corte)
+
+
+def correr_trabajo(
+    trabajo: TrabajoLote, ruta_raw: str, ruta: str, lote: Lote
+) -> ResultadoTrabajo:
+    s = time.time()
+    os.chdir(ruta)
+    p = parametros_trabajo([trabajo])
+
+    estado = "completado"
+    try:
+        filtrar_raw(ruta_raw, p)
+        main.generar_bases_plantilla(p)
+        if lote.controles:
+            asyncio.run(generar_controles(p))
+        if lote.resultados:
+            generar_resultados(p)
+    except Exception:
+        logger.exception(f"Error en el trabajo {nombre_trabajo(trabajo)}.")
+        estado = "error"
+
+    return trabajo.model_dump() | {
+        "estado": estado,
+        "duracion": time.time() - s,
+        "directorio": ruta,
+    }
+
+
+def enviar_trabajos(
+    pool: Executor,
+    grupo: list[TrabajoLote],
+    ruta_raw: str,
+    raiz: str,
+    lote: Lote,
+) -> list[Future[ResultadoTrabajo]]:
+    return [
+        pool.submit(
+            correr_trabajo,
+            trabajo,
+            ruta_raw,
+            preparar_directorio(f"{raiz}/{nombre_trabajo(trabajo)}", trabajo.negocio),
+            lote,
+        )
+        for trabajo in grupo
+    ]
+
+
+def trabajos_sin_extraccion(
+    grupo: list[TrabajoLote], ruta: str
+) -> list[Future[ResultadoTrabajo]]:
+    """Si la extraccion de un grupo falla, sus trabajos quedan con error sin
+    detener los demas grupos.
+    """
+    futuros: list[Future[ResultadoTrabajo]] = []
+    for trabajo in grupo:
+        futuro: Future[ResultadoTrabajo] = Future()
+        futuro.set_result(
+            trabajo.model_dump()
+            | {"estado": "error", "duracion": 0.0, "directorio": ruta}
+        )
+        futuros.append(futuro)
+    return futuros
+
+
+def correr_grupos(
+    pool: Executor, grupos: list[list[TrabajoLote]], raiz: str, lote: Lote
+) -> list[Future[ResultadoTrabajo]]:
+    """Los trabajos de cada grupo se envian apenas termina su extraccion."""
+    if not lote.extraer:
+        ruta_raw = os.path.abspath("data/raw")
+        return [
+            futuro
+            for grupo in grupos
+            for futuro in enviar_trabajos(pool, grupo, ruta_raw, raiz, lote)
+        ]
+
+    extracciones = {}
+    for grupo in grupos:
+        p = parametros_trabajo(grupo)
+        ruta = preparar_directorio(
+            f"{raiz}/extraccion_{p.negocio}_{p.mes_inicio}_{p.mes_corte}", p.negocio
+        )
+        extracciones[pool.submit(extraer_grupo, grupo, ruta)] = (grupo, ruta)
+
+    futuros = []
+    for extraccion in as_completed(extracciones):
+        grupo, ruta = extracciones[extraccion]
+        if extraccion.exception() is not None:
+            logger.opt(exception=extraccion.exception()).error(
+                f"Error en la extraccion de {ruta}."
+            )
+            futuros += trabajos_sin_extraccion(grupo, ruta)
+            continue
+        futuros += enviar_trabajos(pool, grupo, f"{ruta}/data/raw", raiz, lote)
+    return futuros
+
+
+def correr_lote(lote: Lote, ruta_lotes: str = RUTA_LOTES) -> pl.DataFrame:
+    s = time.time()
+    raiz = os.path.abspath(f"{ruta_lotes}/{datetime.now():%Y%m%d_%H%M%S}")
+    grupos = agrupar_extracciones(lote.trabajos)
+
+    logger.info(
+        utils.limpiar_espacios_log(
+            f"""
+            Corriendo lote de {len(lote.trabajos)} trabajos con
+            {len(grupos)} extracciones en {raiz}...
+            """
+        )
+    )
+
+    # spawn evita heredar el estado del servidor y de las conexiones abiertas
+    with ProcessPoolExecutor(
+        lote.max_procesos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=inicializar_proceso,
+    ) as pool:
+        resumen = pl.DataFrame(
+            [futuro.result() for futuro in correr_grupos(pool, grupos, raiz, lote)]
+        )
+
+    resumen.write_parquet(f"{raiz}/resumen.parquet")
+
+    num_errores = resumen.filter(pl.col("estado") == "error").height
+    (logger.success if num_errores == 0 else logger.warning)(
+        utils.limpiar_espacios_log(
+            f"""
+            Lote terminado en {time.time() - s:.2f} segundos,
+            con {num_errores} trabajos con error.
+            """
+        )
+    )
+
+    return resumen
@@ -1,18 +1,31 @@
 import polars as pl
 from teradatasql import OperationalError
 
-from src import utils
+from src import ejecucion, etapas, tareas, utils
+from src import espacio_trabajo as et
 from src.controles_informacion import generacion as ctrl
 from src.controles_informacion.evidencias import generar_evidencias_parametros
+from src.extraccion import tablas_adicionales
 from src.extraccion.tera_connect import correr_query
 from src.logger_config import logger
-from src.models import Parametros
+from src.metodos_plantilla import abrir, generar, preparar, resultados
+from src.metodos_plantilla import almacenar_analisis as almacenar
+from src.metodos_plantilla.guardar_traer import (
+    guardar_apertura,
+    traer_apertura,
+    traer_guardar_todo,
+)
+from src.models import Etapa, ModosPlantilla, Parametros
 from src.procesamiento import base_primas_expuestos as bpdn
 from src.procesamiento import base_siniestros as bsin
 from src.procesamiento.autonomia import adds, siniestros_gen
 
 
+@et.en_espacio
 async def correr_query_siniestros(p: Parametros) -> None:
+    # La extraccion empieza por siniestros; desde aqui se registran las tablas
+    # adicionales de la corrida
+    tablas_adicionales.limpiar_registro()
     if p.negocio == "autonomia":
         try:
             await correr_query(
@@ -69,6 +82,7 @@ async def correr_query_siniestros(p: Parametros) -> None:
         )
 
 
+@et.en_espacio
 async def correr_query_primas(p: Parametros) -> None:
     if p.negocio == "autonomia":
         await adds.sap_primas_ced(p.mes_corte)
@@ -77,6 +91,7 @@ async def correr_query_primas(p: Parametros) -> None:
     )
 
 
+@et.en_espacio
 async def correr_query_expuestos(p: Parametros) -> None:
     await correr_query(
         f"data/queries/{p.negocio}/expuestos.sql",
@@ -86,30 +101,103 @@ async def correr_query_expuestos(p: Parametros) -> None:
     )
 
 
+@et.en_espacio
 async def generar_controles(p: Parametros) -> None:
+    tareas.reportar_progreso(0, "siniestros")
     await ctrl.generar_controles("siniestros", p)
+    tareas.reportar_progreso(1 / 3, "primas")
     await ctrl.generar_controles("primas", p)
+    tareas.reportar_progreso(2 / 3, "expuestos")
     await ctrl.generar_controles("expuestos", p)
 
     await generar_evidencias_parametros(p.negocio, p.mes_corte)
 
 
+def etapa_bases_plantilla(p: Parametros) -> Etapa:
+    return Etapa(
+        nombre="bases_plantilla",
+        entradas=[
+            "data/raw/siniestros.parquet",
+            "data/raw/primas.parquet",
+            "data/raw/expuestos.parquet",
+            f"data/segmentacion_{p.negocio}.xlsx",
+        ]
+        + etapas.archivos_codigo(bsin, bpdn),
+        parametros=p.model_dump(
+            include={"negocio", "mes_inicio", "mes_corte", "tipo_analisis"}
+        ),
+        salidas=preparar.BASES_PLANTILLA,
+    )
+
+
 def generar_bases_plantilla(p: Parametros) -> None:
     base_triangulos, base_ult_ocurr, base_atipicos = bsin.generar_bases_siniestros(
-        pl.scan_parquet("data/raw/siniestros.parquet"),
+        pl.scan_parquet(et.ruta("data/raw/siniestros.parquet")),
         p.tipo_analisis,
         utils.yyyymm_to_date(p.mes_inicio),
         utils.yyyymm_to_date(p.mes_corte),
     )
 
-    base_triangulos.write_parquet("data/processed/base_triangulos.parquet")
-    base_ult_ocurr.write_parquet("data/processed/base_ultima_ocurrencia.parquet")
-    base_atipicos.write_parquet("data/processed/base_atipicos.parquet")
+    base_triangulos.write_parquet(et.ruta("data/processed/base_triangulos.parquet"))
+    base_ult_ocurr.write_parquet(
+        et.ruta("data/processed/base_ultima_ocurrencia.parquet")
+    )
+    base_atipicos.write_parquet(et.ruta("data/processed/base_atipicos.parquet"))
 
     bpdn.generar_base_primas_expuestos(
-        pl.scan_parquet("data/raw/primas.parquet"), "primas", p.negocio
-    ).write_parquet("data/processed/primas.parquet")
+        pl.scan_parquet(et.ruta("data/raw/primas.parquet")), "primas", p.negocio
+    ).write_parquet(et.ruta("data/processed/primas.parquet"))
 
     bpdn.generar_base_primas_expuestos(
-        pl.scan_parquet("data/raw/expuestos.parquet"), "expuestos", p.negocio
-    ).write_parquet("data/processed/expuestos.parquet")
+        pl.scan_parquet(et.ruta("data/raw/expuestos.parquet")), "expuestos", p.negocio
+    ).write_parquet(et.ruta("data/processed/expuestos.parquet"))
+
+
+@et.en_espacio
+def abrir_plantilla(p: Parametros) -> None:
+    _ = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
+
+
+@et.en_espacio
+def preparar_plantilla(p: Parametros) -> None:
+    etapas.correr_etapa(
+        etapa_bases_plantilla(p),
+        lambda: ejecucion.ejecutor.ejecutar(
+            generar_bases_plantilla, Parametros.model_validate(p.model_dump())
+        ),
+    )
+    tareas.reportar_progreso(0.5, "Bases generadas")
+    wb = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
+    preparar.preparar_plantilla(wb, p.mes_corte, p.tipo_analisis, p.negocio)
+
+
+@et.en_espacio
+async def modos_plantilla(p: Parametros, modos: ModosPlantilla) -> None:
+    wb = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
+
+    if modos.modo == "generar":
+        if modos.plantilla == "severidad":
+            modos_frec = modos.model_copy(update={"plantilla": "frecuencia"})
+            generar.generar_plantilla(
+                wb, p.negocio, modos_frec, p.mes_corte, solo_triangulo=True
+            )
+        generar.generar_plantilla(wb, p.negocio, modos, p.mes_corte)
+    elif modos.modo == "guardar":
+        guardar_apertura.guardar_apertura(wb, modos)
+    elif modos.modo == "traer":
+        traer_apertura.traer_apertura(wb, modos)
+    elif modos.modo in ("traer_guardar_todo", "guardar_todo"):
+        traer = True if modos.modo == "traer_guardar_todo" else False
+        await traer_guardar_todo.traer_y_guardar_todas_las_aperturas(
+            wb, modos, p.mes_corte, p.negocio, traer
+        )
+
+
+@et.en_espacio
+def almacenar_analisis(p: Parametros) -> None:
+    wb = abrir.abrir_plantilla(f"plantillas/{p.nombre_plantilla}.xlsm")
+    almacenar.almacenar_analisis(wb, p.nombre_plantilla, p.mes_corte)
+
+
+def actualizar_wb_resultados(incremental: bool) -> None:
+    _ = resultados.actualizar_wb_resultados(incremental)
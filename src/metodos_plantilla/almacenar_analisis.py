@@ -2,10 +2,12 @@ import time
 
 import xlwings as xw
 
-from src import utils
+from src import metricas, utils
 from src.logger_config import logger
+from src.metodos_plantilla import resultados
 
 
+@metricas.instrumentar()
 def almacenar_analisis(wb: xw.Book, nombre_plantilla: str, mes_corte: int) -> None:
     s = time.time()
 
@@ -18,8 +20,7 @@ def almacenar_analisis(wb: xw.Book, nombre_plantilla: str, mes_corte: int) -> No
     if df_resultados_atipicos.shape[0] != 0:
         df_resultados = df_resultados.vstack(df_resultados_atipicos)
 
-    ruta = f"output/resultados/{nombre_plantilla}_{mes_corte}.parquet"
-    df_resultados.write_parquet(ruta)
+    ruta = resultados.registrar_resultados(df_resultados, nombre_plantilla, mes_corte)
 
     logger.success(f"Analisis almacenado en {ruta}.")
     logger.info(f"Tiempo para almacenamiento: {round(time.time() - s, 2)} segundos.")
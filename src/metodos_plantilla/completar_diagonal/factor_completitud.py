@@ -1,114 +1,207 @@
 import polars as pl
 
 from src import constantes as ct
-from src import utils
+from src import espacio_trabajo as et
+from src import metricas, perfiles, utils
 
-from . import chainladder as cl
+COLUMNAS_BASE = ["apertura_reservas", "periodicidad_ocurrencia", "periodo_ocurrencia"]
 
 
+@metricas.instrumentar()
 def calcular_factores_completitud(
     aperturas: pl.LazyFrame, mes_corte: int
 ) -> pl.DataFrame:
     base_triangulos = (
-        pl.scan_parquet("data/processed/base_triangulos.parquet")
+        pl.scan_parquet(et.ruta("data/processed/base_triangulos.parquet"))
         .join(
             aperturas.select(["apertura_reservas", "periodicidad_ocurrencia"]),
             on=["apertura_reservas", "periodicidad_ocurrencia"],
         )
         .filter(pl.col("periodicidad_desarrollo") == "Mensual")
-        .collect()
+        .pipe(agregar_dimensiones_triangulos)
+        .pipe(perfiles.recolectar)
+        .lazy()
     )
 
-    factores_completitud_aperturas = []
-    for apertura in base_triangulos.get_column("apertura_reservas").unique():
-        base_apertura = base_triangulos.filter(pl.col("apertura_reservas") == apertura)
-        periodicidad_apertura = (
-            base_apertura.get_column("periodicidad_ocurrencia").unique().item()
-        )
-        meses_entre_triangulos = ct.PERIODICIDADES[periodicidad_apertura]
+    base_factores_completitud = (
+        base_triangulos.select(COLUMNAS_BASE + ["numero_periodo_ocurrencia"])
+        .unique()
+        .pipe(perfiles.recolectar)
+    )
 
-        base_factores_completitud = (
-            base_apertura.select(
-                ["apertura_reservas", "periodicidad_ocurrencia", "periodo_ocurrencia"]
-            )
-            .unique()
-            .with_columns(
-                numero_periodo_ocurrencia=pl.col("periodo_ocurrencia")
-                .cum_count()
-                .over(
-                    "apertura_reservas",
-                    order_by="periodo_ocurrencia",
-                    descending=True,
-                )
-                - 1
-            )
+    factores_completitud = (
+        base_triangulos.pipe(calcular_factores_desarrollo)
+        .pipe(calcular_factores_acumulados)
+        .pipe(calcular_factor_completitud, mes_corte)
+        .pipe(perfiles.recolectar)
+        .pivot(
+            on="cantidad",
+            index=["apertura_reservas", "numero_periodo_ocurrencia"],
+            values="factor_completitud",
         )
+    )
 
-        for cantidad in ct.COLUMNAS_QTYS[:4]:
-            triangulo = cl.construir_triangulo(base_apertura, cantidad)
-            factores = cl.calcular_factores_desarrollo(
-                triangulo, 1, 12 // meses_entre_triangulos
-            )
-            factores_acumulados = cl.calcular_factores_acumulados(factores)
-
-            factor_completitud = calcular_factor_completitud(
-                factores_acumulados,
-                "promedio_ponderado_ventana",
-                meses_entre_triangulos,
-                cantidad,
-                mes_corte,
-            )
+    return (
+        base_factores_completitud.join(
+            factores_completitud,
+            on=["apertura_reservas", "numero_periodo_ocurrencia"],
+            how="left",
+        )
+        .fill_null(1)
+        .select(
+            COLUMNAS_BASE
+            + [f"factor_completitud_{cantidad}" for cantidad in ct.COLUMNAS_QTYS[:4]]
+        )
+        .sort(["apertura_reservas", "periodo_ocurrencia"])
+    )
 
-            base_factores_completitud = base_factores_completitud.join(
-                factor_completitud, on="numero_periodo_ocurrencia", how="left"
-            ).fill_null(1)
 
-        factores_completitud_aperturas.append(
-            base_factores_completitud.drop("numero_periodo_ocurrencia")
+def agregar_dimensiones_triangulos(base_triangulos: pl.LazyFrame) -> pl.LazyFrame:
+    """Agrega las dimensiones del triangulo de cada apertura, equivalentes a
+    las de la matriz ocurrencias x alturas que se usa en chainladder.
+    """
+    num_columnas = pl.col("num_alturas") + 1
+    return base_triangulos.with_columns(
+        meses_entre_triangulos=pl.col("periodicidad_ocurrencia")
+        .replace_strict(ct.PERIODICIDADES, return_dtype=pl.Int64)
+        .cast(pl.Int64),
+        fila=pl.col("periodo_ocurrencia")
+        .rank("dense")
+        .over("apertura_reservas")
+        .cast(pl.Int64)
+        - 1,
+        num_ocurrencias=pl.col("periodo_ocurrencia")
+        .n_unique()
+        .over("apertura_reservas")
+        .cast(pl.Int64),
+        num_alturas=pl.col("index_desarrollo")
+        .max()
+        .over("apertura_reservas")
+        .cast(pl.Int64),
+    ).with_columns(
+        numero_periodo_ocurrencia=pl.col("num_ocurrencias") - 1 - pl.col("fila"),
+        # Redondeo half-to-even, igual al round de Python
+        relacion_alturas_ocurrencias=pl.when(
+            2 * (num_columnas % pl.col("num_ocurrencias")) > pl.col("num_ocurrencias")
+        )
+        .then(num_columnas // pl.col("num_ocurrencias") + 1)
+        .when(
+            2 * (num_columnas % pl.col("num_ocurrencias")) == pl.col("num_ocurrencias")
+        )
+        .then(
+            num_columnas // pl.col("num_ocurrencias")
+            + (num_columnas // pl.col("num_ocurrencias")) % 2
         )
+        .otherwise(num_columnas // pl.col("num_ocurrencias")),
+    )
 
-    return pl.concat(factores_completitud_aperturas)
 
+def calcular_factores_desarrollo(base_triangulos: pl.LazyFrame) -> pl.LazyFrame:
+    """Promedio ponderado de la ventana de los ultimos 12 meses (sin incluir
+    la ultima diagonal) para todas las aperturas y cantidades a la vez.
+    """
+    columnas_dimensiones = [
+        "apertura_reservas",
+        "meses_entre_triangulos",
+        "num_alturas",
+    ]
 
-def calcular_factor_completitud(
-    factores_acumulados: pl.DataFrame,
-    factor_seleccionado: str,
-    meses_entre_triangulos: int,
-    cantidad: str,
-    mes_corte: int,
-) -> pl.DataFrame:
-    tabla_factor_seleccionado = factores_acumulados.select(
-        ["altura", factor_seleccionado]
+    cantidades = base_triangulos.unpivot(
+        index=columnas_dimensiones
+        + [
+            "num_ocurrencias",
+            "relacion_alturas_ocurrencias",
+            "fila",
+            "periodo_ocurrencia",
+            "index_desarrollo",
+        ],
+        on=ct.COLUMNAS_QTYS[:4],
+        variable_name="cantidad",
+        value_name="valor",
+    )
+
+    inicio_ventana = (
+        pl.col("num_ocurrencias")
+        - 1
+        - pl.col("altura") // pl.col("relacion_alturas_ocurrencias")
+    )
+
+    sumas_ventana = (
+        cantidades.sort(
+            ["apertura_reservas", "cantidad", "periodo_ocurrencia", "index_desarrollo"]
+        )
+        .with_columns(
+            valor_siguiente=pl.col("valor")
+            .shift(-1)
+            .over(["apertura_reservas", "cantidad", "periodo_ocurrencia"]),
+            altura=pl.col("index_desarrollo") - 1,
+        )
+        .filter(
+            pl.col("valor_siguiente").is_not_null()
+            & (pl.col("fila") < inicio_ventana)
+            & (
+                pl.col("fila")
+                >= inicio_ventana - 12 // pl.col("meses_entre_triangulos")
+            )
+        )
+        .group_by(["apertura_reservas", "cantidad", "altura"])
+        .agg(pl.sum("valor"), pl.sum("valor_siguiente"))
+    )
+
+    alturas = (
+        cantidades.select(columnas_dimensiones + ["cantidad"])
+        .unique()
+        .with_columns(altura=pl.int_ranges(0, pl.col("num_alturas") - 1))
+        .explode("altura")
+        .drop_nulls("altura")
+    )
+
+    return alturas.join(
+        sumas_ventana, on=["apertura_reservas", "cantidad", "altura"], how="left"
     ).with_columns(
-        mes_del_periodo=pl.col("altura") % meses_entre_triangulos + 1,
-        numero_periodo_ocurrencia=pl.col("altura") // meses_entre_triangulos,
+        factor=pl.when(pl.col("valor").is_null() | (pl.col("valor") == 0))
+        .then(1.0)
+        .otherwise(pl.col("valor_siguiente") / pl.col("valor"))
     )
 
-    factor_acumulado_ultimo_mes = tabla_factor_seleccionado.filter(
-        pl.col("mes_del_periodo") == meses_entre_triangulos
+
+def calcular_factores_acumulados(factores_desarrollo: pl.LazyFrame) -> pl.LazyFrame:
+    return factores_desarrollo.sort(
+        ["apertura_reservas", "cantidad", "altura"]
+    ).with_columns(
+        factor_acumulado=pl.col("factor")
+        .cum_prod(reverse=True)
+        .over(["apertura_reservas", "cantidad"])
     )
 
+
+def calcular_factor_completitud(
+    factores_acumulados: pl.LazyFrame, mes_corte: int
+) -> pl.LazyFrame:
+    mes = utils.yyyymm_to_date(mes_corte).month
     return (
-        tabla_factor_seleccionado.join(
-            factor_acumulado_ultimo_mes,
-            on="numero_periodo_ocurrencia",
-            how="left",
-            suffix="_ultimo_mes",
+        factores_acumulados.with_columns(
+            mes_del_periodo=pl.col("altura") % pl.col("meses_entre_triangulos") + 1,
+            numero_periodo_ocurrencia=pl.col("altura")
+            // pl.col("meses_entre_triangulos"),
         )
         .with_columns(
-            (
-                1
-                / (
-                    pl.col(factor_seleccionado)
-                    / pl.col(f"{factor_seleccionado}_ultimo_mes")
-                )
-            ).alias(f"factor_completitud_{cantidad}")
+            factor_acumulado_ultimo_mes=pl.col("factor_acumulado")
+            .filter(pl.col("mes_del_periodo") == pl.col("meses_entre_triangulos"))
+            .first()
+            .over(["apertura_reservas", "cantidad", "numero_periodo_ocurrencia"])
         )
         .filter(
             pl.col("mes_del_periodo")
-            == utils.mes_del_periodo(
-                utils.yyyymm_to_date(mes_corte), 1, meses_entre_triangulos
-            )
+            == (mes - 1) % pl.col("meses_entre_triangulos") + 1
+        )
+        .select(
+            "apertura_reservas",
+            "numero_periodo_ocurrencia",
+            pl.concat_str(pl.lit("factor_completitud_"), pl.col("cantidad")).alias(
+                "cantidad"
+            ),
+            factor_completitud=1
+            / (pl.col("factor_acumulado") / pl.col("factor_acumulado_ultimo_mes")),
         )
-        .select(["numero_periodo_ocurrencia", f"factor_completitud_{cantidad}"])
     )
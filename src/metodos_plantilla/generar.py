@@ -6,12 +6,13 @@ import polars as pl
 import xlwings as xw
 
 import src.constantes as ct
-from src import utils
+from src import metricas, perfiles, utils
 from src.logger_config import logger
 from src.metodos_plantilla import insumos as ins
 from src.models import ModosPlantilla
 
 
+@metricas.instrumentar()
 def generar_plantilla(
     wb: xw.Book,
     negocio: str,
@@ -100,7 +101,7 @@ def crear_triangulo_base_plantilla(
             ),
         )
         .filter((pl.col("atributo") == atributo) & pl.col("cantidad").is_in(cantidades))
-        .collect()
+        .pipe(perfiles.recolectar)
         .to_pandas()
         .pivot(
             index="periodo_ocurrencia",
@@ -2,13 +2,15 @@ import time
 
 import polars as pl
 import xlwings as xw
-from src import utils
+from src import espacio_trabajo as et
+from src import metricas, utils
 from src.logger_config import logger
 from src.models import ModosPlantilla, RangeDimension
 
 from .rangos_parametros import obtener_rangos_parametros
 
 
+@metricas.instrumentar()
 def guardar_apertura(wb: xw.Book, modos: ModosPlantilla) -> None:
     s = time.time()
 
@@ -86,5 +88,5 @@ def guardar_parametros(
         hoja, dimensiones_triangulo, "Ninguna"
     ).items():
         pl.DataFrame(valores_rango.formula).transpose().write_parquet(
-            f"data/db/{apertura}_{atributo}_{hoja.name}_{nombre_rango}.parquet"
+            et.ruta(f"data/db/{apertura}_{atributo}_{hoja.name}_{nombre_rango}.parquet")
         )
@@ -0,0 +1,126 @@
+import hashlib
+import os
+from datetime import datetime
+
+import polars as pl
+from src import espacio_trabajo as et
+from src import perfiles
+from src.metodos_plantilla import insumos as ins
+from src.models import ModosPlantilla
+
+ESQUEMA_MANIFIESTO = pl.Schema(
+    {
+        "apertura": pl.String(),
+        "atributo": pl.String(),
+        "plantilla": pl.String(),
+        "mes_corte": pl.Int32(),
+        "estado": pl.String(),
+        "duracion": pl.Float64(),
+        "hash_parametros": pl.String(),
+        "hash_triangulo": pl.String(),
+        "fecha": pl.Datetime("us"),
+    }
+)
+
+COLUMNAS_LLAVE = ["apertura", "atributo", "plantilla"]
+
+
+def ruta_manifiesto(nombre_plantilla: str) -> str:
+    return et.ruta(
+        f"data/db/manifiesto_{nombre_plantilla.split('.', maxsplit=1)[0]}.parquet"
+    )
+
+
+def leer_manifiesto(nombre_plantilla: str) -> pl.DataFrame:
+    ruta = ruta_manifiesto(nombre_plantilla)
+    if not os.path.exists(ruta):
+        return pl.DataFrame(schema=ESQUEMA_MANIFIESTO)
+    return pl.read_parquet(ruta)
+
+
+def reiniciar_manifiesto(nombre_plantilla: str) -> None:
+    """Al preparar la plantilla se limpia la hoja Resumen, por lo que
+    ninguna apertura guardada anteriormente se puede omitir.
+    """
+    ruta = ruta_manifiesto(nombre_plantilla)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+
+def hash_parametros(apertura: str, atributo: str, hoja: str) -> str:
+    prefijo = f"{apertura}_{atributo}_{hoja}_"
+    archivos = sorted(
+        f for f in os.listdir(et.ruta("data/db")) if f.startswith(prefijo)
+    )
+
+    hash_archivos = hashlib.sha256()
+    for archivo in archivos:
+        hash_archivos.update(archivo.encode())
+        with open(et.ruta(f"data/db/{archivo}"), "rb") as f:
+            hash_archivos.update(f.read())
+
+    return hash_archivos.hexdigest() if archivos else ""
+
+
+def hash_triangulo(apertura: str) -> str:
+    base_apertura = (
+        ins.df_triangulos()
+        .filter(pl.col("apertura_reservas") == apertura)
+        .sort(["periodicidad_ocurrencia", "periodo_ocurrencia", "index_desarrollo"])
+        .pipe(perfiles.recolectar)
+    )
+    return hashlib.sha256(base_apertura.hash_rows().to_numpy().tobytes()).hexdigest()
+
+
+def apertura_sin_cambios(
+    manifiesto: pl.DataFrame, modos: ModosPlantilla, mes_corte: int, hash_tri: str
+) -> bool:
+    registro = manifiesto.filter(
+        (pl.col("apertura") == modos.apertura)
+        & (pl.col("atributo") == modos.atributo)
+        & (pl.col("plantilla") == modos.plantilla)
+    )
+    if registro.is_empty():
+        return False
+
+    registro_dict = registro.row(0, named=True)
+    return (
+        registro_dict["estado"] == "completado"
+        and registro_dict["mes_corte"] == mes_corte
+        and registro_dict["hash_triangulo"] == hash_tri
+        and registro_dict["hash_parametros"]
+        == hash_parametros(modos.apertura, modos.atributo, modos.plantilla.capitalize())
+    )
+
+
+def crear_registro(
+    modos: ModosPlantilla, mes_corte: int, estado: str, duracion: float, hash_tri: str
+) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "apertura": [modos.apertura],
+            "atributo": [modos.atributo],
+            "plantilla": [modos.plantilla],
+            "mes_corte": [mes_corte],
+            "estado": [estado],
+            "duracion": [duracion],
+            "hash_parametros": [
+                hash_parametros(
+                    modos.apertura, modos.atributo, modos.plantilla.capitalize()
+                )
+            ],
+            "hash_triangulo": [hash_tri],
+            "fecha": [datetime.now()],
+        },
+        schema=ESQUEMA_MANIFIESTO,
+    )
+
+
+def registrar_apertura(
+    manifiesto: pl.DataFrame, nombre_plantilla: str, registro: pl.DataFrame
+) -> pl.DataFrame:
+    manifiesto = pl.concat([manifiesto, registro]).unique(
+        subset=COLUMNAS_LLAVE, keep="last", maintain_order=True
+    )
+    manifiesto.write_parquet(ruta_manifiesto(nombre_plantilla))
+    return manifiesto
@@ -2,13 +2,15 @@ import time
 
 import polars as pl
 import xlwings as xw
-from src import utils
+from src import espacio_trabajo as et
+from src import metricas, utils
 from src.logger_config import logger
 from src.models import ModosPlantilla, RangeDimension
 
 from .rangos_parametros import obtener_rangos_parametros
 
 
+@metricas.instrumentar()
 def traer_apertura(wb: xw.Book, modos: ModosPlantilla) -> None:
     s = time.time()
 
@@ -32,7 +34,9 @@ def traer_parametros(
     ).items():
         try:
             range_values.formula = pl.read_parquet(
-                f"data/db/{apertura}_{atributo}_{hoja.name}_{range_name}.parquet"
+                et.ruta(
+                    f"data/db/{apertura}_{atributo}_{hoja.name}_{range_name}.parquet"
+                )
             ).rows()
         except FileNotFoundError:
             logger.exception(
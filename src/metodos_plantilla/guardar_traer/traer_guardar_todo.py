@@ -2,15 +2,17 @@ import asyncio
 import time
 
 import xlwings as xw
-from src import utils
+from src import metricas, tareas, utils
 from src.logger_config import logger
 from src.metodos_plantilla.generar import generar_plantilla
+from src.metodos_plantilla.guardar_traer import manifiesto as mf
 from src.models import ModosPlantilla
 
 from .guardar_apertura import guardar_apertura
 from .traer_apertura import traer_apertura
 
 
+@metricas.instrumentar()
 async def traer_y_guardar_todas_las_aperturas(
     wb: xw.Book,
     modos: ModosPlantilla,
@@ -28,24 +30,48 @@ async def traer_y_guardar_todas_las_aperturas(
     )
     atributos = ["bruto", "retenido"] if hoja_plantilla != "Frecuencia" else ["bruto"]
 
+    manifiesto = mf.leer_manifiesto(wb.name)
+
     num_apertura = 0
+    num_omitidas = 0
     for apertura in aperturas:
+        hash_tri = mf.hash_triangulo(apertura)
         for atributo in atributos:
             modos_actual = modos.model_copy()
             modos_actual.apertura = apertura
             modos_actual.atributo = atributo  # type: ignore
 
-            if modos.plantilla == "severidad":
-                modos_frec = modos_actual.model_copy(
-                    update={"plantilla": "frecuencia", "atributo": "bruto"}
-                )
-                generar_plantilla(
-                    wb, negocio, modos_frec, mes_corte, solo_triangulo=True
+            if mf.apertura_sin_cambios(manifiesto, modos_actual, mes_corte, hash_tri):
+                num_omitidas += 1
+            else:
+                s_apertura = time.time()
+                try:
+                    procesar_apertura(wb, modos_actual, mes_corte, negocio, traer)
+                except Exception:
+                    manifiesto = mf.registrar_apertura(
+                        manifiesto,
+                        wb.name,
+                        mf.crear_registro(
+                            modos_actual,
+                            mes_corte,
+                            "error",
+                            time.time() - s_apertura,
+                            hash_tri,
+                        ),
+                    )
+                    raise
+
+                manifiesto = mf.registrar_apertura(
+                    manifiesto,
+                    wb.name,
+                    mf.crear_registro(
+                        modos_actual,
+                        mes_corte,
+                        "completado",
+                        time.time() - s_apertura,
+                        hash_tri,
+                    ),
                 )
-            generar_plantilla(wb, negocio, modos_actual, mes_corte)
-            if traer:
-                traer_apertura(wb, modos_actual)
-            guardar_apertura(wb, modos_actual)
 
             await asyncio.sleep(0)
 
@@ -58,10 +84,30 @@ async def traer_y_guardar_todas_las_aperturas(
                 )
             )
             num_apertura += 1
+            tareas.reportar_progreso(
+                num_apertura / (len(aperturas) * len(atributos)),
+                f"{apertura} - {atributo}",
+            )
 
     if traer:
         logger.success("Todas las aperturas se han traido y guardado correctamente.")
     else:
         logger.success("Todas las aperturas se han guardado correctamente.")
 
+    logger.info(f"Aperturas omitidas por no tener cambios: {num_omitidas}.")
     logger.info(f"Tiempo total: {round(time.time() - s, 2)} segundos.")
+
+
+@metricas.instrumentar()
+def procesar_apertura(
+    wb: xw.Book, modos: ModosPlantilla, mes_corte: int, negocio: str, traer: bool
+) -> None:
+    if modos.plantilla == "severidad":
+        modos_frec = modos.model_copy(
+            update={"plantilla": "frecuencia", "atributo": "bruto"}
+        )
+        generar_plantilla(wb, negocio, modos_frec, mes_corte, solo_triangulo=True)
+    generar_plantilla(wb, negocio, modos, mes_corte)
+    if traer:
+        traer_apertura(wb, modos)
+    guardar_apertura(wb, modos)
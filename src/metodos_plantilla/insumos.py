@@ -1,21 +1,23 @@
 import polars as pl
 
+from src import espacio_trabajo as et
+
 
 def df_triangulos() -> pl.LazyFrame:
-    return pl.scan_parquet("data/processed/base_triangulos.parquet")
+    return pl.scan_parquet(et.ruta("data/processed/base_triangulos.parquet"))
 
 
 def df_ult_ocurr() -> pl.LazyFrame:
-    return pl.scan_parquet("data/processed/base_ultima_ocurrencia.parquet")
+    return pl.scan_parquet(et.ruta("data/processed/base_ultima_ocurrencia.parquet"))
 
 
 def df_atipicos() -> pl.LazyFrame:
-    return pl.scan_parquet("data/processed/base_atipicos.parquet")
+    return pl.scan_parquet(et.ruta("data/processed/base_atipicos.parquet"))
 
 
 def df_expuestos() -> pl.LazyFrame:
-    return pl.scan_parquet("data/processed/expuestos.parquet")
+    return pl.scan_parquet(et.ruta("data/processed/expuestos.parquet"))
 
 
 def df_primas() -> pl.LazyFrame:
-    return pl.scan_parquet("data/processed/primas.parquet")
+    return pl.scan_parquet(et.ruta("data/processed/primas.parquet"))
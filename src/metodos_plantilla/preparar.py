@@ -5,13 +5,32 @@ import polars as pl
 import xlwings as xw
 
 from src import constantes as ct
-from src import utils
+from src import espacio_trabajo as et
+from src import etapas, metricas, utils
 from src.logger_config import logger
 from src.metodos_plantilla import resultados, tablas_resumen
+from src.models import Etapa
 
 from .completar_diagonal import factor_completitud as compl
-
-
+from .guardar_traer import manifiesto
+
+BASES_PLANTILLA = [
+    "data/processed/base_triangulos.parquet",
+    "data/processed/base_ultima_ocurrencia.parquet",
+    "data/processed/base_atipicos.parquet",
+    "data/processed/primas.parquet",
+    "data/processed/expuestos.parquet",
+]
+RUTAS_TABLAS_RESUMEN = [
+    "data/processed/tabla_resumen.parquet",
+    "data/processed/tabla_atipicos.parquet",
+    "data/processed/tabla_entremes.parquet",
+]
+RUTA_RESULTADOS_ANTERIORES = "data/processed/resultados_anteriores.parquet"
+RUTA_FACTORES_COMPLETITUD = "data/processed/factores_completitud.parquet"
+
+
+@metricas.instrumentar()
 def preparar_plantilla(
     wb: xw.Book,
     mes_corte: int,
@@ -23,11 +42,12 @@ def preparar_plantilla(
     aperturas = utils.obtener_aperturas(negocio, "siniestros")
 
     mostrar_plantillas_relevantes(wb, tipo_analisis)
+    manifiesto.reiniciar_manifiesto(wb.name)
 
-    resumen, atipicos, entremes = tablas_resumen.generar_tablas_resumen(
-        negocio, tipo_analisis, aperturas.lazy()
+    resumen, atipicos, entremes = obtener_tablas_resumen(
+        negocio, tipo_analisis, aperturas
     )
-    resultados_anteriores = resultados.concatenar_archivos_resultados()
+    resultados_anteriores = obtener_resultados_anteriores()
 
     generar_hojas_resumen(wb, resumen, resultados_anteriores, atipicos)
 
@@ -35,8 +55,8 @@ def preparar_plantilla(
         verificar_resultados_anteriores_para_entremes(
             resumen, resultados_anteriores, mes_corte
         )
-        factores_completitud = compl.calcular_factores_completitud(
-            aperturas.lazy(), mes_corte
+        factores_completitud = obtener_factores_completitud(
+            negocio, aperturas, mes_corte
         )
         generar_hoja_entremes(
             wb, entremes, resultados_anteriores, factores_completitud, mes_corte
@@ -46,6 +66,73 @@ def preparar_plantilla(
     logger.info(f"Tiempo de preparacion: {round(time.time() - s, 2)} segundos.")
 
 
+def obtener_tablas_resumen(
+    negocio: str,
+    tipo_analisis: Literal["triangulos", "entremes"],
+    aperturas: pl.DataFrame,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    def generar() -> None:
+        tablas = tablas_resumen.generar_tablas_resumen(
+            negocio, tipo_analisis, aperturas.lazy()
+        )
+        for tabla, ruta in zip(tablas, RUTAS_TABLAS_RESUMEN, strict=True):
+            tabla.write_parquet(et.ruta(ruta))
+
+    etapas.correr_etapa(
+        Etapa(
+            nombre="tablas_resumen",
+            entradas=BASES_PLANTILLA
+            + [f"data/segmentacion_{negocio}.xlsx"]
+            + etapas.archivos_codigo(tablas_resumen),
+            parametros={"negocio": negocio, "tipo_analisis": tipo_analisis},
+            salidas=RUTAS_TABLAS_RESUMEN,
+        ),
+        generar,
+    )
+
+    resumen, atipicos, entremes = (
+        pl.read_parquet(et.ruta(ruta)) for ruta in RUTAS_TABLAS_RESUMEN
+    )
+    return resumen, atipicos, entremes
+
+
+def obtener_resultados_anteriores() -> pl.DataFrame:
+    # Cada nuevo analisis almacenado cambia el manifiesto de resultados
+    etapas.correr_etapa(
+        Etapa(
+            nombre="resultados_anteriores",
+            entradas=[resultados.RUTA_MANIFIESTO_RESULTADOS]
+            + etapas.archivos_codigo(resultados),
+            salidas=[RUTA_RESULTADOS_ANTERIORES],
+        ),
+        lambda: resultados.concatenar_archivos_resultados().write_parquet(
+            et.ruta(RUTA_RESULTADOS_ANTERIORES)
+        ),
+    )
+    return pl.read_parquet(et.ruta(RUTA_RESULTADOS_ANTERIORES))
+
+
+def obtener_factores_completitud(
+    negocio: str, aperturas: pl.DataFrame, mes_corte: int
+) -> pl.DataFrame:
+    etapas.correr_etapa(
+        Etapa(
+            nombre="factores_completitud",
+            entradas=[
+                "data/processed/base_triangulos.parquet",
+                f"data/segmentacion_{negocio}.xlsx",
+            ]
+            + etapas.archivos_codigo(compl),
+            parametros={"mes_corte": mes_corte},
+            salidas=[RUTA_FACTORES_COMPLETITUD],
+        ),
+        lambda: compl.calcular_factores_completitud(
+            aperturas.lazy(), mes_corte
+        ).write_parquet(et.ruta(RUTA_FACTORES_COMPLETITUD)),
+    )
+    return pl.read_parquet(et.ruta(RUTA_FACTORES_COMPLETITUD))
+
+
 def verificar_resultados_anteriores_para_entremes(
     diagonales: pl.DataFrame, resultados_anteriores: pl.DataFrame, mes_corte: int
 ) -> None:
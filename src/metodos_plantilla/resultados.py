@@ -1,52 +1,488 @@
+import contextlib
 import os
+import time
+import uuid
+from collections.abc import Iterator
+from datetime import datetime
 
+import openpyxl
 import polars as pl
 import xlwings as xw
+from openpyxl.worksheet.worksheet import Worksheet
 
+from src import metricas, perfiles, utils
 from src.logger_config import logger
 
+RUTA_RESULTADOS = "output/resultados"
+RUTA_MANIFIESTO_RESULTADOS = f"{RUTA_RESULTADOS}/manifiesto.parquet"
+# Un bloqueo mas antiguo que esto se considera abandonado por un proceso caido
+ESPERA_MAXIMA_BLOQUEO = 60
+COLUMNAS_DISTINTIVAS = ["apertura_reservas", "mes_corte", "atipico"]
+RUTA_WB_RESULTADOS = "output/resultados.xlsx"
+HOJA_RESULTADOS = "Resultados"
+
+ESQUEMA_MANIFIESTO_RESULTADOS = pl.Schema(
+    {
+        "version": pl.Int64(),
+        "mes_corte": pl.Int32(),
+        "plantilla": pl.String(),
+        "ruta": pl.String(),
+        "fecha": pl.Datetime("us"),
+    }
+)
+
+ESQUEMA_ESTADO_WB = pl.Schema(
+    {"llave": pl.String, "version": pl.Int64, "num_filas": pl.Int64}
+)
+
+
+def leer_manifiesto_resultados() -> pl.DataFrame:
+    if not os.path.exists(RUTA_MANIFIESTO_RESULTADOS):
+        return listar_resultados_sin_manifiesto()
+    return pl.read_parquet(RUTA_MANIFIESTO_RESULTADOS)
+
+
+def guardar_manifiesto_resultados(manifiesto: pl.DataFrame) -> None:
+    ruta_temporal = f"{RUTA_MANIFIESTO_RESULTADOS}.tmp"
+    manifiesto.write_parquet(ruta_temporal)
+    os.replace(ruta_temporal, RUTA_MANIFIESTO_RESULTADOS)
+
+
+def liberar_bloqueo_abandonado(ruta_bloqueo: str) -> None:
+    """Quita el bloqueo si su archivo es mas antiguo que la espera maxima. Se
+    mueve antes de borrarlo, para no borrar uno que otro proceso acabe de crear.
+    """
+    try:
+        antiguedad = time.time() - os.path.getmtime(ruta_bloqueo)
+    except FileNotFoundError:
+        return
+    if antiguedad <= ESPERA_MAXIMA_BLOQUEO:
+        return
+
+    abandonado = f"{ruta_bloqueo}.{uuid.uuid4().hex}"
+    try:
+        os.rename(ruta_bloqueo, abandonado)
+    except FileNotFoundError:
+        return
+    if time.time() - os.path.getmtime(abandonado) <= ESPERA_MAXIMA_BLOQUEO:
+        # Se movio un bloqueo recien creado: se devuelve si nadie tomo otro
+        with contextlib.suppress(FileExistsError):
+            os.link(abandonado, ruta_bloqueo)
+    else:
+        logger.warning(f"Se libera el bloqueo abandonado {ruta_bloqueo}.")
+    os.remove(abandonado)
+
+
+def leer_dueno_bloqueo(ruta_bloqueo: str) -> str | None:
+    try:
+        with open(ruta_bloqueo) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+@contextlib.contextmanager
+def bloquear_manifiesto_resultados() -> Iterator[None]:
+    """Varias tareas o procesos pueden almacenar resultados a la vez. El
+    bloqueo es un archivo creado de forma exclusiva, valido entre procesos,
+    con el proceso que lo tiene, para que solo ese lo libere.
+    """
+    ruta_bloqueo = f"{RUTA_MANIFIESTO_RESULTADOS}.lock"
+    dueno = f"{os.getpid()}_{uuid.uuid4().hex}"
+    while True:
+        try:
+            fd = os.open(ruta_bloqueo, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            liberar_bloqueo_abandonado(ruta_bloqueo)
+            time.sleep(0.05)
+    with os.fdopen(fd, "w") as f:
+        f.write(dueno)
+
+    try:
+        yield
+    finally:
+        if leer_dueno_bloqueo(ruta_bloqueo) == dueno:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(ruta_bloqueo)
+
+
+def listar_resultados_sin_manifiesto() -> pl.DataFrame:
+    """Los resultados almacenados antes de existir el manifiesto quedan
+    como archivos {nombre_plantilla}_{mes_corte}.parquet en la raiz de la
+    carpeta, en el orden de su ultima modificacion. Leerlos no escribe nada:
+    quedan en el manifiesto cuando se almacena el siguiente resultado.
+    """
+    archivos = sorted(
+        [
+            f
+            for f in os.listdir(RUTA_RESULTADOS)
+            if f.endswith(".parquet") and f != "manifiesto.parquet"
+        ],
+        key=lambda f: os.path.getmtime(os.path.join(RUTA_RESULTADOS, f)),
+    )
+
+    return pl.DataFrame(
+        {
+            "version": list(range(1, len(archivos) + 1)),
+            "mes_corte": [int(f[:-8].rsplit("_", 1)[1]) for f in archivos],
+            "plantilla": [f[:-8].rsplit("_", 1)[0] for f in archivos],
+            "ruta": [f"{RUTA_RESULTADOS}/{f}" for f in archivos],
+            "fecha": [
+                datetime.fromtimestamp(os.path.getmtime(f"{RUTA_RESULTADOS}/{f}"))
+                for f in archivos
+            ],
+        },
+        schema=ESQUEMA_MANIFIESTO_RESULTADOS,
+    )
+
+
+def registrar_resultados(
+    df: pl.DataFrame, nombre_plantilla: str, mes_corte: int
+) -> str:
+    """Agrega una nueva version de resultados, particionada por mes de corte
+    y plantilla. Las versiones anteriores nunca se modifican.
+    """
+    carpeta = f"{RUTA_RESULTADOS}/mes_corte={mes_corte}/plantilla={nombre_plantilla}"
+    os.makedirs(carpeta, exist_ok=True)
+
+    with bloquear_manifiesto_resultados():
+        manifiesto = leer_manifiesto_resultados()
+        version = manifiesto.height + 1
+        ruta = f"{carpeta}/v{version:05d}.parquet"
+        df.write_parquet(ruta)
+
+        guardar_manifiesto_resultados(
+            pl.concat(
+                [
+                    manifiesto,
+                    pl.DataFrame(
+                        {
+                            "version": [version],
+                            "mes_corte": [mes_corte],
+                            "plantilla": [nombre_plantilla],
+                            "ruta": [ruta],
+                            "fecha": [datetime.now()],
+                        },
+                        schema=ESQUEMA_MANIFIESTO_RESULTADOS,
+                    ),
+                ]
+            )
+        )
+
+    return ruta
+
+
+def escanear_resultados(
+    meses_corte: list[int] | None = None, con_version: bool = False
+) -> pl.LazyFrame:
+    """Historico de resultados, donde cada apertura toma la version mas
+    reciente que la haya estimado. Si se especifican meses de corte, solo se
+    leen las particiones de esos meses.
+    """
+    manifiesto = leer_manifiesto_resultados().sort("version")
+    if meses_corte is not None:
+        manifiesto = manifiesto.filter(pl.col("mes_corte").is_in(meses_corte))
+
+    if manifiesto.is_empty():
+        logger.warning("No se encontraron resultados anteriores.")
+        return pl.LazyFrame()
+
+    versiones = [
+        pl.scan_parquet(ruta)
+        .filter(pl.col("plata_ultimate_bruto").sum().over(COLUMNAS_DISTINTIVAS) != 0)
+        .with_columns(version=pl.lit(version, dtype=pl.Int64))
+        for ruta, version in manifiesto.select(["ruta", "version"]).iter_rows()
+    ]
+
+    return (
+        pl.concat(versiones, how="diagonal_relaxed")
+        .unique(
+            subset=COLUMNAS_DISTINTIVAS + ["periodo_ocurrencia"],
+            keep="last",
+            maintain_order=True,
+        )
+        .sort(COLUMNAS_DISTINTIVAS + ["periodo_ocurrencia"])
+        .with_columns(pl.col("periodo_ocurrencia").cast(pl.Int32))
+        .drop([] if con_version else ["version"])
+    )
+
 
 def concatenar_archivos_resultados() -> pl.DataFrame:
-    columnas_distintivas = ["apertura_reservas", "mes_corte", "atipico"]
+    return escanear_resultados().pipe(perfiles.recolectar)
+
+
+def ruta_estado_wb(ruta_wb: str) -> str:
+    return f"{os.path.splitext(ruta_wb)[0]}_estado.parquet"
+
+
+def leer_estado_wb(ruta_wb: str) -> pl.DataFrame:
+    """Bloques (apertura_reservas, mes_corte, atipico) escritos en la hoja
+    en la ultima actualizacion, en el orden de sus filas.
+    """
+    ruta = ruta_estado_wb(ruta_wb)
+    if not os.path.exists(ruta):
+        return pl.DataFrame(schema=ESQUEMA_ESTADO_WB)
+    return pl.read_parquet(ruta)
+
+
+def normalizar_valor_celda(valor: object) -> str:
+    # Excel devuelve los numeros como float
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def llaves_filas(columnas_llave: list[list[object]]) -> list[str]:
+    return [
+        "|".join(normalizar_valor_celda(valor) for valor in fila)
+        for fila in zip(*columnas_llave, strict=True)
+    ]
+
+
+def bloques_hoja(llaves: list[str]) -> pl.DataFrame:
+    return (
+        pl.DataFrame({"llave": llaves}, schema={"llave": pl.String})
+        .with_columns(
+            bloque=(pl.col("llave") != pl.col("llave").shift())
+            .fill_null(True)
+            .cum_sum()
+        )
+        .group_by("bloque", maintain_order=True)
+        .agg(pl.first("llave"), num_filas=pl.len().cast(pl.Int64))
+        .drop("bloque")
+    )
+
+
+def validar_estado_wb(
+    estado: pl.DataFrame,
+    encabezado: list[str],
+    llaves: list[str],
+    columnas_resultados: list[str],
+) -> pl.DataFrame:
+    """Si la hoja fue modificada por fuera de esta actualizacion, o no se
+    guardo, el estado registrado deja de servir y la hoja se reescribe.
+    """
+    if encabezado == columnas_resultados and bloques_hoja(llaves).equals(
+        estado.select(["llave", "num_filas"])
+    ):
+        return estado
+
+    if not estado.is_empty() or llaves:
+        logger.info(
+            utils.limpiar_espacios_log(
+                f"""
+                La hoja {HOJA_RESULTADOS} no coincide con la ultima
+                actualizacion registrada, se reescribe completa.
+                """
+            )
+        )
+    return pl.DataFrame(schema=ESQUEMA_ESTADO_WB)
+
 
-    files = [file for file in os.listdir("output/resultados") if ".parquet" in file]
-    sorted_files = sorted(
-        files, key=lambda f: os.path.getmtime(os.path.join("output/resultados", f))
+def planear_escritura(
+    ruta_wb: str, encabezado: list[str], llaves: list[str], incremental: bool
+) -> tuple[int, pl.DataFrame, pl.DataFrame]:
+    """Compara los bloques de la hoja con el almacen de resultados. Se
+    conservan los bloques iniciales cuya version y posicion no han cambiado, y
+    desde el primer bloque nuevo, reemplazado, eliminado o desplazado se
+    reescribe el resto de la hoja, para que quede igual que al reescribirla
+    completa. Devuelve la fila desde la que se escribe, las filas a escribir y
+    el nuevo estado de la hoja.
+    """
+    resultados = escanear_resultados(con_version=True).pipe(perfiles.recolectar)
+    if resultados.is_empty():
+        return 1, pl.DataFrame(), pl.DataFrame(schema=ESQUEMA_ESTADO_WB)
+
+    resultados = resultados.with_columns(
+        llave=pl.concat_str(
+            [pl.col(columna).cast(pl.String) for columna in COLUMNAS_DISTINTIVAS],
+            separator="|",
+        )
+    )
+    bloques = resultados.group_by("llave", maintain_order=True).agg(
+        pl.max("version"), num_filas=pl.len().cast(pl.Int64)
     )
 
-    dfs = []
-    for file in sorted_files:
-        dfs.append(
-            pl.read_parquet(f"output/resultados/{file}").filter(
-                pl.col("plata_ultimate_bruto").sum().over(columnas_distintivas) != 0
+    estado = (
+        validar_estado_wb(
+            leer_estado_wb(ruta_wb),
+            encabezado,
+            llaves,
+            resultados.drop(["version", "llave"]).columns,
+        )
+        if incremental
+        else pl.DataFrame(schema=ESQUEMA_ESTADO_WB)
+    )
+
+    # Un bloque se conserva solo si todos los anteriores tambien, y si ocupa
+    # la misma posicion que tendria al reescribir la hoja completa
+    num_comunes = min(estado.height, bloques.height)
+    num_conservados = int(
+        (
+            (estado["llave"].head(num_comunes) == bloques["llave"].head(num_comunes))
+            & (
+                estado["version"].head(num_comunes)
+                == bloques["version"].head(num_comunes)
             )
         )
+        .cast(pl.Int8)
+        .cum_min()
+        .sum()
+    )
+    conservados = estado.head(num_conservados)
 
-    try:
-        df_resultados = (
-            pl.DataFrame(pl.concat(dfs))
-            .unique(subset=columnas_distintivas + ["periodo_ocurrencia"], keep="last")
-            .sort(columnas_distintivas + ["periodo_ocurrencia"])
-            .with_columns(pl.col("periodo_ocurrencia").cast(pl.Int32))
+    bloques_escribir = bloques.slice(num_conservados)
+    filas_escribir = resultados.join(
+        bloques_escribir.select("llave"), on="llave", how="semi"
+    ).drop(["version", "llave"])
+
+    fila_inicio = (
+        1 if conservados.is_empty() else int(conservados["num_filas"].sum()) + 2
+    )
+
+    logger.info(
+        utils.limpiar_espacios_log(
+            f"""
+            Hoja {HOJA_RESULTADOS}: {conservados.height} bloques sin cambios,
+            {bloques_escribir.height} bloques por escribir desde la fila
+            {fila_inicio}.
+            """
         )
-    except ValueError:
-        logger.warning("No se encontraron resultados anteriores.")
-        df_resultados = pl.DataFrame()
+    )
+
+    return fila_inicio, filas_escribir, pl.concat([conservados, bloques_escribir])
+
+
+def leer_hoja_xlwings(hoja: xw.Sheet) -> tuple[list[str], list[str]]:
+    if hoja["A1"].value is None:
+        return [], []
+
+    encabezado = hoja["A1"].expand("right").value
+    ultima_fila = hoja.used_range.last_cell.row
+    if ultima_fila == 1 or not set(COLUMNAS_DISTINTIVAS).issubset(encabezado):
+        return encabezado, []
+
+    columnas_llave = [
+        hoja.range(
+            (2, encabezado.index(columna) + 1),
+            (ultima_fila, encabezado.index(columna) + 1),
+        )
+        .options(ndim=1)
+        .value
+        for columna in COLUMNAS_DISTINTIVAS
+    ]
+    return encabezado, llaves_filas(columnas_llave)
 
-    return df_resultados
 
+def escribir_hoja_xlwings(
+    hoja: xw.Sheet, df: pl.DataFrame, fila_inicio: int, num_filas_hoja: int
+) -> None:
+    if num_filas_hoja >= fila_inicio:
+        hoja.range(f"{fila_inicio}:{num_filas_hoja}").clear_contents()
+    if not df.is_empty():
+        hoja.range((fila_inicio, 1)).options(
+            index=False, header=fila_inicio == 1
+        ).value = df.to_pandas()
 
-def actualizar_wb_resultados() -> xw.Book:
-    wb = xw.Book("output/resultados.xlsx")
 
-    wb.sheets["Resultados"].clear_contents()
-    wb.sheets["Resultados"]["A1"].options(
-        index=False
-    ).value = concatenar_archivos_resultados().to_pandas()
+def leer_hoja_openpyxl(ws: Worksheet) -> tuple[list[str], list[str]]:
+    encabezado = [
+        valor
+        for valor in next(ws.iter_rows(max_row=1, values_only=True), ())
+        if valor is not None
+    ]
+    if ws.max_row == 1 or not set(COLUMNAS_DISTINTIVAS).issubset(encabezado):
+        return encabezado, []
+
+    columnas_llave = [
+        next(
+            ws.iter_cols(
+                min_col=encabezado.index(columna) + 1,
+                max_col=encabezado.index(columna) + 1,
+                min_row=2,
+                values_only=True,
+            )
+        )
+        for columna in COLUMNAS_DISTINTIVAS
+    ]
+    return encabezado, llaves_filas(columnas_llave)
+
+
+def escribir_hoja_openpyxl(ws: Worksheet, df: pl.DataFrame, fila_inicio: int) -> None:
+    if ws.max_row >= fila_inicio:
+        ws.delete_rows(fila_inicio, ws.max_row - fila_inicio + 1)
+
+    filas = list(df.iter_rows())
+    if fila_inicio == 1 and not df.is_empty():
+        filas.insert(0, tuple(df.columns))
+
+    for num_fila, fila in enumerate(filas, start=fila_inicio):
+        for num_columna, valor in enumerate(fila, start=1):
+            ws.cell(row=num_fila, column=num_columna, value=valor)
+
+
+@metricas.instrumentar()
+def actualizar_wb_resultados(incremental: bool = True) -> xw.Book:
+    s = time.time()
+
+    wb = xw.Book(RUTA_WB_RESULTADOS)
+    hoja = wb.sheets[HOJA_RESULTADOS]
+
+    encabezado, llaves = leer_hoja_xlwings(hoja)
+    fila_inicio, df, estado = planear_escritura(
+        RUTA_WB_RESULTADOS, encabezado, llaves, incremental
+    )
+    escribir_hoja_xlwings(hoja, df, fila_inicio, len(llaves) + 1)
+
+    # Se guarda para que el estado registrado corresponda al archivo
+    wb.save()
+    estado.write_parquet(ruta_estado_wb(RUTA_WB_RESULTADOS))
+
+    logger.success(
+        f"Hoja {HOJA_RESULTADOS} actualizada en {time.time() - s:.2f} segundos."
+    )
 
     return wb
 
 
+@metricas.instrumentar()
+def actualizar_archivo_resultados(
+    ruta_wb: str = RUTA_WB_RESULTADOS, incremental: bool = True
+) -> None:
+    """Actualizacion sin Excel abierto, para corridas en lote."""
+    s = time.time()
+
+    if os.path.exists(ruta_wb):
+        wb = openpyxl.load_workbook(ruta_wb)
+    else:
+        wb = openpyxl.Workbook()
+        wb.active.title = HOJA_RESULTADOS
+
+    if HOJA_RESULTADOS not in wb.sheetnames:
+        wb.create_sheet(HOJA_RESULTADOS)
+    ws = wb[HOJA_RESULTADOS]
+
+    encabezado, llaves = leer_hoja_openpyxl(ws)
+    fila_inicio, df, estado = planear_escritura(
+        ruta_wb, encabezado, llaves, incremental
+    )
+    escribir_hoja_openpyxl(ws, df, fila_inicio)
+
+    wb.save(ruta_wb)
+    wb.close()
+    estado.write_parquet(ruta_estado_wb(ruta_wb))
+
+    logger.success(
+        utils.limpiar_espacios_log(
+            f"""
+            Hoja {HOJA_RESULTADOS} de {ruta_wb} actualizada en
+            {time.time() - s:.2f} segundos.
+            """
+        )
+    )
+
+
 def generar_informe_actuario_responsable(negocio: str, mes_corte: int) -> None:
     periodicidades_desc = pl.LazyFrame(
         {
@@ -61,9 +497,7 @@ def generar_informe_actuario_responsable(negocio: str, mes_corte: int) -> None:
         }
     )
 
-    df = (
-        concatenar_archivos_resultados().lazy().filter(pl.col("mes_corte") == mes_corte)
-    )
+    df = escanear_resultados([mes_corte])
 
     df_sinis = (
         df.select(
@@ -129,7 +563,7 @@ def generar_informe_actuario_responsable(negocio: str, mes_corte: int) -> None:
             + ["prima_retenida_devengada"]
         )
         .sort(["ramo_desc", "periodo_ocurrencia"])
-        .collect()
+        .pipe(perfiles.recolectar)
     )
 
     df_ar.write_excel(f"output/informe_ar_{negocio}_{mes_corte}.xlsx", worksheet="AR")
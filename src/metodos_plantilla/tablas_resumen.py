@@ -3,10 +3,12 @@ from typing import Literal
 import polars as pl
 
 from src import constantes as ct
-from src import utils
+from src import espacio_trabajo as et
+from src import metricas, perfiles, utils
 from src.metodos_plantilla import insumos as ins
 
 
+@metricas.instrumentar()
 def generar_tablas_resumen(
     negocio: str,
     tipo_analisis: Literal["triangulos", "entremes"],
@@ -49,14 +51,14 @@ def generar_tablas_resumen(
                 pl.col("periodo_ocurrencia")
                 != pl.col("periodo_ocurrencia").max().over("apertura_reservas")
             )
-            .collect()
-            .vstack(ult_ocurr.collect())
+            .pipe(perfiles.recolectar)
+            .vstack(ult_ocurr.pipe(perfiles.recolectar))
             .lazy()
         )
 
     tabla_entremes = diagonales.drop(
         utils.obtener_nombres_aperturas(negocio, "siniestros")
-    ).collect()
+    ).pipe(perfiles.recolectar)
 
     tabla_resumen = (
         diagonales.with_columns(
@@ -72,7 +74,7 @@ def generar_tablas_resumen(
             aviso_retenido=pl.col("incurrido_retenido") - pl.col("pago_retenido"),
         )
         .sort(["apertura_reservas", "periodo_ocurrencia"])
-        .collect()
+        .pipe(perfiles.recolectar)
     )
 
     tabla_atipicos = (
@@ -96,7 +98,7 @@ def generar_tablas_resumen(
             ibnr_contable_retenido=0,
         )
         .sort(["apertura_reservas", "periodo_ocurrencia"])
-        .collect()
+        .pipe(perfiles.recolectar)
     )
 
     return tabla_resumen, tabla_atipicos, tabla_entremes
@@ -127,4 +129,4 @@ def unificar_tablas(
 
 
 def df_aperturas() -> pl.LazyFrame:
-    return pl.scan_parquet("data/raw/siniestros.parquet")
+    return pl.scan_parquet(et.ruta("data/raw/siniestros.parquet"))
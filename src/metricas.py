@@ -0,0 +1,247 @@
+import functools
+import glob
+import inspect
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, cast
+
+import polars as pl
+import psutil
+from pydantic import BaseModel
+
+from src.logger_config import logger
+from src.models import ModosPlantilla
+
+# Cada guardado escribe su propio archivo, para no reescribir el historico
+RUTA_METRICAS = "logs/metrics"
+INTERVALO_MEMORIA = 0.05
+
+ESQUEMA_METRICAS = pl.Schema(
+    {
+        "fecha": pl.Datetime("us"),
+        "etapa": pl.String(),
+        "apertura": pl.String(),
+        "detalle": pl.String(),
+        "estado": pl.String(),
+        "duracion": pl.Float64(),
+        "tiempo_cpu": pl.Float64(),
+        "filas_entrada": pl.Int64(),
+        "filas_salida": pl.Int64(),
+        "memoria_pico_mb": pl.Float64(),
+        "pid": pl.Int64(),
+    }
+)
+
+medicion_actual: ContextVar["Medicion | None"] = ContextVar(
+    "medicion_actual", default=None
+)
+profundidad: ContextVar[int] = ContextVar("profundidad_metricas", default=0)
+
+pendientes: list[dict[str, Any]] = []
+lock = threading.Lock()
+# En los procesos del ejecutor las metricas se devuelven al proceso principal
+diferir_guardado = False
+
+
+class Medicion(BaseModel):
+    etapa: str
+    apertura: str | None = None
+    detalle: str | None = None
+    filas_entrada: int | None = None
+    filas_salida: int | None = None
+
+
+class MonitorMemoria(threading.Thread):
+    """Muestrea el RSS del proceso mientras corre la etapa, ya que el pico que
+    reporta el sistema operativo es el de toda la vida del proceso.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.proceso = psutil.Process()
+        self.pico = self.proceso.memory_info().rss
+        self.detener = threading.Event()
+
+    def run(self) -> None:
+        while not self.detener.wait(INTERVALO_MEMORIA):
+            self.pico = max(self.pico, self.proceso.memory_info().rss)
+
+    def terminar(self) -> float:
+        self.detener.set()
+        self.join()
+        return max(self.pico, self.proceso.memory_info().rss) / 2**20
+
+
+@contextmanager
+def medir(etapa: str, apertura: str | None = None) -> Iterator[Medicion]:
+    """El tiempo de CPU es el de todo el proceso, por lo que incluye los hilos
+    de polars y el de las etapas que corran al mismo tiempo.
+    """
+    medicion = Medicion(etapa=etapa, apertura=apertura)
+    token_medicion = medicion_actual.set(medicion)
+    token_profundidad = profundidad.set(profundidad.get() + 1)
+    monitor = MonitorMemoria()
+    monitor.start()
+
+    fecha, s, s_cpu = datetime.now(), time.perf_counter(), time.process_time()
+    estado = "error"
+    try:
+        yield medicion
+        estado = "completado"
+    finally:
+        with lock:
+            pendientes.append(
+                medicion.model_dump()
+                | {
+                    "fecha": fecha,
+                    "estado": estado,
+                    "duracion": time.perf_counter() - s,
+                    "tiempo_cpu": time.process_time() - s_cpu,
+                    "memoria_pico_mb": monitor.terminar(),
+                    "pid": os.getpid(),
+                }
+            )
+        medicion_actual.reset(token_medicion)
+        profundidad.reset(token_profundidad)
+        if profundidad.get() == 0:
+            guardar_pendientes()
+
+
+def reportar(
+    filas_entrada: int | None = None,
+    filas_salida: int | None = None,
+    detalle: str | None = None,
+) -> None:
+    """Completa la medicion de la etapa que se esta ejecutando, para los
+    datos que el decorador no puede inferir de los argumentos.
+    """
+    medicion = medicion_actual.get()
+    if medicion is None:
+        return
+    if filas_entrada is not None:
+        medicion.filas_entrada = filas_entrada
+    if filas_salida is not None:
+        medicion.filas_salida = filas_salida
+    if detalle is not None:
+        medicion.detalle = detalle
+
+
+def contar_filas(valores: Iterable[Any]) -> int | None:
+    """Filas de los DataFrames entre los valores. Los LazyFrames no se
+    cuentan, ya que habria que calcularlos.
+    """
+    frames = [
+        df
+        for valor in valores
+        for df in (valor if isinstance(valor, tuple | list) else [valor])
+        if isinstance(df, pl.DataFrame)
+    ]
+    return sum(df.height for df in frames) if frames else None
+
+
+def apertura_argumentos(args: Iterable[Any]) -> str | None:
+    return next((arg.apertura for arg in args if isinstance(arg, ModosPlantilla)), None)
+
+
+def instrumentar[F: Callable[..., Any]](
+    etapa: str | None = None,
+) -> Callable[[F], F]:
+    """Mide cada llamada a la funcion. Si recibe unos modos de plantilla, la
+    medicion queda asociada a su apertura.
+    """
+
+    def decorador(funcion: F) -> F:
+        nombre = etapa or (
+            f"{funcion.__module__.removeprefix('src.')}.{funcion.__name__}"
+        )
+
+        if inspect.iscoroutinefunction(funcion):
+
+            @functools.wraps(funcion)
+            async def envoltura_async(*args: Any, **kwargs: Any) -> Any:
+                argumentos = [*args, *kwargs.values()]
+                with medir(nombre, apertura_argumentos(argumentos)) as medicion:
+                    medicion.filas_entrada = contar_filas(argumentos)
+                    resultado = await funcion(*args, **kwargs)
+                    reportar(filas_salida=contar_filas([resultado]))
+                    return resultado
+
+            return cast(F, envoltura_async)
+
+        @functools.wraps(funcion)
+        def envoltura(*args: Any, **kwargs: Any) -> Any:
+            argumentos = [*args, *kwargs.values()]
+            with medir(nombre, apertura_argumentos(argumentos)) as medicion:
+                medicion.filas_entrada = contar_filas(argumentos)
+                resultado = funcion(*args, **kwargs)
+                reportar(filas_salida=contar_filas([resultado]))
+                return resultado
+
+        return cast(F, envoltura)
+
+    return decorador
+
+
+def tomar_pendientes() -> list[dict[str, Any]]:
+    with lock:
+        filas = pendientes.copy()
+        pendientes.clear()
+    return filas
+
+
+def agregar(filas: list[dict[str, Any]]) -> None:
+    """Registra las metricas que llegan de otro proceso."""
+    with lock:
+        pendientes.extend(filas)
+    if profundidad.get() == 0:
+        guardar_pendientes()
+
+
+def leer_metricas() -> pl.DataFrame:
+    if not glob.glob(f"{RUTA_METRICAS}/*.parquet"):
+        return pl.DataFrame(schema=ESQUEMA_METRICAS)
+    return pl.scan_parquet(f"{RUTA_METRICAS}/*.parquet").collect()
+
+
+def guardar_pendientes() -> None:
+    if diferir_guardado:
+        return
+
+    with lock:
+        if not pendientes:
+            return
+        nuevas = pl.DataFrame(pendientes, schema=ESQUEMA_METRICAS)
+        pendientes.clear()
+
+        # Las metricas no deben interrumpir el proceso que se esta midiendo
+        ruta = (
+            f"{RUTA_METRICAS}/{datetime.now():%Y%m%d_%H%M%S_%f}_{os.getpid()}.parquet"
+        )
+        try:
+            os.makedirs(RUTA_METRICAS, exist_ok=True)
+            nuevas.write_parquet(f"{ruta}.tmp")
+            os.replace(f"{ruta}.tmp", ruta)
+        except OSError:
+            logger.warning(f"No se pudieron guardar las metricas en {ruta}.")
+
+
+def resumir_metricas(metricas: pl.DataFrame) -> pl.DataFrame:
+    return (
+        metricas.group_by("etapa")
+        .agg(
+            ejecuciones=pl.len(),
+            errores=(pl.col("estado") == "error").sum(),
+            duracion_promedio=pl.col("duracion").mean(),
+            duracion_p95=pl.col("duracion").quantile(0.95),
+            tiempo_cpu_promedio=pl.col("tiempo_cpu").mean(),
+            filas_salida_promedio=pl.col("filas_salida").mean(),
+            memoria_pico_mb=pl.col("memoria_pico_mb").max(),
+            ultima_fecha=pl.col("fecha").max(),
+        )
+        .sort("duracion_promedio", descending=True)
+    )
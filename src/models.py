@@ -1,4 +1,6 @@
-from typing import Literal
+from datetime import datetime
+from typing import Any, Literal
+from uuid import uuid4
 
 from pydantic import BaseModel
 from sqlmodel import Field, SQLModel, String
@@ -39,3 +41,48 @@ class EstructuraApertura(BaseModel):
     apertura: str
     atributo: str
     dimensiones_triangulo: RangeDimension
+
+
+class TrabajoLote(BaseModel):
+    negocio: str
+    mes_inicio: int = Field(ge=199001, le=204001)
+    mes_corte: int = Field(ge=199001, le=204001)
+    tipo_analisis: Literal["triangulos", "entremes"]
+
+
+class Lote(BaseModel):
+    trabajos: list[TrabajoLote] = Field(min_length=1)
+    extraer: bool = True
+    controles: bool = True
+    resultados: bool = True
+    max_procesos: int = Field(default=2, ge=1)
+
+
+class LlaveControl(BaseModel):
+    estado_cuadre: str
+    file: str
+    fuente: Literal["tera", "sap"]
+    mes_corte: int
+
+
+class Etapa(BaseModel):
+    nombre: str
+    entradas: list[str]
+    parametros: dict[str, Any] = {}
+    salidas: list[str]
+
+
+class Tarea(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    nombre: str
+    llave: str
+    estado: Literal["pendiente", "en_curso", "completada", "error", "cancelada"] = (
+        "pendiente"
+    )
+    progreso: float = 0
+    mensaje: str = ""
+    error: str | None = None
+    resultado: Any = Field(default=None, exclude=True)
+    cancelacion_solicitada: bool = False
+    fecha_creacion: datetime = Field(default_factory=datetime.now)
+    fecha_fin: datetime | None = None
@@ -0,0 +1,110 @@
+import inspect
+import os
+from datetime import datetime
+
+import polars as pl
+
+from src import metricas
+from src.configuracion import configuracion
+from src.logger_config import logger
+
+RUTA_PERFILES = "logs/perfiles"
+
+# Los procesos del ejecutor heredan las variables de entorno, por lo que sus
+# consultas quedan en la misma corrida que las del proceso principal
+CORRIDA = os.environ.setdefault(
+    "CORRIDA_PERFILES", f"{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}"
+)
+
+
+def consulta_llamadora() -> str:
+    """Funcion y linea del codigo del proyecto que pidio calcular la consulta,
+    saltando los marcos de polars (por ejemplo, los de pipe).
+    """
+    marco = inspect.currentframe()
+    while marco is not None and marco.f_globals.get("__name__", "").startswith(
+        ("polars", __name__)
+    ):
+        marco = marco.f_back
+    if marco is None:
+        return "desconocida"
+    modulo = marco.f_globals.get("__name__", "").removeprefix("src.")
+    return f"{modulo}.{marco.f_code.co_name}:{marco.f_lineno}"
+
+
+def recolectar(lf: pl.LazyFrame) -> pl.DataFrame:
+    """Calcula el LazyFrame. Con PERFILAR_CONSULTAS activo, guarda ademas el
+    plan optimizado y el tiempo de cada nodo, asociados a la etapa que se
+    esta midiendo.
+    """
+    if not configuracion.perfilar_consultas:
+        return lf.collect()
+
+    plan = lf.explain()
+    df, perfil = lf.profile()
+
+    medicion = metricas.medicion_actual.get()
+    fecha = datetime.now()
+    perfil = perfil.select(
+        pl.lit(CORRIDA).alias("corrida"),
+        pl.lit(fecha).alias("fecha"),
+        pl.lit(medicion.etapa if medicion else None, dtype=pl.String).alias("etapa"),
+        pl.lit(consulta_llamadora()).alias("consulta"),
+        pl.col("node").alias("nodo"),
+        pl.col("start").cast(pl.Int64).alias("inicio_us"),
+        pl.col("end").cast(pl.Int64).alias("fin_us"),
+        (pl.col("end").cast(pl.Int64) - pl.col("start").cast(pl.Int64)).alias(
+            "duracion_us"
+        ),
+        pl.lit(plan).alias("plan"),
+    )
+
+    # Un archivo por consulta, para que varios procesos puedan escribir a la vez
+    carpeta = f"{RUTA_PERFILES}/{CORRIDA}"
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        perfil.write_parquet(f"{carpeta}/{fecha:%H%M%S_%f}_{os.getpid()}.parquet")
+    except OSError:
+        logger.warning(f"No se pudo guardar el perfil de la consulta en {carpeta}.")
+
+    return df
+
+
+def recolectar_todos(lfs: list[pl.LazyFrame]) -> list[pl.DataFrame]:
+    """Calcula varios LazyFrames a la vez, compartiendo las partes comunes de
+    sus planes. Al perfilar se calculan por separado, para tener el perfil de
+    cada uno.
+    """
+    if not configuracion.perfilar_consultas:
+        return pl.collect_all(lfs)
+    return [recolectar(lf) for lf in lfs]
+
+
+def listar_corridas() -> list[str]:
+    if not os.path.exists(RUTA_PERFILES):
+        return []
+    return sorted(os.listdir(RUTA_PERFILES))
+
+
+def leer_perfiles(corrida: str) -> pl.DataFrame:
+    return pl.read_parquet(f"{RUTA_PERFILES}/{corrida}/*.parquet")
+
+
+def nodos_mas_lentos(perfiles: pl.DataFrame, num_nodos: int = 20) -> pl.DataFrame:
+    """Ranking de los nodos de los planes por tiempo total, agrupando las
+    veces que la misma consulta se calculo durante la corrida.
+    """
+    return (
+        perfiles.filter(pl.col("nodo") != "optimization")
+        .group_by(["etapa", "consulta", "nodo"])
+        .agg(
+            ejecuciones=pl.len(),
+            duracion_total_s=pl.col("duracion_us").sum() / 1e6,
+            duracion_max_s=pl.col("duracion_us").max() / 1e6,
+        )
+        .with_columns(
+            pct_corrida=pl.col("duracion_total_s") / pl.col("duracion_total_s").sum()
+        )
+        .sort("duracion_total_s", descending=True)
+        .head(num_nodos)
+    )
@@ -1,10 +1,10 @@
-import os
-
 import polars as pl
-import xlwings as xw
 
 from src import utils
 from src.controles_informacion.sap import consolidar_sap
+from src.extraccion import tablas_adicionales
+
+RUTA_SEGMENTACION = "data/segmentacion_autonomia.xlsx"
 
 
 async def cantidades_sap(hojas_afo: list[str], mes_corte: int) -> pl.DataFrame:
@@ -24,27 +24,9 @@ async def cantidades_sap(hojas_afo: list[str], mes_corte: int) -> pl.DataFrame:
     )
 
 
-def crear_hoja_segmentacion(df: pl.DataFrame, nombre_hoja: str) -> None:
-    xw.Book(f"{os.getcwd()}/data/segmentacion_autonomia.xlsx").set_mock_caller()
-    wb = xw.Book.caller()
-
-    try:
-        wb.sheets.add(name=nombre_hoja)
-    except ValueError:
-        wb.sheets[nombre_hoja].delete()
-        wb.sheets.add(name=nombre_hoja)
-
-    wb.sheets[nombre_hoja].range("A1:A500").number_format = "@"
-    wb.sheets[nombre_hoja].range("B1:B500").number_format = "@"
-    wb.sheets[nombre_hoja]["A1"].options(index=False).value = df.to_pandas()
-
-    wb.save()
-    wb.close()
-
-
 async def sap_sinis_ced(mes_corte: int) -> None:
     df_sinis = await cantidades_sap(["pago_cedido", "aviso_cedido"], mes_corte)
-    crear_hoja_segmentacion(df_sinis, "add_s_SAP_Sinis_Ced")
+    tablas_adicionales.registrar("add_s_SAP_Sinis_Ced", df_sinis, RUTA_SEGMENTACION)
 
 
 async def sap_primas_ced(mes_corte: int) -> None:
@@ -65,4 +47,4 @@ async def sap_primas_ced(mes_corte: int) -> None:
         prima_cedida=pl.col("prima_bruta") - pl.col("prima_retenida"),
         fecha_registro=pl.col("fecha_registro").dt.strftime("%Y%m").cast(pl.Int32),
     )
-    crear_hoja_segmentacion(df_primas, "add_p_SAP_Primas_Ced")
+    tablas_adicionales.registrar("add_p_SAP_Primas_Ced", df_primas, RUTA_SEGMENTACION)
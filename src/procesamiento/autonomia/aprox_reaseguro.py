@@ -1,13 +1,20 @@
 from datetime import date
 
 import polars as pl
+from polars.expr.whenthen import ChainedThen
 
-from src import utils
+from src import perfiles, utils
 
 from . import segmentaciones
 from .base_incurrido import cruzar_segmentaciones
 
 FILTRO_083 = (pl.col("codigo_ramo_op") == "083") & (pl.col("codigo_op") == "02")
+COLUMNAS_RETENCION = [
+    "codigo_op",
+    "codigo_ramo_op",
+    "apertura_canal_desc",
+    "apertura_amparo_desc",
+]
 
 
 def cond_meses_ant(mes_corte: int) -> pl.Expr:
@@ -42,15 +49,7 @@ def calcular_pcts_retencion(df_incurrido: pl.LazyFrame, mes_corte: int) -> pl.La
                 .dt.offset_by("-1mo"),
             )
         )
-        .group_by(
-            [
-                "codigo_op",
-                "codigo_ramo_op",
-                "apertura_canal_desc",
-                "apertura_amparo_desc",
-                "atipico",
-            ]
-        )
+        .group_by(COLUMNAS_RETENCION)
         .agg([pl.sum("incurrido_bruto"), pl.sum("incurrido_retenido")])
         .with_columns(
             porcentaje_retencion=(
@@ -61,26 +60,33 @@ def calcular_pcts_retencion(df_incurrido: pl.LazyFrame, mes_corte: int) -> pl.La
     )
 
 
-def generar_vigencias_contrato_083(mes_corte) -> pl.LazyFrame:
+def agregar_vigencias_contrato_083(
+    df_incurrido: pl.LazyFrame, mes_corte: int
+) -> pl.LazyFrame:
+    """Los contratos del 083 van del 1 de julio al 30 de junio y se nombran
+    por el año en que empiezan. Los siniestros del 083 por fuera de las
+    vigencias desde 1900 hasta el año del corte no se aproximan.
+    """
+    vigencia = pl.col("fecha_siniestro").dt.year() - (
+        pl.col("fecha_siniestro").dt.month() < 7
+    ).cast(pl.Int32)
     return (
-        pl.DataFrame(
-            pl.date_range(
-                pl.date(1900, 1, 1),
-                utils.yyyymm_to_date(mes_corte),
-                interval="1y",
-                eager=True,
-            ).alias("primer_dia_ano")
+        df_incurrido.with_columns(
+            vigencia_contrato=pl.when(pl.col("es_083")).then(vigencia)
+        )
+        .filter(
+            pl.when(pl.col("es_083"))
+            .then(
+                pl.col("vigencia_contrato").is_between(
+                    1900, utils.yyyymm_to_date(mes_corte).year
+                )
+            )
+            .otherwise(~pl.col("es_083"))
         )
-        .lazy()
         .with_columns(
-            vigencia_contrato=pl.col("primer_dia_ano").dt.year(),
-            inicio_vigencia_contrato=pl.col("primer_dia_ano").dt.offset_by("6mo"),
-            fin_vigencia_contrato=pl.col("primer_dia_ano")
-            .dt.offset_by("18mo")
-            .dt.offset_by("-1d"),
-            prioridad=pl.when(pl.col("primer_dia_ano").dt.year() < 2022)
+            prioridad=pl.when(pl.col("vigencia_contrato") < 2022)
             .then(200e6)
-            .otherwise(250e6),
+            .otherwise(250e6)
         )
     )
 
@@ -119,76 +125,123 @@ def procesar_incurridos_cedidos_atipicos(segm: dict[str, pl.DataFrame]) -> pl.La
 def agregar_fechas_atipicos(
     inc_atip: pl.LazyFrame, df_incurrido: pl.LazyFrame
 ) -> pl.LazyFrame:
-    return inc_atip.join(
-        df_incurrido.group_by(["siniestro_id", "apertura_amparo_desc"]).agg(
-            pl.col("fecha_registro").max()
-        ),
-        on=["siniestro_id", "apertura_amparo_desc"],
-        how="left",
+    """Los cedidos atipicos se asignan al ultimo registro del siniestro dentro
+    de su rama (083 o no 083).
+    """
+    llaves = ["siniestro_id", "apertura_amparo_desc", "es_083"]
+    return (
+        inc_atip.with_columns(es_083=FILTRO_083)
+        .join(
+            df_incurrido.group_by(llaves).agg(pl.col("fecha_registro").max()),
+            on=llaves,
+            how="left",
+        )
+        .drop("es_083")
     )
 
 
-def aproximar_reaseguro_no_083(
-    df_incurrido_no_083: pl.LazyFrame,
-    pcts_retencion: pl.LazyFrame,
-    inc_atip: pl.LazyFrame,
-    mes_corte: int,
-) -> pl.LazyFrame:
+def excepciones_contrato_083(qty: str) -> ChainedThen:
     return (
-        df_incurrido_no_083.join(
-            pcts_retencion,
-            on=[
-                "codigo_op",
-                "codigo_ramo_op",
-                "apertura_canal_desc",
-                "apertura_amparo_desc",
-                "atipico",
-            ],
-            how="left",
+        pl.when(pl.col("numero_poliza") == "083004273427")
+        .then(pl.col(qty) * 0.2)
+        .when(pl.col("nombre_tecnico") == "PILOTOS")
+        .then(pl.col(qty) * 0.4)
+        .when(pl.col("nombre_tecnico") == "INPEC")
+        .then(pl.col(qty) * 0.25)
+        .when(pl.col("apertura_canal_desc") == "Banco Agrario")
+        .then(pl.col(qty) * 0.1)
+        .when(
+            (pl.col("apertura_canal_desc") == "Banco-L")
+            & (
+                pl.col("fecha_siniestro").is_between(
+                    date(2017, 11, 1), date(2021, 10, 31)
+                )
+            )
         )
-        .join(
-            agregar_fechas_atipicos(inc_atip, df_incurrido_no_083),
-            on=[
-                "codigo_op",
-                "codigo_ramo_op",
-                "apertura_amparo_desc",
-                "siniestro_id",
-                "fecha_registro",
-            ],
-            how="left",
-            suffix="_atip",
+        .then(pl.col(qty) * 0.1)
+    )
+
+
+def retener_pago_083() -> pl.Expr:
+    pago_previo = pl.col("pago_bruto_acum") - pl.col("pago_bruto")
+    return (
+        excepciones_contrato_083("pago_bruto")
+        .when(pago_previo < pl.col("prioridad"))
+        .then(pl.col("pago_bruto").clip(upper_bound=pl.col("prioridad") - pago_previo))
+        .when(pago_previo >= pl.col("prioridad"))
+        .then(0)
+    )
+
+
+def retener_aviso_083() -> pl.Expr:
+    """Usa el pago retenido ya aproximado."""
+    incurrido_previo = pl.col("incurrido_bruto_acum") - pl.col("incurrido_bruto")
+    exceso_aviso = (
+        pl.col("aviso_bruto") - (pl.col("prioridad") - incurrido_previo)
+    ).clip(upper_bound=0)
+    return (
+        excepciones_contrato_083("aviso_bruto")
+        .when((incurrido_previo < pl.col("prioridad")) & (pl.col("aviso_bruto") >= 0))
+        .then(
+            pl.col("aviso_bruto").clip(
+                upper_bound=pl.col("prioridad") - incurrido_previo
+            )
         )
-        .with_columns(
-            pago_retenido=pl.when(cond_meses_ant(mes_corte))
-            .then(pl.col("pago_retenido"))
-            .when(pl.col("atipico") == 0)
-            .then(pl.col("pago_bruto") * pl.col("porcentaje_retencion").fill_null(1))
-            .when(pl.col("atipico") == 1)
-            .then(pl.col("pago_bruto") - pl.col("pago_cedido_atip").fill_null(0)),
-            aviso_retenido=pl.when(cond_meses_ant(mes_corte))
-            .then(pl.col("aviso_retenido"))
-            .when(pl.col("atipico") == 0)
-            .then(pl.col("aviso_bruto") * pl.col("porcentaje_retencion").fill_null(1))
-            .when(pl.col("atipico") == 1)
-            .then(pl.col("aviso_bruto") - pl.col("aviso_cedido_atip").fill_null(0)),
+        .when((incurrido_previo < pl.col("prioridad")) & (pl.col("aviso_bruto") < 0))
+        .then(pl.col("aviso_bruto"))
+        .when((incurrido_previo >= pl.col("prioridad")) & (pl.col("aviso_bruto") >= 0))
+        .then(0)
+        .when(
+            (incurrido_previo >= pl.col("prioridad"))
+            & (pl.col("aviso_bruto") < 0)
+            & (exceso_aviso == 0)
         )
+        .then(-pl.col("pago_retenido"))
+        .when((incurrido_previo >= 0) & (pl.col("aviso_bruto") < 0))
+        .then(exceso_aviso)
     )
 
 
-def aproximar_reaseguro_083(
-    df_incurrido_083: pl.LazyFrame,
-    inc_atip: pl.LazyFrame,
-    mes_corte: int,
+def retener(qty: str, retencion_083: pl.Expr, mes_corte: int) -> pl.Expr:
+    """Los meses anteriores al corte conservan el retenido real. En el mes de
+    corte, el 083 usa las condiciones de su contrato y los demas ramos el
+    porcentaje de retencion historico.
+    """
+    return (
+        pl.when(cond_meses_ant(mes_corte))
+        .then(pl.col(f"{qty}_retenido"))
+        .when(pl.col("atipico") == 1)
+        .then(pl.col(f"{qty}_bruto") - pl.col(f"{qty}_cedido_atip").fill_null(0))
+        .when(pl.col("atipico") == 0)
+        .then(
+            pl.when(pl.col("es_083"))
+            .then(retencion_083)
+            .otherwise(
+                pl.col(f"{qty}_bruto") * pl.col("porcentaje_retencion").fill_null(1)
+            )
+        )
+        .alias(f"{qty}_retenido")
+    )
+
+
+def aproximar_reaseguro(
+    df_incurrido: pl.LazyFrame, inc_atip: pl.LazyFrame, mes_corte: int
 ) -> pl.LazyFrame:
+    """El 083 y los demas ramos se aproximan en el mismo plan, diferenciados
+    por la columna es_083.
+    """
+    columnas = df_incurrido.collect_schema().names()
+    df_incurrido = df_incurrido.with_columns(es_083=FILTRO_083).pipe(
+        agregar_vigencias_contrato_083, mes_corte
+    )
     return (
-        df_incurrido_083.join_where(
-            generar_vigencias_contrato_083(mes_corte),
-            pl.col("fecha_siniestro").is_between(
-                pl.col("inicio_vigencia_contrato"), pl.col("fin_vigencia_contrato")
-            ),
+        df_incurrido.join(
+            calcular_pcts_retencion(df_incurrido, mes_corte),
+            on=COLUMNAS_RETENCION,
+            how="left",
         )
         .join(
-            agregar_fechas_atipicos(inc_atip, df_incurrido_083),
+            agregar_fechas_atipicos(inc_atip, df_incurrido),
             on=[
                 "codigo_op",
                 "codigo_ramo_op",
@@ -200,146 +253,29 @@ def aproximar_reaseguro_083(
             suffix="_atip",
         )
         .with_columns(
-            [
-                pl.col(qty)
-                .sum()
-                .over(["asegurado_id", "vigencia_contrato"], order_by="fecha_registro")
-                .alias(f"{qty}_acum")
-                for qty in ["pago_bruto", "aviso_bruto", "incurrido_bruto"]
-            ]
+            pl.when(pl.col("es_083"))
+            .then(pl.col(qty).sum().over(["asegurado_id", "vigencia_contrato"]))
+            .alias(f"{qty}_acum")
+            for qty in ["pago_bruto", "aviso_bruto", "incurrido_bruto"]
         )
+        .with_columns(retener("pago", retener_pago_083(), mes_corte))
+        .with_columns(retener("aviso", retener_aviso_083(), mes_corte))
         .with_columns(
-            pago_retenido=pl.when(cond_meses_ant(mes_corte))
-            .then(pl.col("pago_retenido"))
-            .when(pl.col("atipico") == 1)
-            .then(pl.col("pago_bruto") - pl.col("pago_cedido_atip").fill_null(0))
-            .when(pl.col("atipico") == 0)
-            .then(
-                pl.when(pl.col("numero_poliza") == "083004273427")
-                .then(pl.col("pago_bruto") * 0.2)
-                .when(pl.col("nombre_tecnico") == "PILOTOS")
-                .then(pl.col("pago_bruto") * 0.4)
-                .when(pl.col("nombre_tecnico") == "INPEC")
-                .then(pl.col("pago_bruto") * 0.25)
-                .when(pl.col("apertura_canal_desc") == "Banco Agrario")
-                .then(pl.col("pago_bruto") * 0.1)
-                .when(
-                    (pl.col("apertura_canal_desc") == "Banco-L")
-                    & (
-                        pl.col("fecha_siniestro").is_between(
-                            date(2017, 11, 1), date(2021, 10, 31)
-                        )
-                    )
-                )
-                .then(pl.col("pago_bruto") * 0.1)
-                .when(
-                    pl.col("pago_bruto_acum") - pl.col("pago_bruto")
-                    < pl.col("prioridad")
-                )
-                .then(
-                    pl.col("pago_bruto").clip(
-                        upper_bound=pl.col("prioridad")
-                        - (pl.col("pago_bruto_acum") - pl.col("pago_bruto"))
-                    )
-                )
-                .when(
-                    pl.col("pago_bruto_acum") - pl.col("pago_bruto")
-                    >= pl.col("prioridad")
-                )
-                .then(0)
-            )
+            pago_cedido=pl.col("pago_bruto") - pl.col("pago_retenido"),
+            aviso_cedido=pl.col("aviso_bruto") - pl.col("aviso_retenido"),
+            incurrido_cedido=pl.col("pago_bruto")
+            - pl.col("pago_retenido")
+            + pl.col("aviso_bruto")
+            - pl.col("aviso_retenido"),
         )
-        .with_columns(
-            aviso_retenido=pl.when(cond_meses_ant(mes_corte))
-            .then(pl.col("aviso_retenido"))
-            .when(pl.col("atipico") == 1)
-            .then(pl.col("aviso_bruto") - pl.col("aviso_cedido_atip").fill_null(0))
-            .when(pl.col("atipico") == 0)
-            .then(
-                pl.when(pl.col("numero_poliza") == "083004273427")
-                .then(pl.col("aviso_bruto") * 0.2)
-                .when(pl.col("nombre_tecnico") == "PILOTOS")
-                .then(pl.col("aviso_bruto") * 0.4)
-                .when(pl.col("nombre_tecnico") == "INPEC")
-                .then(pl.col("aviso_bruto") * 0.25)
-                .when(pl.col("apertura_canal_desc") == "Banco Agrario")
-                .then(pl.col("aviso_bruto") * 0.1)
-                .when(
-                    (pl.col("apertura_canal_desc") == "Banco-L")
-                    & (
-                        pl.col("fecha_siniestro").is_between(
-                            date(2017, 11, 1), date(2021, 10, 31)
-                        )
-                    )
-                )
-                .then(pl.col("aviso_bruto") * 0.1)
-                .when(
-                    (
-                        pl.col("incurrido_bruto_acum") - pl.col("incurrido_bruto")
-                        < pl.col("prioridad")
-                    )
-                    & (pl.col("aviso_bruto") >= 0)
-                )
-                .then(
-                    pl.col("aviso_bruto").clip(
-                        upper_bound=pl.col("prioridad")
-                        - (pl.col("incurrido_bruto_acum") - pl.col("incurrido_bruto"))
-                    )
-                )
-                .when(
-                    (
-                        pl.col("incurrido_bruto_acum") - pl.col("incurrido_bruto")
-                        < pl.col("prioridad")
-                    )
-                    & (pl.col("aviso_bruto") < 0)
-                )
-                .then(pl.col("aviso_bruto"))
-                .when(
-                    (
-                        pl.col("incurrido_bruto_acum") - pl.col("incurrido_bruto")
-                        >= pl.col("prioridad")
-                    )
-                    & (pl.col("aviso_bruto") >= 0)
-                )
-                .then(0)
-                .when(
-                    (
-                        pl.col("incurrido_bruto_acum") - pl.col("incurrido_bruto")
-                        >= pl.col("prioridad")
-                    )
-                    & (pl.col("aviso_bruto") < 0)
-                    & (
-                        (
-                            pl.col("aviso_bruto")
-                            - (
-                                pl.col("prioridad")
-                                - (
-                                    pl.col("incurrido_bruto_acum")
-                                    - pl.col("incurrido_bruto")
-                                )
-                            )
-                        ).clip(upper_bound=0)
-                        == 0
-                    )
-                )
-                .then(-pl.col("pago_retenido"))
-                .when(
-                    (pl.col("incurrido_bruto_acum") - pl.col("incurrido_bruto") >= 0)
-                    & (pl.col("aviso_bruto") < 0)
-                )
-                .then(
-                    (
-                        pl.col("aviso_bruto")
-                        - (
-                            pl.col("prioridad")
-                            - (
-                                pl.col("incurrido_bruto_acum")
-                                - pl.col("incurrido_bruto")
-                            )
-                        )
-                    ).clip(upper_bound=0)
-                )
-            )
+        .select(
+            columnas
+            + [
+                "apertura_canal_desc_atip",
+                "pago_cedido_atip",
+                "aviso_cedido_atip",
+                "incurrido_cedido_atip",
+            ]
         )
     )
 
@@ -463,35 +399,11 @@ def cuadrar_reaseguro_con_sap(
 
 def main(df_incurrido: pl.LazyFrame, mes_corte: int) -> pl.LazyFrame:
     segm = segmentaciones.segm()
-    inc_atip = procesar_incurridos_cedidos_atipicos(segm)
-    pcts_retencion = calcular_pcts_retencion(df_incurrido, mes_corte)
-
-    df_reaseguro_aprox_no_083 = (
-        aproximar_reaseguro_no_083(
-            df_incurrido.filter(~FILTRO_083), pcts_retencion, inc_atip, mes_corte
-        )
-        .drop("porcentaje_retencion")
-        .collect()
-    )
+    inc_atip = procesar_incurridos_cedidos_atipicos(segm).pipe(perfiles.recolectar)
 
-    df_reaseguro_aprox_083 = (
-        aproximar_reaseguro_083(df_incurrido.filter(FILTRO_083), inc_atip, mes_corte)
-        .select(df_reaseguro_aprox_no_083.collect_schema().names())
-        .collect()
-    )
-
-    df_reaseguro_aprox = (
-        pl.DataFrame(pl.concat([df_reaseguro_aprox_no_083, df_reaseguro_aprox_083]))
-        .with_columns(
-            pago_cedido=pl.col("pago_bruto") - pl.col("pago_retenido"),
-            aviso_cedido=pl.col("aviso_bruto") - pl.col("aviso_retenido"),
-            incurrido_cedido=pl.col("pago_bruto")
-            - pl.col("pago_retenido")
-            + pl.col("aviso_bruto")
-            - pl.col("aviso_retenido"),
-        )
-        .lazy()
-    )
+    df_reaseguro_aprox = aproximar_reaseguro(
+        df_incurrido, inc_atip.lazy(), mes_corte
+    ).pipe(perfiles.recolectar)
 
-    sap_tipicos = limpiar_atipicos_sap(segm, inc_atip)
-    return cuadrar_reaseguro_con_sap(df_reaseguro_aprox, sap_tipicos, mes_corte)
+    sap_tipicos = limpiar_atipicos_sap(segm, inc_atip.lazy())
+    return cuadrar_reaseguro_con_sap(df_reaseguro_aprox.lazy(), sap_tipicos, mes_corte)
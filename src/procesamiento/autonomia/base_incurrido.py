@@ -1,5 +1,6 @@
 import polars as pl
 
+from src import espacio_trabajo as et
 from src import utils
 
 from . import segmentaciones
@@ -11,7 +12,7 @@ def cruzar_segmentaciones(
 ) -> pl.LazyFrame:
     return (
         df_incurrido.join(
-            utils.lowercase_columns(segm["add_pe_Canal-Poliza"])
+            utils.lowercase_columns(segm["Canal-Poliza"])
             .lazy()
             .with_columns(pl.col("compania_id").cast(pl.Int32))
             .unique(),
@@ -19,7 +20,7 @@ def cruzar_segmentaciones(
             how="left",
         )
         .join(
-            utils.lowercase_columns(segm["add_pe_Canal-Canal"])
+            utils.lowercase_columns(segm["Canal-Canal"])
             .lazy()
             .with_columns(
                 pl.col("compania_id").cast(pl.Int32),
@@ -31,7 +32,7 @@ def cruzar_segmentaciones(
             suffix="_1",
         )
         .join(
-            utils.lowercase_columns(segm["add_pe_Canal-Sucursal"])
+            utils.lowercase_columns(segm["Canal-Sucursal"])
             .lazy()
             .with_columns(
                 pl.col("compania_id").cast(pl.Int32),
@@ -61,7 +62,7 @@ def cruzar_segmentaciones(
             )
         )
         .join(
-            utils.lowercase_columns(segm["add_e_Amparos"])
+            utils.lowercase_columns(segm["Amparos"])
             .lazy()
             .with_columns(
                 pl.col("compania_id").cast(pl.Int32), pl.col("amparo_id").cast(pl.Int32)
@@ -87,12 +88,12 @@ def base_incurrido() -> pl.LazyFrame:
         ~pl.col("amparo_id").is_in([930, 641, 64082, 61296, 18647, -1])
     )
     return (
-        pl.scan_parquet("data/raw/siniestros_brutos.parquet")
+        pl.scan_parquet(et.ruta("data/raw/siniestros_brutos.parquet"))
         .with_columns(fill_nulls)
         .join(
-            pl.scan_parquet("data/raw/siniestros_cedidos.parquet").with_columns(
-                fill_nulls
-            ),
+            pl.scan_parquet(
+                et.ruta("data/raw/siniestros_cedidos.parquet")
+            ).with_columns(fill_nulls),
             on=[
                 "fecha_siniestro",
                 "fecha_registro",
@@ -109,7 +110,7 @@ def base_incurrido() -> pl.LazyFrame:
         )
         .fill_null(0)
         .join(
-            pl.scan_parquet("data/catalogos/planes.parquet"),
+            pl.scan_parquet(et.ruta("data/catalogos/planes.parquet")),
             on="plan_individual_id",
         )
         .with_columns(
@@ -117,7 +118,10 @@ def base_incurrido() -> pl.LazyFrame:
             .then(pl.lit("AAV"))
             .otherwise(pl.col("codigo_ramo_op"))
         )
-        .join(pl.scan_parquet("data/catalogos/sucursales.parquet"), on="sucursal_id")
+        .join(
+            pl.scan_parquet(et.ruta("data/catalogos/sucursales.parquet")),
+            on="sucursal_id",
+        )
         .pipe(cruzar_segmentaciones, segm)
         .join(
             utils.lowercase_columns(segm["Atipicos"])
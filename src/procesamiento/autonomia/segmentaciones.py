@@ -1,10 +1,17 @@
 import polars as pl
 
+from src.extraccion import tablas_adicionales
+
+from . import adds
+
 
 def segm() -> dict[str, pl.DataFrame]:
-    return pl.read_excel(
-        source="data/segmentacion_autonomia.xlsx",
-        sheet_name=[
+    """Tablas de la segmentacion por su nombre sin el prefijo de la hoja, ej:
+    "add_s_Atipicos" -> "Atipicos".
+    """
+    hojas = tablas_adicionales.leer_hojas(
+        adds.RUTA_SEGMENTACION,
+        [
             "add_spe_Canal-Poliza",
             "add_spe_Canal-Canal",
             "add_spe_Canal-Sucursal",
@@ -13,4 +20,5 @@ def segm() -> dict[str, pl.DataFrame]:
             "add_s_Inc_Ced_Atipicos",
             "add_s_SAP_Sinis_Ced",
         ],
-    )  # type: ignore
+    )
+    return {hoja.split("_", 2)[2]: df for hoja, df in hojas.items()}
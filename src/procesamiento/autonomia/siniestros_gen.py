@@ -1,80 +1,128 @@
 import polars as pl
 
-from src import utils
+from src import espacio_trabajo as et
+from src import metricas, perfiles, utils
 from src.procesamiento.autonomia import adds
 
 from . import aprox_reaseguro, base_incurrido
 
+COLUMNAS_CONTEO = [
+    "fecha_siniestro",
+    "codigo_op",
+    "codigo_ramo_op",
+    "apertura_canal_desc",
+    "apertura_amparo_desc",
+    "atipico",
+]
+COLUMNAS_DESISTIDO = [
+    "siniestro_id",
+    "codigo_op",
+    "codigo_ramo_op",
+    "apertura_amparo_desc",
+    "atipico",
+]
+# Registros que cuenta cada conteo y cantidad que se suma por siniestro
+CONTEOS = {
+    "conteo_pago": (pl.col("pago_bruto").abs() > 1000, "pago_bruto"),
+    "conteo_incurrido": (pl.col("incurrido_bruto").abs() > 1000, "incurrido_bruto"),
+    "conteo_desistido": (
+        ~((pl.col("pago_bruto") == 0) & (pl.col("aviso_bruto") == 0)),
+        "incurrido_bruto",
+    ),
+}
+
+
+def codificar_siniestros(df_incurrido: pl.DataFrame) -> pl.LazyFrame:
+    """Los conteos solo necesitan distinguir siniestros, por lo que los ids
+    de texto se cambian por codigos enteros, mas baratos de agrupar.
+    """
+    if df_incurrido.schema["siniestro_id"] != pl.String:
+        return df_incurrido.lazy()
+    return df_incurrido.lazy().with_columns(
+        pl.col("siniestro_id").cast(pl.Categorical).to_physical()
+    )
 
-def calcular_conteo(
-    df_incurrido: pl.LazyFrame, cond: pl.Expr, agg_col: str, column_name: str
-) -> pl.LazyFrame:
-    cols_fijas = [
-        "fecha_siniestro",
-        "codigo_op",
-        "codigo_ramo_op",
-        "apertura_canal_desc",
-        "apertura_amparo_desc",
-        "atipico",
-    ]
+
+def agregar_por_siniestro(df_incurrido: pl.DataFrame) -> pl.DataFrame:
+    """Una fila por siniestro con lo que necesitan los tres conteos: la
+    primera fecha de registro y la suma de los registros de cada conteo, si
+    tiene reserva y su mayor pago. Desistidos son los siniestros sin reserva
+    ni pagos significativos.
+    """
+    vigente = ~pl.col("tipo_estado_siniestro_cd").is_in(["N", "O", "D", "C"])
+    # Las condiciones se evaluan por registro antes de agrupar, para que la
+    # agrupacion solo haga sumas, minimos y maximos
     return (
-        df_incurrido.filter(
-            (~pl.col("tipo_estado_siniestro_cd").is_in(["N", "O", "D", "C"])) & cond
+        codificar_siniestros(df_incurrido)
+        .with_columns(
+            *[
+                pl.when(vigente & cond)
+                .then(pl.col("fecha_registro"))
+                .alias(f"fecha_{nombre}")
+                for nombre, (cond, _) in CONTEOS.items()
+            ],
+            *[
+                pl.when(vigente & cond)
+                .then(pl.col(agg_col))
+                .otherwise(0)
+                .alias(f"valor_{nombre}")
+                for nombre, (cond, agg_col) in CONTEOS.items()
+            ],
+            pago_maximo=pl.col("pago_bruto").abs(),
         )
-        .group_by(cols_fijas + ["siniestro_id"])
-        .agg([pl.min("fecha_registro"), pl.sum(agg_col)])
-        .filter(pl.col(agg_col) > 1000)
-        .group_by(cols_fijas + ["fecha_registro"])
-        .agg(pl.n_unique("siniestro_id"))
-        .rename({"siniestro_id": column_name})
+        .group_by(COLUMNAS_CONTEO + ["siniestro_id"])
+        .agg(
+            *[pl.col(f"fecha_{nombre}").min() for nombre in CONTEOS],
+            *[pl.col(f"valor_{nombre}").sum() for nombre in CONTEOS],
+            pl.col("aviso_bruto").sum(),
+            pl.col("pago_maximo").max(),
+        )
+        .with_columns(
+            en_reserva=pl.col("aviso_bruto").sum().over(COLUMNAS_DESISTIDO) > 1000,
+            pago_maximo=pl.col("pago_maximo").max().over(COLUMNAS_DESISTIDO),
+        )
+        .with_columns(
+            desistido=pl.all_horizontal(pl.col(COLUMNAS_DESISTIDO).is_not_null())
+            & ~pl.col("en_reserva")
+            & (pl.col("pago_maximo") < 1000)
+        )
+        .pipe(perfiles.recolectar)
     )
 
 
-async def main(mes_inicio: int, mes_corte: int, aproximar_reaseguro: bool) -> None:
-    df_incurrido = base_incurrido.base_incurrido()
+def filtro_conteo(nombre: str) -> pl.Expr:
+    filtro = pl.col(f"valor_{nombre}") > 1000
+    return filtro & pl.col("desistido") if nombre == "conteo_desistido" else filtro
 
-    if aproximar_reaseguro:
-        await adds.sap_sinis_ced(mes_corte)
-        df_incurrido = aprox_reaseguro.main(df_incurrido, mes_corte)
 
-    conteo_pago = calcular_conteo(
-        df_incurrido, pl.col("pago_bruto").abs() > 1000, "pago_bruto", "conteo_pago"
-    )
-    conteo_incurrido = calcular_conteo(
-        df_incurrido,
-        pl.col("incurrido_bruto").abs() > 1000,
-        "incurrido_bruto",
-        "conteo_incurrido",
+def calcular_conteos(por_siniestro: pl.DataFrame) -> pl.LazyFrame:
+    """Los tres conteos salen de una sola agregacion: cada siniestro entra
+    una vez por conteo, en la primera fecha de registro de ese conteo.
+    """
+    entradas = pl.concat(
+        [
+            por_siniestro.lazy()
+            .filter(filtro_conteo(nombre))
+            .select(
+                *COLUMNAS_CONTEO,
+                pl.col(f"fecha_{nombre}").alias("fecha_registro"),
+                "siniestro_id",
+                conteo=pl.lit(nombre),
+            )
+            for nombre in CONTEOS
+        ]
     )
-
-    cols_base_desist = [
-        "siniestro_id",
-        "codigo_op",
-        "codigo_ramo_op",
-        "apertura_amparo_desc",
-        "atipico",
-    ]
-    en_rva = (
-        df_incurrido.group_by(cols_base_desist)
-        .agg(pl.col("aviso_bruto").sum())
-        .filter(pl.col("aviso_bruto") > 1000)
-        .with_columns(en_reserva=1)
+    return entradas.group_by(COLUMNAS_CONTEO + ["fecha_registro"]).agg(
+        pl.col("siniestro_id")
+        .filter(pl.col("conteo") == nombre)
+        .n_unique()
+        .alias(nombre)
+        for nombre in CONTEOS
     )
 
-    sin_pagos_bruto = (
-        df_incurrido.join(en_rva, on=cols_base_desist, how="left")
-        .filter(pl.col("en_reserva").is_null())
-        .group_by(cols_base_desist)
-        .agg(pl.col("pago_bruto").abs().max())
-        .filter(pl.col("pago_bruto") < 1000)
-    )
 
-    conteo_desistido = calcular_conteo(
-        df_incurrido.join(sin_pagos_bruto, on=cols_base_desist),
-        ~((pl.col("pago_bruto") == 0) & (pl.col("aviso_bruto") == 0)),
-        "incurrido_bruto",
-        "conteo_desistido",
-    )
+def consolidar(df_incurrido: pl.DataFrame, mes_inicio: int) -> pl.DataFrame:
+    conteos = calcular_conteos(agregar_por_siniestro(df_incurrido))
 
     cols_base = [
         "fecha_siniestro",
@@ -86,13 +134,17 @@ async def main(mes_inicio: int, mes_corte: int, aproximar_reaseguro: bool) -> No
         "atipico",
     ]
 
-    base_pagos_aviso = df_incurrido.group_by(cols_base).agg(
-        [
-            pl.col("pago_bruto").sum(),
-            pl.col("pago_retenido").sum(),
-            pl.col("aviso_bruto").sum(),
-            pl.col("aviso_retenido").sum(),
-        ]
+    base_pagos_aviso = (
+        df_incurrido.lazy()
+        .group_by(cols_base)
+        .agg(
+            [
+                pl.col("pago_bruto").sum(),
+                pl.col("pago_retenido").sum(),
+                pl.col("aviso_bruto").sum(),
+                pl.col("aviso_retenido").sum(),
+            ]
+        )
     )
 
     cols_finales = [
@@ -106,10 +158,8 @@ async def main(mes_inicio: int, mes_corte: int, aproximar_reaseguro: bool) -> No
         "fecha_registro",
     ]
 
-    consolidado = (
-        base_pagos_aviso.join(conteo_pago, on=cols_base, how="full", coalesce=True)
-        .join(conteo_incurrido, on=cols_base, how="full", coalesce=True)
-        .join(conteo_desistido, on=cols_base, how="full", coalesce=True)
+    return (
+        base_pagos_aviso.join(conteos, on=cols_base, how="full", coalesce=True)
         .with_columns(
             pl.col("fecha_siniestro")
             .clip(lower_bound=utils.yyyymm_to_date(mes_inicio))
@@ -122,8 +172,21 @@ async def main(mes_inicio: int, mes_corte: int, aproximar_reaseguro: bool) -> No
         .group_by(cols_finales)
         .sum()
         .sort(cols_finales)
-        .collect()
+        .pipe(perfiles.recolectar)
     )
 
-    consolidado.write_csv("data/raw/siniestros.csv", separator="\t")
-    consolidado.write_parquet("data/raw/siniestros.parquet")
+
+@metricas.instrumentar()
+async def main(mes_inicio: int, mes_corte: int, aproximar_reaseguro: bool) -> None:
+    # La base se usa en varias agregaciones, por lo que se calcula una sola vez
+    df_incurrido = base_incurrido.base_incurrido().pipe(perfiles.recolectar)
+
+    if aproximar_reaseguro:
+        await adds.sap_sinis_ced(mes_corte)
+        df_incurrido = aprox_reaseguro.main(df_incurrido.lazy(), mes_corte).pipe(
+            perfiles.recolectar
+        )
+
+    consolidado = consolidar(df_incurrido, mes_inicio)
+    consolidado.write_csv(et.ruta_salida("data/raw/siniestros.csv"), separator="\t")
+    consolidado.write_parquet(et.ruta_salida("data/raw/siniestros.parquet"))
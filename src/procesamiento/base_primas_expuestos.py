@@ -3,7 +3,7 @@ from typing import Literal
 import polars as pl
 
 import src.constantes as ct
-from src import utils
+from src import metricas, perfiles, utils
 
 
 def fechas_pdn(col: pl.Expr) -> tuple[pl.Expr, pl.Expr, pl.Expr, pl.Expr]:
@@ -15,6 +15,7 @@ def fechas_pdn(col: pl.Expr) -> tuple[pl.Expr, pl.Expr, pl.Expr, pl.Expr]:
     )
 
 
+@metricas.instrumentar()
 def generar_base_primas_expuestos(
     df: pl.LazyFrame, qty: Literal["primas", "expuestos"], negocio: str
 ) -> pl.DataFrame:
@@ -43,4 +44,4 @@ def generar_base_primas_expuestos(
 
     return df.sort(
         columnas_aperturas + ["periodicidad_ocurrencia", "periodo_ocurrencia"]
-    ).collect()
+    ).pipe(perfiles.recolectar)
@@ -5,7 +5,7 @@ from typing import Literal
 import polars as pl
 
 import src.constantes as ct
-from src import utils
+from src import metricas, perfiles, utils
 
 
 def preparar_base_siniestros(
@@ -208,6 +208,7 @@ def construir_diagonales_triangulo(
     return df_diagonales
 
 
+@metricas.instrumentar()
 def generar_bases_siniestros(
     df: pl.LazyFrame,
     tipo_analisis: Literal["triangulos", "entremes"],
@@ -238,7 +239,7 @@ def generar_bases_siniestros(
                     df_sinis_tipicos, "Anual", "Anual", mes_corte, tipo_analisis
                 ),
             ]
-        ).collect()
+        ).pipe(perfiles.recolectar)
         base_ult_ocurr = pl.DataFrame(
             schema=[
                 "apertura_reservas",
@@ -261,7 +262,7 @@ def generar_bases_siniestros(
                     df_sinis_tipicos, "Anual", "Mensual", mes_corte, tipo_analisis
                 ),
             ]
-        ).collect()
+        ).pipe(perfiles.recolectar)
         base_ult_ocurr = pl.concat(
             [
                 construir_diagonales_triangulo(
@@ -286,10 +287,10 @@ def generar_bases_siniestros(
                     "ultima_ocurrencia",
                 ),
             ]
-        ).collect()
+        ).pipe(perfiles.recolectar)
 
     base_atipicos = construir_diagonales_triangulo(
         df_sinis_atipicos, "Mensual", mes_inicio, mes_corte, "atipicos"
-    ).collect()
+    ).pipe(perfiles.recolectar)
 
     return base_triangulos, base_ult_ocurr, base_atipicos
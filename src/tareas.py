@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import inspect
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+from src import utils
+from src.configuracion import configuracion
+from src.logger_config import logger
+from src.models import Tarea
+
+if os.name == "nt":
+    import pythoncom
+
+ESTADOS_ACTIVOS = ("pendiente", "en_curso")
+MAX_TAREAS_TERMINADAS = 200
+
+tarea_actual: ContextVar[Tarea | None] = ContextVar("tarea_actual", default=None)
+
+
+class TareaCanceladaError(Exception):
+    pass
+
+
+def inicializar_com() -> None:
+    # Cada hilo que use xlwings en Windows debe inicializar COM
+    if os.name == "nt":
+        pythoncom.CoInitialize()
+
+
+def llave_tarea(nombre: str, *modelos: BaseModel) -> str:
+    """Dos envios con el mismo nombre y los mismos parametros son la misma
+    tarea. Sin espacios aislados no importa la sesion que los haga; con ellos,
+    cada sesion trabaja en su propia carpeta y su tarea es distinta.
+    """
+    excluir = {"id"} if configuracion.espacios_aislados else {"id", "session_id"}
+    contenido = "|".join(modelo.model_dump_json(exclude=excluir) for modelo in modelos)
+    return f"{nombre}_{hashlib.sha256(contenido.encode()).hexdigest()[:16]}"
+
+
+def reportar_progreso(progreso: float, mensaje: str = "") -> None:
+    """Actualiza el progreso de la tarea que se esta ejecutando en el hilo
+    actual. Es tambien el punto donde se atienden las cancelaciones.
+    """
+    tarea = tarea_actual.get()
+    if tarea is None:
+        return
+    if tarea.cancelacion_solicitada:
+        raise TareaCanceladaError(f"Tarea {tarea.nombre} cancelada.")
+    tarea.progreso = progreso
+    tarea.mensaje = mensaje
+
+
+class GestorTareas:
+    def __init__(self, max_hilos: int = 4) -> None:
+        self.tareas: dict[str, Tarea] = {}
+        self.futuros: dict[str, Future[None]] = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_hilos, thread_name_prefix="tareas")
+        # Excel no admite llamadas concurrentes, todo el trabajo COM va a un hilo
+        self.pool_com = ThreadPoolExecutor(
+            1, thread_name_prefix="tareas_com", initializer=inicializar_com
+        )
+
+    def enviar(
+        self,
+        nombre: str,
+        llave: str,
+        funcion: Callable[..., Any],
+        *args: Any,
+        com: bool = False,
+    ) -> Tarea:
+        with self.lock:
+            activa = self.buscar_activa(llave)
+            if activa is not None:
+                logger.info(
+                    f"La tarea {nombre} ya esta en curso, se reutiliza {activa.id}."
+                )
+                return activa
+
+            self.limpiar_terminadas()
+            tarea = Tarea(nombre=nombre, llave=llave)
+            self.tareas[tarea.id] = tarea
+            self.futuros[tarea.id] = (self.pool_com if com else self.pool).submit(
+                self.ejecutar, tarea, funcion, *args
+            )
+
+        return tarea
+
+    def buscar_activa(self, llave: str) -> Tarea | None:
+        return next(
+            (
+                tarea
+                for tarea in self.tareas.values()
+                if tarea.llave == llave and tarea.estado in ESTADOS_ACTIVOS
+            ),
+            None,
+        )
+
+    def limpiar_terminadas(self) -> None:
+        terminadas = [
+            tarea.id
+            for tarea in self.tareas.values()
+            if tarea.estado not in ESTADOS_ACTIVOS
+        ]
+        for id_tarea in terminadas[: max(len(terminadas) - MAX_TAREAS_TERMINADAS, 0)]:
+            del self.tareas[id_tarea]
+            del self.futuros[id_tarea]
+
+    def ejecutar(self, tarea: Tarea, funcion: Callable[..., Any], *args: Any) -> None:
+        token = tarea_actual.set(tarea)
+        tarea.estado = "en_curso"
+        try:
+            reportar_progreso(0)
+            resultado = funcion(*args)
+            if inspect.isawaitable(resultado):
+                resultado = asyncio.run(resultado)  # type: ignore
+            tarea.resultado = resultado
+            tarea.progreso = 1
+            tarea.estado = "completada"
+        except TareaCanceladaError:
+            logger.warning(f"Tarea {tarea.nombre} cancelada.")
+            tarea.estado = "cancelada"
+        except Exception as exc:
+            logger.exception(f"Error en la tarea {tarea.nombre}.")
+            tarea.error = str(exc)
+            tarea.estado = "error"
+        finally:
+            tarea.fecha_fin = datetime.now()
+            tarea_actual.reset(token)
+
+    def obtener(self, id_tarea: str) -> Tarea:
+        return self.tareas[id_tarea]
+
+    def cancelar(self, id_tarea: str) -> Tarea:
+        tarea = self.tareas[id_tarea]
+        if tarea.estado not in ESTADOS_ACTIVOS:
+            return tarea
+
+        tarea.cancelacion_solicitada = True
+        if self.futuros[id_tarea].cancel():
+            tarea.estado = "cancelada"
+            tarea.fecha_fin = datetime.now()
+        else:
+            logger.info(
+                utils.limpiar_espacios_log(
+                    f"""
+                    Cancelacion de la tarea {tarea.nombre} solicitada, se
+                    detendra en el siguiente punto de control.
+                    """
+                )
+            )
+        return tarea
+
+
+gestor = GestorTareas()
@@ -0,0 +1,150 @@
+import os
+import shutil
+
+import polars as pl
+
+from src import constantes as ct
+from src import espacio_trabajo as et
+from src.configuracion import configuracion
+from src.logger_config import logger
+
+RUTA_VERSIONES = "data/raw/versiones"
+VERSIONES: list[ct.VERSIONES_RAW] = ["raw", "pre_cuadre", "post_cuadre", "post_fraude"]
+
+
+def llaves(columnas: list[str]) -> list[str]:
+    """Las bases crudas estan agrupadas por las columnas hasta la fecha de
+    registro; el resto son cantidades.
+    """
+    return columnas[: columnas.index("fecha_registro") + 1]
+
+
+def calcular_cambios[T: (pl.DataFrame, pl.LazyFrame)](df: T, diferencias: T) -> T:
+    """Filas de la base con las llaves de las diferencias, ya sumadas con
+    ellas. Las llaves que no estan en la base quedan como filas nuevas.
+    """
+    columnas = df.collect_schema().names()
+    afectadas = df.join(
+        diferencias.select(llaves(columnas)),
+        on=llaves(columnas),
+        how="semi",
+        nulls_equal=True,
+    )
+    return (
+        pl.concat([afectadas, diferencias.select(columnas)], how="vertical_relaxed")
+        .group_by(llaves(columnas))
+        .sum()
+    )
+
+
+def aplicar_cambios[T: (pl.DataFrame, pl.LazyFrame)](df: T, cambios: T) -> T:
+    """Reemplaza las filas con las llaves de los cambios, sin volver a
+    agrupar el resto de la base.
+    """
+    columnas = df.collect_schema().names()
+    return pl.concat(
+        [
+            df.join(cambios, on=llaves(columnas), how="anti", nulls_equal=True),
+            cambios.select(columnas),
+        ],
+        how="vertical_relaxed",
+    )
+
+
+def enlazar(origen: str, destino: str) -> None:
+    if os.path.exists(destino):
+        os.remove(destino)
+    try:
+        os.link(origen, destino)
+    except OSError:
+        # Sistemas de archivos sin enlaces duros
+        shutil.copyfile(origen, destino)
+
+
+def ruta_version(file: str, version: ct.VERSIONES_RAW, cambios: bool = False) -> str:
+    sufijo = ".cambios" if cambios else ""
+    return et.ruta(f"{RUTA_VERSIONES}/{file}/{version}{sufijo}.parquet")
+
+
+def iniciar_versiones(file: str) -> None:
+    """La base extraida es la version raw, enlazada sin copiarla. Se borran
+    las versiones de la corrida anterior.
+    """
+    carpeta = et.ruta(f"{RUTA_VERSIONES}/{file}")
+    shutil.rmtree(carpeta, ignore_errors=True)
+    os.makedirs(carpeta)
+    enlazar(et.ruta(f"data/raw/{file}.parquet"), ruta_version(file, "raw"))
+
+
+def versiones_guardadas(file: str) -> list[ct.VERSIONES_RAW]:
+    return [
+        version
+        for version in VERSIONES
+        if os.path.exists(ruta_version(file, version))
+        or os.path.exists(ruta_version(file, version, cambios=True))
+    ]
+
+
+def guardar_version(
+    file: str, version: ct.VERSIONES_RAW, cambios: pl.DataFrame | None = None
+) -> None:
+    """Solo se guardan las filas que cambiaron contra la ultima version. Si
+    no cambio nada, la version es un enlace a la anterior.
+    """
+    anterior = versiones_guardadas(file)[-1]
+    if cambios is not None:
+        cambios.write_parquet(ruta_version(file, version, cambios=True))
+    elif os.path.exists(ruta_version(file, anterior, cambios=True)):
+        enlazar(
+            ruta_version(file, anterior, cambios=True),
+            ruta_version(file, version, cambios=True),
+        )
+    else:
+        enlazar(ruta_version(file, anterior), ruta_version(file, version))
+    logger.debug(f"Version {version} de {file} guardada.")
+
+
+def leer_version(file: str, version: ct.VERSIONES_RAW) -> pl.LazyFrame:
+    """Arma la version desde la raw, aplicando en orden los cambios de las
+    versiones intermedias.
+    """
+    if version not in versiones_guardadas(file):
+        raise FileNotFoundError(f"No existe la version {version} de {file}.")
+
+    df = pl.scan_parquet(ruta_version(file, "raw"))
+    aplicados: list[str] = []
+    for intermedia in VERSIONES[1 : VERSIONES.index(version) + 1]:
+        ruta = ruta_version(file, intermedia, cambios=True)
+        # Una version sin cambios enlaza los de la anterior, que ya se aplicaron
+        if not os.path.exists(ruta) or any(
+            os.path.samefile(ruta, aplicado) for aplicado in aplicados
+        ):
+            continue
+        df = aplicar_cambios(df, pl.scan_parquet(ruta))
+        aplicados.append(ruta)
+    return df
+
+
+def materializar(file: str) -> None:
+    """Escribe la ultima version como la base que leen las demas etapas. Es
+    la unica escritura completa de la base en los controles, y solo ocurre
+    si alguna version tiene cambios.
+    """
+    ultima = versiones_guardadas(file)[-1]
+    if not os.path.exists(ruta_version(file, ultima, cambios=True)):
+        return
+
+    ruta = et.ruta(f"data/raw/{file}.parquet")
+    leer_version(file, ultima).sink_parquet(f"{ruta}.tmp")
+    # Reemplazar el archivo no modifica la version raw, que lo tenia enlazado
+    os.replace(f"{ruta}.tmp", ruta)
+
+    ruta_csv = et.ruta(f"data/raw/{file}.csv")
+    if configuracion.versiones_raw_csv:
+        # El CSV de la extraccion se conserva hasta tener el de la version final
+        pl.scan_parquet(ruta).sink_csv(f"{ruta_csv}.tmp", separator="\t")
+        os.replace(f"{ruta_csv}.tmp", ruta_csv)
+    elif os.path.exists(ruta_csv):
+        # El CSV de la extraccion ya no corresponde a la base
+        os.remove(ruta_csv)
+    logger.info(f"Base {file} actualizada con la version {ultima}.")
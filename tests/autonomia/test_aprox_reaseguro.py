@@ -0,0 +1,48 @@
+import os
+from datetime import date
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from src import utils
+from src.procesamiento.autonomia import aprox_reaseguro, segmentaciones
+from tests import datos_sinteticos as ds
+
+MES_CORTE = 202412
+RUTA_ESPERADO = os.path.join(os.path.dirname(__file__), "datos/aprox_reaseguro.parquet")
+
+
+def aproximar(incurrido: pl.DataFrame) -> pl.DataFrame:
+    segm = ds.generar_segmentacion_reaseguro(incurrido, utils.yyyymm_to_date(MES_CORTE))
+    with patch.object(segmentaciones, "segm", return_value=segm):
+        return aprox_reaseguro.main(incurrido.lazy(), MES_CORTE).collect()
+
+
+@pytest.fixture
+def incurrido() -> pl.DataFrame:
+    esp = ds.EspecificacionDatos(
+        mes_inicio=date(2016, 1, 1),
+        mes_corte=utils.yyyymm_to_date(MES_CORTE),
+        escala=0.03,
+        semilla=7,
+        pct_atipicos=0.15,
+    )
+    return ds.generar_incurrido_autonomia(esp)
+
+
+@pytest.mark.unit
+def test_aprox_reaseguro_regresion(incurrido: pl.DataFrame):
+    """Compara contra la salida guardada de la aproximacion sobre los mismos
+    datos, para que los cambios de implementacion no cambien las cifras.
+    """
+    resultado = aproximar(incurrido)
+    esperado = pl.read_parquet(RUTA_ESPERADO)
+
+    assert resultado.height == incurrido.height
+    assert_frame_equal(
+        resultado.select(esperado.columns).sort(pl.all()),
+        esperado,
+        check_dtypes=False,
+        rtol=1e-9,
+    )
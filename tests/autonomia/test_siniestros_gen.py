@@ -0,0 +1,82 @@
+from datetime import date
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from src.procesamiento.autonomia import siniestros_gen
+
+COLUMNAS = siniestros_gen.COLUMNAS_CONTEO + ["fecha_registro"]
+
+
+def mock_incurrido(filas: int, semilla: int) -> pl.DataFrame:
+    rng = np.random.default_rng(semilla)
+    fechas = pl.date_range(date(2023, 1, 1), date(2023, 12, 1), "1mo", eager=True)
+    pagos = rng.choice([0.0, 500.0, 5000.0, -3000.0], filas)
+    avisos = rng.choice([0.0, 800.0, 20000.0, -20000.0], filas)
+    return pl.DataFrame(
+        {
+            "fecha_siniestro": rng.choice(fechas.to_numpy()[:3], filas),
+            "codigo_op": rng.choice(["01", "02"], filas),
+            "codigo_ramo_op": rng.choice(["081", "083", None], filas).tolist(),
+            "apertura_canal_desc": rng.choice(["Banca", "Resto"], filas),
+            "apertura_amparo_desc": "RESTO",
+            "atipico": rng.choice([0, 1], filas, p=[0.9, 0.1]),
+            "siniestro_id": rng.integers(0, filas // 4, filas).astype(str),
+            "fecha_registro": rng.choice(fechas.to_numpy(), filas),
+            "tipo_estado_siniestro_cd": rng.choice(["A", "N", "P", "C"], filas),
+            "pago_bruto": pagos,
+            "aviso_bruto": avisos,
+            "incurrido_bruto": pagos + avisos,
+        }
+    ).with_columns(pl.col("fecha_siniestro", "fecha_registro").cast(pl.Date))
+
+
+def conteo_por_registros(
+    df: pl.DataFrame, cond: pl.Expr, agg_col: str, nombre: str
+) -> pl.DataFrame:
+    """Conteo calculado directamente sobre los registros del incurrido."""
+    return (
+        df.filter(~pl.col("tipo_estado_siniestro_cd").is_in(["N", "O", "D", "C"]))
+        .filter(cond)
+        .group_by(siniestros_gen.COLUMNAS_CONTEO + ["siniestro_id"])
+        .agg(pl.min("fecha_registro"), pl.sum(agg_col))
+        .filter(pl.col(agg_col) > 1000)
+        .group_by(COLUMNAS)
+        .agg(pl.n_unique("siniestro_id").alias(nombre))
+    )
+
+
+@pytest.mark.unit
+def test_conteos_por_siniestro():
+    df = mock_incurrido(5000, semilla=3)
+    por_siniestro = siniestros_gen.agregar_por_siniestro(df)
+
+    llaves = siniestros_gen.COLUMNAS_DESISTIDO
+    desistidos = (
+        df.filter(pl.all_horizontal(pl.col(llaves).is_not_null()))
+        .group_by(llaves)
+        .agg(pl.sum("aviso_bruto"), pl.col("pago_bruto").abs().max())
+        .filter((pl.col("aviso_bruto") <= 1000) & (pl.col("pago_bruto") < 1000))
+        .select(llaves)
+    )
+    esperados = {
+        nombre: conteo_por_registros(
+            df.join(desistidos, on=llaves) if nombre == "conteo_desistido" else df,
+            cond,
+            agg_col,
+            nombre,
+        )
+        for nombre, (cond, agg_col) in siniestros_gen.CONTEOS.items()
+    }
+
+    conteos = siniestros_gen.calcular_conteos(por_siniestro).collect()
+    for nombre, esperado in esperados.items():
+        assert not esperado.is_empty()
+        assert_frame_equal(
+            conteos.filter(pl.col(nombre) > 0)
+            .select(COLUMNAS + [nombre])
+            .sort(COLUMNAS, nulls_last=True),
+            esperado.sort(COLUMNAS, nulls_last=True),
+            check_dtypes=False,
+        )
@@ -0,0 +1,63 @@
+-- Query con la misma estructura que las de data/queries, sobre las tablas
+-- sinteticas del backend local de Teradata
+
+CREATE MULTISET VOLATILE TABLE ramos
+(
+    codigo_ramo_op VARCHAR(3) NOT NULL
+    , ramo_desc VARCHAR(100) NOT NULL
+) PRIMARY INDEX (codigo_ramo_op) ON COMMIT PRESERVE ROWS;
+INSERT INTO ramos VALUES (?, ?);  -- noqa:
+COLLECT STATISTICS ON ramos INDEX (codigo_ramo_op);  -- noqa:
+
+
+CREATE MULTISET VOLATILE TABLE base_siniestros
+(
+    codigo_op VARCHAR(2) NOT NULL
+    , codigo_ramo_op VARCHAR(3) NOT NULL
+    , apertura_1 VARCHAR(100) NOT NULL
+    , apertura_2 VARCHAR(100) NOT NULL
+    , fecha_siniestro DATE NOT NULL
+    , fecha_registro DATE NOT NULL
+    , pago_bruto FLOAT
+    , aviso_bruto FLOAT
+) PRIMARY INDEX (codigo_ramo_op, fecha_registro) ON COMMIT PRESERVE ROWS;
+
+INSERT INTO base_siniestros
+SELECT
+    sini.codigo_op
+    , sini.codigo_ramo_op
+    , sini.apertura_1
+    , sini.apertura_2
+    , sini.fecha_siniestro
+    , sini.fecha_registro
+    , sini.pago_bruto
+    , sini.aviso_bruto
+FROM mdb_seguros_colombia.v_siniestros_sinteticos AS sini
+WHERE sini.mes_id BETWEEN {{chunk_ini}} AND {{chunk_fin}};
+COLLECT STATISTICS ON base_siniestros INDEX (codigo_ramo_op, fecha_registro);  -- noqa:
+
+
+CREATE MULTISET VOLATILE TABLE siniestros AS
+(
+    SELECT
+        base.codigo_op
+        , base.codigo_ramo_op
+        , ramos.ramo_desc
+        , base.apertura_1
+        , base.apertura_2
+        , base.fecha_siniestro
+        , base.fecha_registro
+        , ZEROIFNULL(SUM(base.pago_bruto)) AS pago_bruto
+        , ZEROIFNULL(SUM(base.aviso_bruto)) AS aviso_bruto
+    FROM base_siniestros AS base
+    INNER JOIN ramos ON (base.codigo_ramo_op = ramos.codigo_ramo_op)
+    WHERE
+        base.fecha_registro BETWEEN (DATE '{fecha_primera_ocurrencia}')
+        AND LAST_DAY((DATE '{fecha_mes_corte}'))
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+) WITH DATA PRIMARY INDEX (
+    codigo_ramo_op, apertura_1, apertura_2, fecha_siniestro, fecha_registro
+) ON COMMIT PRESERVE ROWS;
+
+
+SELECT * FROM siniestros ORDER BY 1, 2, 4, 5, 6, 7
@@ -0,0 +1,327 @@
+import asyncio
+import contextlib
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from typing import Any
+from unittest.mock import patch
+
+import polars as pl
+from src import main, metricas, utils
+from src.configuracion import configuracion
+from src.controles_informacion import cuadre_contable, exportacion
+from src.controles_informacion import generacion as ctrl
+from src.extraccion import tera_connect, teradata_local
+from src.logger_config import logger
+from src.metodos_plantilla import tablas_resumen
+from src.metodos_plantilla.completar_diagonal import factor_completitud
+from src.models import Parametros
+from src.procesamiento import base_primas_expuestos as bpdn
+from src.procesamiento import base_siniestros as bsin
+from src.procesamiento.autonomia import aprox_reaseguro, segmentaciones
+
+from tests import datos_sinteticos as ds
+
+NEGOCIO = "bench"
+RUTA_RESULTADOS = "logs/benchmarks.parquet"
+COLUMNAS_TERA = ["codigo_op", "codigo_ramo_op", "fecha_registro"]
+QTYS_CUADRE = ["pago_bruto", "pago_retenido", "aviso_bruto", "aviso_retenido"]
+QUERY_EXTRACCION = os.path.join(os.path.dirname(__file__), "queries/siniestros.sql")
+EXTRACCIONES_CONCURRENTES = 4
+# Por debajo de este aumento de memoria no se reporta regresion, ya que el
+# ruido del asignador de memoria es de ese orden
+MEMORIA_MINIMA_MB = 10
+
+ESQUEMA_RESULTADOS = pl.Schema(
+    {
+        "commit": pl.String(),
+        "fecha": pl.Datetime("us"),
+        "escala": pl.Float64(),
+        "caso": pl.String(),
+        "repeticiones": pl.Int64(),
+        "duracion_s": pl.Float64(),
+        "duracion_mediana_s": pl.Float64(),
+        "tiempo_cpu_s": pl.Float64(),
+        "memoria_mb": pl.Float64(),
+    }
+)
+
+
+def especificacion_benchmark(escala: float, semilla: int) -> ds.EspecificacionDatos:
+    """Cardinalidad parecida a la de un negocio real: 10 ramos con 16
+    aperturas cada uno, con pocas aperturas concentrando los registros.
+    """
+    return ds.EspecificacionDatos(
+        mes_inicio=utils.yyyymm_to_date(201501),
+        mes_corte=utils.yyyymm_to_date(202312),
+        escala=escala,
+        semilla=semilla,
+        num_ramos=10,
+        valores_apertura=4,
+        sesgo=0.8,
+        periodicidades=["Mensual", "Trimestral", "Semestral", "Anual"],
+    )
+
+
+@contextlib.contextmanager
+def backend_local() -> Iterator[None]:
+    """La extraccion corre sobre las tablas sinteticas del directorio actual."""
+    backend, ruta = configuracion.teradata_backend, configuracion.teradata_local_ruta
+    configuracion.teradata_backend = "local"
+    configuracion.teradata_local_ruta = "data/teradata_local"
+    try:
+        yield
+    finally:
+        configuracion.teradata_backend = backend
+        configuracion.teradata_local_ruta = ruta
+
+
+def preparar_datos(esp: ds.EspecificacionDatos) -> Parametros:
+    """Crea en el directorio actual la estructura de carpetas, la
+    segmentacion y las bases de las que parten los casos.
+    """
+    for carpeta in ["data/raw", "data/processed", "data/db"]:
+        os.makedirs(carpeta, exist_ok=True)
+    ds.escribir_segmentacion(esp, f"data/segmentacion_{NEGOCIO}.xlsx")
+
+    ds.generar_siniestros(esp).collect().write_parquet("data/raw/siniestros.parquet")
+    ds.generar_primas(esp).collect().write_parquet("data/raw/primas.parquet")
+    ds.generar_expuestos(esp).collect().write_parquet("data/raw/expuestos.parquet")
+    teradata_local.cargar_tablas(ds.generar_tablas_teradata(esp))
+    ds.generar_ramos(esp).write_parquet("data/raw/ramos.parquet")
+
+    p = Parametros(
+        negocio=NEGOCIO,
+        mes_inicio=utils.date_to_yyyymm(esp.mes_inicio),
+        mes_corte=utils.date_to_yyyymm(esp.mes_corte),
+        tipo_analisis="triangulos",
+        nombre_plantilla=NEGOCIO,
+        session_id=NEGOCIO,
+    )
+    main.generar_bases_plantilla(p)
+    return p
+
+
+async def extraer(p: Parametros, concurrencia: int) -> list[pl.DataFrame]:
+    queries = tera_connect.reemplazar_parametros_queries(
+        open(QUERY_EXTRACCION).read(), p
+    ).split(";")
+    particiones_fechas = tera_connect.crear_particiones_fechas(
+        p.mes_inicio, p.mes_corte
+    )
+    ramos = pl.read_parquet("data/raw/ramos.parquet")
+    return await asyncio.gather(
+        *[
+            tera_connect.ejecutar_queries(queries, particiones_fechas, [ramos])
+            for _ in range(concurrencia)
+        ]
+    )
+
+
+def aproximar_reaseguro(esp: ds.EspecificacionDatos) -> Callable[[], Any]:
+    incurrido = ds.generar_incurrido_autonomia(esp)
+    segm = ds.generar_segmentacion_reaseguro(incurrido, esp.mes_corte)
+
+    def aproximar() -> pl.DataFrame:
+        with patch.object(segmentaciones, "segm", return_value=segm):
+            return aprox_reaseguro.main(
+                incurrido.lazy(), utils.date_to_yyyymm(esp.mes_corte)
+            ).collect()
+
+    return aproximar
+
+
+def casos(p: Parametros, esp: ds.EspecificacionDatos) -> dict[str, Callable[[], Any]]:
+    siniestros = pl.read_parquet("data/raw/siniestros.parquet")
+    aperturas = utils.obtener_aperturas(NEGOCIO, "siniestros")
+    mes_corte = utils.yyyymm_to_date(p.mes_corte)
+    qtys_control, group_cols_control = ctrl.definir_cantidades_control(
+        NEGOCIO, "siniestros"
+    )
+    df_control, _, _ = ctrl.calcular_agregados(
+        siniestros, group_cols_control, qtys_control
+    )
+
+    df_tera = ctrl.reagrupar(siniestros, COLUMNAS_TERA, QTYS_CUADRE)
+    df_sap = df_tera.with_columns(pl.col(qty) * 1.02 for qty in QTYS_CUADRE)
+    dif_sap_vs_tera = ctrl.calcular_diferencias_sap_tera(
+        df_tera, df_sap, p.mes_corte, QTYS_CUADRE
+    )[0].filter(pl.col("fecha_registro") == mes_corte)
+
+    return {
+        "extraccion_local": lambda: asyncio.run(extraer(p, 1)),
+        "extraccion_local_concurrente": lambda: asyncio.run(
+            extraer(p, EXTRACCIONES_CONCURRENTES)
+        ),
+        "generar_bases_siniestros": lambda: bsin.generar_bases_siniestros(
+            pl.scan_parquet("data/raw/siniestros.parquet"),
+            "triangulos",
+            utils.yyyymm_to_date(p.mes_inicio),
+            mes_corte,
+        ),
+        "generar_base_primas_expuestos": lambda: bpdn.generar_base_primas_expuestos(
+            pl.scan_parquet("data/raw/primas.parquet"), "primas", NEGOCIO
+        ),
+        "generar_tablas_resumen": lambda: tablas_resumen.generar_tablas_resumen(
+            NEGOCIO, "triangulos", aperturas.lazy()
+        ),
+        "calcular_factores_completitud": (
+            lambda: factor_completitud.calcular_factores_completitud(
+                aperturas.lazy(), p.mes_corte
+            )
+        ),
+        "agrupar_tera": lambda: ctrl.calcular_agregados(
+            siniestros, COLUMNAS_TERA + ["apertura_reservas"], QTYS_CUADRE
+        ),
+        "calcular_agregados_controles": lambda: ctrl.calcular_agregados(
+            siniestros, group_cols_control, qtys_control
+        ),
+        "exportar_control_excel": lambda: exportacion.escribir_excel(
+            df_control, "data/control_tera.xlsx"
+        ),
+        "exportar_control_write_excel": lambda: df_control.write_excel(
+            "data/control_tera_write_excel.xlsx"
+        ),
+        "comparar_sap_tera": lambda: ctrl.calcular_diferencias_sap_tera(
+            df_tera, df_sap, p.mes_corte, QTYS_CUADRE
+        ),
+        "realizar_cuadre_contable": lambda: cuadre_contable.cuadrar_base(
+            NEGOCIO, "siniestros", siniestros, dif_sap_vs_tera
+        ),
+        "aproximar_reaseguro": aproximar_reaseguro(esp),
+    }
+
+
+def medir_caso(funcion: Callable[[], Any], repeticiones: int) -> dict[str, Any]:
+    """El tiempo reportado es el minimo de las repeticiones, que es el menos
+    afectado por otros procesos. La memoria es el aumento sobre la que ya
+    usaba el proceso antes del caso.
+    """
+    duraciones, tiempos_cpu, memorias = [], [], []
+    for _ in range(repeticiones):
+        monitor = metricas.MonitorMemoria()
+        memoria_inicial = monitor.pico / 2**20
+        monitor.start()
+        s, s_cpu = time.perf_counter(), time.process_time()
+        funcion()
+        duraciones.append(time.perf_counter() - s)
+        tiempos_cpu.append(time.process_time() - s_cpu)
+        memorias.append(monitor.terminar() - memoria_inicial)
+
+    return {
+        "repeticiones": repeticiones,
+        "duracion_s": min(duraciones),
+        "duracion_mediana_s": statistics.median(duraciones),
+        "tiempo_cpu_s": min(tiempos_cpu),
+        "memoria_mb": max(memorias),
+    }
+
+
+def commit_actual() -> str:
+    git = shutil.which("git")
+    if git is None:
+        return "desconocido"
+    resultado = subprocess.run(  # noqa: S603
+        [git, "rev-parse", "--short", "HEAD"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return resultado.stdout.strip() or "desconocido"
+
+
+def correr_suite(
+    escalas: list[float],
+    repeticiones: int = 3,
+    semilla: int = 42,
+    filtro_casos: list[str] | None = None,
+) -> pl.DataFrame:
+    commit, fecha, filas = commit_actual(), datetime.now(), []
+    for escala in escalas:
+        with (
+            tempfile.TemporaryDirectory(prefix="benchmarks_") as carpeta,
+            contextlib.chdir(carpeta),
+            backend_local(),
+        ):
+            esp = especificacion_benchmark(escala, semilla)
+            p = preparar_datos(esp)
+            for caso, funcion in casos(p, esp).items():
+                if filtro_casos is not None and caso not in filtro_casos:
+                    continue
+                logger.info(f"Benchmark {caso} con escala {escala}...")
+                filas.append(
+                    {"commit": commit, "fecha": fecha, "escala": escala, "caso": caso}
+                    | medir_caso(funcion, repeticiones)
+                )
+
+    return pl.DataFrame(filas, schema=ESQUEMA_RESULTADOS)
+
+
+def leer_resultados(ruta: str = RUTA_RESULTADOS) -> pl.DataFrame:
+    if not os.path.exists(ruta):
+        return pl.DataFrame(schema=ESQUEMA_RESULTADOS)
+    return pl.read_parquet(ruta)
+
+
+def guardar_resultados(resultados: pl.DataFrame, ruta: str = RUTA_RESULTADOS) -> None:
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    pl.concat([leer_resultados(ruta), resultados]).write_parquet(ruta)
+
+
+def reporte_regresiones(
+    historico: pl.DataFrame, actuales: pl.DataFrame, umbral: float
+) -> pl.DataFrame:
+    """Compara cada caso con la ultima medicion de un commit distinto, con la
+    misma escala.
+    """
+    commits_actuales = actuales.get_column("commit").unique()
+    referencia = (
+        historico.filter(~pl.col("commit").is_in(commits_actuales.implode()))
+        .sort("fecha")
+        .group_by(["caso", "escala"])
+        .last()
+        .select(
+            "caso",
+            "escala",
+            pl.col("commit").alias("commit_referencia"),
+            pl.col("duracion_s").alias("duracion_referencia_s"),
+            pl.col("memoria_mb").alias("memoria_referencia_mb"),
+        )
+    )
+
+    regresion_memoria = (
+        pl.col("memoria_mb") > pl.col("memoria_referencia_mb") * (1 + umbral)
+    ) & (pl.col("memoria_mb") - pl.col("memoria_referencia_mb") > MEMORIA_MINIMA_MB)
+
+    return (
+        actuales.join(referencia, on=["caso", "escala"], how="left")
+        .with_columns(
+            ratio_duracion=pl.col("duracion_s") / pl.col("duracion_referencia_s")
+        )
+        .with_columns(
+            estado=pl.when(pl.col("commit_referencia").is_null())
+            .then(pl.lit("sin_referencia"))
+            .when((pl.col("ratio_duracion") > 1 + umbral) | regresion_memoria)
+            .then(pl.lit("regresion"))
+            .when(pl.col("ratio_duracion") < 1 - umbral)
+            .then(pl.lit("mejora"))
+            .otherwise(pl.lit("estable"))
+        )
+        .select(
+            "caso",
+            "escala",
+            "commit_referencia",
+            "duracion_referencia_s",
+            "duracion_s",
+            "ratio_duracion",
+            "memoria_referencia_mb",
+            "memoria_mb",
+            "estado",
+        )
+        .sort(["escala", "caso"])
+    )
@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import Any
+
+import polars as pl
+import pytest
+
+from tests.benchmarks import suite
+
+
+@pytest.mark.integration
+def test_correr_suite():
+    resultados = suite.correr_suite([0.02], repeticiones=1)
+
+    assert resultados.get_column("caso").to_list() == [
+        "extraccion_local",
+        "extraccion_local_concurrente",
+        "generar_bases_siniestros",
+        "generar_base_primas_expuestos",
+        "generar_tablas_resumen",
+        "calcular_factores_completitud",
+        "agrupar_tera",
+        "calcular_agregados_controles",
+        "exportar_control_excel",
+        "exportar_control_write_excel",
+        "comparar_sap_tera",
+        "realizar_cuadre_contable",
+        "aproximar_reaseguro",
+    ]
+    assert resultados.get_column("duracion_s").min() > 0  # type: ignore
+
+
+@pytest.mark.unit
+def test_reporte_regresiones():
+    def resultado(
+        commit: str, dia: int, duracion: float, memoria: float
+    ) -> dict[str, Any]:
+        return {
+            "commit": commit,
+            "fecha": datetime(2025, 1, dia),
+            "escala": 1.0,
+            "caso": "agrupar_tera",
+            "repeticiones": 3,
+            "duracion_s": duracion,
+            "duracion_mediana_s": duracion,
+            "tiempo_cpu_s": duracion,
+            "memoria_mb": memoria,
+        }
+
+    historico = pl.DataFrame(
+        [resultado("a", 1, 1.0, 100), resultado("b", 2, 2.0, 100)],
+        schema=suite.ESQUEMA_RESULTADOS,
+    )
+
+    def estado(duracion: float, memoria: float) -> str:
+        actuales = pl.DataFrame(
+            [resultado("c", 3, duracion, memoria)], schema=suite.ESQUEMA_RESULTADOS
+        )
+        return suite.reporte_regresiones(historico, actuales, 0.2).item(0, "estado")
+
+    assert estado(2.1, 100) == "estable"
+    assert estado(2.5, 100) == "regresion"
+    assert estado(1.5, 100) == "mejora"
+    assert estado(2.0, 105) == "estable"
+    assert estado(2.0, 150) == "regresion"
@@ -1,6 +1,8 @@
 import os
+import shutil
 import sys
 from datetime import date
+from typing import Any
 
 import numpy as np
 import polars as pl
@@ -8,12 +10,26 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
-from src import utils
+from src import ejecucion, metricas, tareas
 from src.app import app, get_session
+from src.models import Tarea
+
+from tests import datos_sinteticos as ds
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
 
+@pytest.fixture(autouse=True, scope="session")
+def ejecutor_en_hilos() -> None:
+    # Los mocks de las pruebas no llegan a otros procesos
+    ejecucion.usar_hilos()
+
+
+@pytest.fixture(autouse=True, scope="session")
+def metricas_temporales(tmp_path_factory: pytest.TempPathFactory) -> None:
+    metricas.RUTA_METRICAS = str(tmp_path_factory.mktemp("logs") / "metrics")
+
+
 @pytest.fixture
 def rango_meses() -> tuple[date, date]:
     mes_inicio = date(np.random.randint(2010, 2019), np.random.randint(1, 12), 1)
@@ -22,94 +38,23 @@ def rango_meses() -> tuple[date, date]:
 
 
 @pytest.fixture
-def mock_siniestros(rango_meses: tuple[date, date]) -> pl.LazyFrame:
-    num_rows = 100000
-    return pl.LazyFrame(
-        {
-            "codigo_op": np.random.choice(["01"], size=num_rows),
-            "codigo_ramo_op": np.random.choice(["001", "002"], size=num_rows),
-            "apertura_1": np.random.choice(["A", "B"], size=num_rows),
-            "apertura_2": np.random.choice(["D", "E"], size=num_rows),
-            "atipico": np.random.choice([0, 1], size=num_rows, p=[0.95, 0.05]),
-            "fecha_siniestro": np.random.choice(
-                pl.date_range(
-                    rango_meses[0], rango_meses[1], interval="1mo", eager=True
-                ),
-                size=num_rows,
-            ),
-            "fecha_registro": np.random.choice(
-                pl.date_range(
-                    rango_meses[0], rango_meses[1], interval="1mo", eager=True
-                ),
-                size=num_rows,
-            ),
-            "pago_bruto": np.random.random(size=num_rows) * 1e8,
-            "pago_retenido": np.random.random(size=num_rows) * 1e6,
-            "aviso_bruto": np.random.random(size=num_rows) * 1e7,
-            "aviso_retenido": np.random.random(size=num_rows) * 1e5,
-            "conteo_pago": np.random.randint(0, 100, size=num_rows),
-            "conteo_incurrido": np.random.randint(0, 110, size=num_rows),
-            "conteo_desistido": np.random.randint(0, 10, size=num_rows),
-        }
-    ).with_columns(utils.crear_columna_apertura_reservas("mock"))
+def especificacion_datos(rango_meses: tuple[date, date]) -> ds.EspecificacionDatos:
+    return ds.EspecificacionDatos(mes_inicio=rango_meses[0], mes_corte=rango_meses[1])
 
 
 @pytest.fixture
-def mock_primas(rango_meses: tuple[date, date]) -> pl.LazyFrame:
-    num_rows = 10000
-    return pl.LazyFrame(
-        {
-            "codigo_op": np.random.choice(["01"], size=num_rows),
-            "codigo_ramo_op": np.random.choice(["001", "002"], size=num_rows),
-            "apertura_1": np.random.choice(["A", "B"], size=num_rows),
-            "apertura_2": np.random.choice(["D", "E"], size=num_rows),
-            "fecha_registro": np.random.choice(
-                pl.date_range(
-                    rango_meses[0], rango_meses[1], interval="1mo", eager=True
-                ),
-                size=num_rows,
-            ),
-            "prima_bruta": np.random.random(size=num_rows) * 1e8,
-            "prima_retenida": np.random.random(size=num_rows) * 1e7,
-            "prima_bruta_devengada": np.random.random(size=num_rows) * 1e8,
-            "prima_retenida_devengada": np.random.random(size=num_rows) * 1e7,
-        }
-    ).with_columns(utils.crear_columna_apertura_reservas("mock"))
+def mock_siniestros(especificacion_datos: ds.EspecificacionDatos) -> pl.LazyFrame:
+    return ds.generar_siniestros(especificacion_datos)
 
 
 @pytest.fixture
-def mock_expuestos(rango_meses: tuple[date, date]) -> pl.LazyFrame:
-    num_rows = 10000
-    return (
-        pl.LazyFrame(
-            {
-                "codigo_op": np.random.choice(["01"], size=num_rows),
-                "codigo_ramo_op": np.random.choice(["001", "002"], size=num_rows),
-                "apertura_1": np.random.choice(["A", "B"], size=num_rows),
-                "apertura_2": np.random.choice(["D", "E"], size=num_rows),
-                "fecha_registro": np.random.choice(
-                    pl.date_range(
-                        rango_meses[0], rango_meses[1], interval="1mo", eager=True
-                    ),
-                    size=num_rows,
-                ),
-                "expuestos": np.random.random(size=num_rows) * 1e6,
-                "vigentes": np.random.random(size=num_rows) * 1e6,
-            }
-        )
-        .with_columns(utils.crear_columna_apertura_reservas("mock"))
-        .group_by(
-            [
-                "apertura_reservas",
-                "codigo_op",
-                "codigo_ramo_op",
-                "apertura_1",
-                "apertura_2",
-                "fecha_registro",
-            ]
-        )
-        .mean()
-    )
+def mock_primas(especificacion_datos: ds.EspecificacionDatos) -> pl.LazyFrame:
+    return ds.generar_primas(especificacion_datos)
+
+
+@pytest.fixture
+def mock_expuestos(especificacion_datos: ds.EspecificacionDatos) -> pl.LazyFrame:
+    return ds.generar_expuestos(especificacion_datos)
 
 
 @pytest.fixture
@@ -136,24 +81,37 @@ def test_session():
 
 
 @pytest.fixture
-def client(test_session: Session):
+def tareas_sincronas(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Las pruebas verifican el efecto de cada endpoint apenas responde, asi
+    que cada envio espera a que su tarea termine.
+    """
+    enviar = tareas.gestor.enviar
+
+    def enviar_y_esperar(*args: Any, **kwargs: Any) -> Tarea:
+        tarea = enviar(*args, **kwargs)
+        tareas.gestor.futuros[tarea.id].result()
+        return tarea
+
+    monkeypatch.setattr(tareas.gestor, "enviar", enviar_y_esperar)
+
+
+@pytest.fixture
+def client(test_session: Session, tareas_sincronas: None):
     def get_test_session():
         return test_session
 
     app.dependency_overrides[get_session] = get_test_session
-
     client = TestClient(app, cookies={"session_id": "test-usuario-1"})
     yield client
     app.dependency_overrides.clear()
 
 
 @pytest.fixture
-def client_2(test_session: Session):
+def client_2(test_session: Session, tareas_sincronas: None):
     def get_test_session():
         return test_session
 
     app.dependency_overrides[get_session] = get_test_session
-
     client = TestClient(app, cookies={"session_id": "test-usuario-2"})
     yield client
     app.dependency_overrides.clear()
@@ -177,5 +135,7 @@ def assert_diferente(
 
 def vaciar_directorio(directorio: str) -> None:
     for file in os.listdir(directorio):
-        if file != ".gitkeep":
+        if os.path.isdir(f"{directorio}/{file}"):
+            shutil.rmtree(f"{directorio}/{file}")
+        elif file != ".gitkeep":
             os.remove(f"{directorio}/{file}")
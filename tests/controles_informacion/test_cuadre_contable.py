@@ -42,13 +42,13 @@ async def test_cuadre_contable_soat(
     ).collect()
 
     qtys = ["pago_bruto", "pago_retenido", "aviso_bruto", "aviso_retenido"]
-    df_tera = ctrl.agrupar_tera(
+    df_tera = ctrl.reagrupar(
         mock_soat, ["codigo_op", "codigo_ramo_op", "fecha_registro"], qtys
     )
 
     dif_sap_vs_tera = (
         await ctrl.comparar_sap_tera(df_tera, df_sap, mes_corte_int, qtys)
-    ).filter(pl.col("fecha_registro") == mes_corte)
+    )[0].filter(pl.col("fecha_registro") == mes_corte)
 
     with patch(
         "src.controles_informacion.cuadre_contable.obtener_aperturas_para_asignar_diferencia"
@@ -63,7 +63,7 @@ async def test_cuadre_contable_soat(
         ).with_columns(utils.crear_columna_apertura_reservas("mock"))
 
         with patch("src.controles_informacion.cuadre_contable.guardar_archivos"):
-            df_cuadre = await cuadre_contable.realizar_cuadre_contable(
+            df_cuadre, _ = await cuadre_contable.realizar_cuadre_contable(
                 "mock", "siniestros", mock_soat, dif_sap_vs_tera
             )
 
@@ -0,0 +1,65 @@
+from datetime import date
+from pathlib import Path
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from src.controles_informacion import exportacion
+
+
+@pytest.fixture
+def control() -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "codigo_ramo_op": ["001", "002", None, "004", "005", "006", "007"],
+            "fecha_registro": [date(2024, mes, 1) for mes in range(1, 8)],
+            "pago_bruto": [1.5, 2.0, 3.25, None, 5.0, 6.0, 7.0],
+        }
+    )
+
+
+@pytest.mark.unit
+def test_escribir_excel(tmp_path: Path, control: pl.DataFrame):
+    ruta = str(tmp_path / "control.xlsx")
+    exportacion.escribir_excel(control, ruta)
+
+    assert_frame_equal(
+        pl.read_excel(ruta, schema_overrides={"fecha_registro": pl.Date}), control
+    )
+
+
+@pytest.mark.unit
+def test_escribir_excel_varias_hojas(
+    tmp_path: Path, control: pl.DataFrame, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(exportacion, "MAX_FILAS_HOJA", 3)
+    monkeypatch.setattr(exportacion, "FILAS_POR_LOTE", 2)
+    ruta = str(tmp_path / "control.xlsx")
+    exportacion.escribir_excel(control, ruta)
+
+    hojas = pl.read_excel(
+        ruta,
+        sheet_id=0,
+        schema_overrides={"fecha_registro": pl.Date, "pago_bruto": pl.Float64},
+    )
+    assert list(hojas) == ["Sheet1", "Sheet2", "Sheet3"]
+    assert_frame_equal(pl.concat(hojas.values()), control)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_exportar_controles(tmp_path: Path, control: pl.DataFrame):
+    await exportacion.exportar_controles(
+        {"siniestros_tera_202407": control, "siniestros_sap_202407": control.clone()},
+        str(tmp_path),
+    )
+
+    assert sorted(archivo.name for archivo in tmp_path.iterdir()) == [
+        "siniestros_sap_202407.parquet",
+        "siniestros_sap_202407.xlsx",
+        "siniestros_tera_202407.parquet",
+        "siniestros_tera_202407.xlsx",
+    ]
+    assert_frame_equal(
+        pl.read_parquet(tmp_path / "siniestros_tera_202407.parquet"), control
+    )
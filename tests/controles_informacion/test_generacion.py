@@ -1,10 +1,16 @@
 from datetime import date
+from pathlib import Path
+from unittest.mock import patch
 
 import numpy as np
 import polars as pl
 import pytest
+import xlsxwriter
+from polars.testing import assert_frame_equal
 from src import constantes as ct
-from src import utils
+from src import utils, versiones_raw
+from src.configuracion import configuracion
+from src.controles_informacion import generacion as ctrl
 from src.controles_informacion import sap
 
 
@@ -115,3 +121,123 @@ async def test_consolidar_sap(cias, qtys, mes_corte, expected_columns):
         == ["codigo_op", "codigo_ramo_op", "fecha_registro"] + expected_columns
     )
     assert result.shape[0] > 0
+
+
+@pytest.mark.unit
+def test_calcular_agregados(mock_siniestros: pl.LazyFrame):
+    # Mismo orden de columnas que deja la extraccion
+    df = mock_siniestros.select(
+        "apertura_reservas", pl.exclude("apertura_reservas")
+    ).collect()
+    qtys, group_cols = ctrl.definir_cantidades_control("mock", "siniestros")
+
+    df_agrupado, df_tera, df_integridad = ctrl.calcular_agregados(df, group_cols, qtys)
+
+    def agrupar(group_cols: list[str]) -> pl.DataFrame:
+        return df.group_by(group_cols).agg(pl.col(qtys).sum()).sort(group_cols)
+
+    assert_frame_equal(df_agrupado, agrupar(group_cols))
+    assert_frame_equal(df_tera, agrupar(ctrl.COLUMNAS_CUADRE))
+
+    aperturas = ["apertura_reservas", "codigo_op", "codigo_ramo_op"]
+    aperturas += ["apertura_1", "apertura_2", "atipico"]
+    integridad = (
+        df.drop("fecha_siniestro", "fecha_registro")
+        .with_columns(numero_registros=1)
+        .group_by(aperturas)
+        .sum()
+        .sort(aperturas)
+    )
+    assert_frame_equal(df_integridad, integridad, check_dtypes=False)
+
+
+@pytest.mark.unit
+def test_aplicar_diferencias_cuadre(mock_siniestros: pl.LazyFrame):
+    df = mock_siniestros.collect()
+    qtys = ct.COLUMNAS_SINIESTROS_CUADRE
+    diferencias = df.sample(10, seed=1).with_columns(pl.col(qtys) * -0.5)
+
+    df_tera = ctrl.reagrupar(df, ctrl.COLUMNAS_CUADRE, qtys)
+    df_cuadrado = versiones_raw.aplicar_cambios(
+        df, versiones_raw.calcular_cambios(df, diferencias)
+    )
+
+    assert_frame_equal(
+        ctrl.aplicar_diferencias_cuadre(df_tera, diferencias, qtys),
+        ctrl.reagrupar(df_cuadrado, ctrl.COLUMNAS_CUADRE, qtys),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_consolidar_sap_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sap, "RUTA_AFO", str(tmp_path))
+    monkeypatch.setattr(sap, "RUTA_CACHE_AFO", str(tmp_path / "cache"))
+    mes_corte = 202312
+    qtys = ["pago_bruto", "pago_retenido"]
+
+    for cia in ["Vida", "Generales"]:
+        with xlsxwriter.Workbook(tmp_path / f"{cia}.xlsx") as wb:
+            for hoja in sap.definir_hojas_afo(qtys):
+                mock_hoja_afo(mes_corte, hoja).write_excel(wb, worksheet=hoja)
+
+    with patch(
+        "src.controles_informacion.sap.pl.read_excel", wraps=pl.read_excel
+    ) as lector:
+        df_excel = await sap.consolidar_sap(["Vida", "Generales"], qtys, mes_corte)
+        assert lector.call_count == 4
+
+        df_cache = await sap.consolidar_sap(["Vida", "Generales"], qtys, 202306)
+        assert lector.call_count == 4
+
+    assert len(list((tmp_path / "cache").rglob("*.parquet"))) == 4
+    assert_frame_equal(
+        df_cache,
+        df_excel.filter(pl.col("fecha_registro") <= date(2023, 6, 1)),
+    )
+
+
+@pytest.mark.unit
+def test_guardar_cache_afo_por_hoja(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sap, "RUTA_CACHE_AFO", str(tmp_path))
+    df = pl.DataFrame({"valor": [1.0]})
+    rutas = {
+        (hoja, version): f"{tmp_path}/Generales/{hoja}/{version}.parquet"
+        for hoja in ["prima_bruta", "prima_bruta_devengada"]
+        for version in ["v1", "v2"]
+    }
+
+    sap.guardar_cache_afo(df, rutas[("prima_bruta", "v1")])
+    sap.guardar_cache_afo(df, rutas[("prima_bruta_devengada", "v1")])
+    sap.guardar_cache_afo(df, rutas[("prima_bruta", "v2")])
+
+    assert sorted(str(ruta) for ruta in tmp_path.rglob("*.parquet")) == sorted(
+        [rutas[("prima_bruta", "v2")], rutas[("prima_bruta_devengada", "v1")]]
+    )
+
+
+@pytest.mark.unit
+def test_calcular_diferencias_sap_tera(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(configuracion, "umbrales_diferencia_sap", {"aviso_bruto": 0.5})
+    df_tera = pl.DataFrame(
+        {
+            "codigo_op": ["01", "01"],
+            "codigo_ramo_op": ["001", "001"],
+            "fecha_registro": [date(2024, 1, 1), date(2024, 2, 1)],
+            "pago_bruto": [90.0, 100.0],
+            "aviso_bruto": [90.0, 40.0],
+        }
+    )
+    df_sap = df_tera.with_columns(pago_bruto=pl.lit(100.0), aviso_bruto=pl.lit(100.0))
+
+    comparacion, alertas = ctrl.calcular_diferencias_sap_tera(
+        df_tera, df_sap, 202402, ["pago_bruto", "aviso_bruto"]
+    )
+
+    assert comparacion.get_column("diferencia_aviso_bruto").to_list() == [10, 60]
+    assert comparacion.get_column("dif%_pago_bruto").to_list() == [0.1, 0]
+    # El aviso de enero no supera su propio umbral, aunque si el general
+    assert alertas.select("fecha_registro", "cantidad").rows() == [
+        (date(2024, 1, 1), "pago_bruto"),
+        (date(2024, 2, 1), "aviso_bruto"),
+    ]
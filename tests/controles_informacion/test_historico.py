@@ -0,0 +1,86 @@
+from datetime import date
+from pathlib import Path
+
+import polars as pl
+import pytest
+from src.controles_informacion import historico
+from src.models import LlaveControl
+
+COLUMNAS = ["codigo_op", "codigo_ramo_op", "fecha_registro"]
+
+
+@pytest.fixture
+def carpeta_controles(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.chdir(tmp_path)
+    carpeta = tmp_path / "data/controles_informacion/pre_cuadre_contable"
+    carpeta.mkdir(parents=True)
+    return carpeta
+
+
+def control(ramos: list[str], pagos: list[float]) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "codigo_op": ["01"] * len(ramos),
+            "codigo_ramo_op": ramos,
+            "fecha_registro": [date(2024, 1, 1)] * len(ramos),
+            "pago_bruto": pagos,
+        }
+    )
+
+
+def llave(mes_corte: int) -> LlaveControl:
+    return LlaveControl(
+        estado_cuadre="pre_cuadre_contable",
+        file="siniestros",
+        fuente="tera",
+        mes_corte=mes_corte,
+    )
+
+
+@pytest.mark.unit
+def test_calcular_consistencia(carpeta_controles: Path):
+    historico.guardar_control(
+        control(["001", "002"], [10, 5]), ["pago_bruto"], llave(202401)
+    )
+    historico.guardar_control(control(["001"], [12]), ["pago_bruto"], llave(202402))
+    historico.guardar_control(
+        control(["001", "002"], [15, 7]), ["pago_bruto"], llave(202403)
+    )
+
+    consistencia = (
+        historico.leer_historico(llave(202403))
+        .pipe(historico.calcular_consistencia)
+        .collect()
+    )
+
+    ramo_002 = consistencia.filter(pl.col("codigo_ramo_op") == "002")
+    # El ramo que no aparece en un mes cuenta como cero
+    assert ramo_002.get_column("valor").to_list() == [5, 0, 7]
+    assert ramo_002.get_column("diferencia").to_list() == [None, -5, 7]
+    assert consistencia.filter(pl.col("codigo_ramo_op") == "001").get_column(
+        "diferencia"
+    ).to_list() == [None, 2, 3]
+
+
+@pytest.mark.unit
+def test_generar_consistencia_historica(carpeta_controles: Path):
+    control(["001"], [10]).write_excel(
+        carpeta_controles / "siniestros_tera_202401.xlsx"
+    )
+
+    consistencia = historico.generar_consistencia_historica(
+        control(["001"], [12]), ["pago_bruto"], llave(202402)
+    )
+
+    assert consistencia.get_column("mes_corte").to_list() == [202401, 202402]
+    assert historico.meses_guardados(llave(202402)) == [202401, 202402]
+
+    vista = pl.read_excel(
+        carpeta_controles / "siniestros_tera_consistencia_historica.xlsx"
+    )
+    assert vista.columns == COLUMNAS + [
+        "pago_bruto_202401",
+        "pago_bruto_202402",
+        "diferencia_pago_bruto_202402_202401",
+    ]
+    assert vista.item(0, "diferencia_pago_bruto_202402_202401") == 2
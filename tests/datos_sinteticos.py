@@ -0,0 +1,425 @@
+import string
+from datetime import date
+
+import numpy as np
+import polars as pl
+import xlsxwriter
+from pydantic import BaseModel, Field
+
+FILAS_SINIESTROS = 100_000
+FILAS_PRIMAS_EXPUESTOS = 10_000
+COLUMNAS_APERTURAS = ["codigo_op", "codigo_ramo_op", "apertura_1", "apertura_2"]
+RAMOS_AUTONOMIA = [("02", "083"), ("01", "083"), ("02", "081"), ("01", "081")]
+
+
+class EspecificacionDatos(BaseModel):
+    """Forma de las bases sinteticas. Con escala 1 y los valores por defecto
+    se obtienen las bases que usan las pruebas (negocio mock).
+    """
+
+    mes_inicio: date
+    mes_corte: date
+    escala: float = Field(default=1, gt=0)
+    semilla: int | None = None
+    num_ramos: int = Field(default=2, ge=1, le=999)
+    valores_apertura: int = Field(default=2, ge=1, le=12)
+    pct_atipicos: float = Field(default=0.05, ge=0, le=1)
+    # Con sesgo 0 todas las aperturas tienen el mismo peso; con sesgo mayor,
+    # pocas aperturas concentran la mayoria de los registros, como en la realidad
+    sesgo: float = Field(default=0, ge=0)
+    periodicidades: list[str] = ["Trimestral"]
+
+
+def generador(esp: EspecificacionDatos, flujo: int) -> np.random.Generator:
+    # Cada base usa su propio flujo, para que agregar columnas a una no
+    # cambie las demas
+    return np.random.default_rng(None if esp.semilla is None else [esp.semilla, flujo])
+
+
+def generar_aperturas(esp: EspecificacionDatos) -> pl.DataFrame:
+    letras = string.ascii_uppercase
+    aperturas = (
+        pl.DataFrame({"codigo_op": ["01"]})
+        .join(
+            pl.DataFrame(
+                {"codigo_ramo_op": [f"{i:03d}" for i in range(1, esp.num_ramos + 1)]}
+            ),
+            how="cross",
+        )
+        .join(
+            pl.DataFrame({"apertura_1": list(letras[: esp.valores_apertura])}),
+            how="cross",
+        )
+        .join(
+            pl.DataFrame(
+                {
+                    "apertura_2": list(
+                        letras[esp.valores_apertura + 1 :][: esp.valores_apertura]
+                    )
+                }
+            ),
+            how="cross",
+        )
+    )
+    return aperturas.select(
+        pl.concat_str(COLUMNAS_APERTURAS, separator="_").alias("apertura_reservas"),
+        *COLUMNAS_APERTURAS,
+        periodicidad_ocurrencia=pl.Series(
+            generador(esp, 0).choice(esp.periodicidades, size=aperturas.height)
+        ),
+    )
+
+
+def muestrear_aperturas(
+    esp: EspecificacionDatos, rng: np.random.Generator, num_filas: int
+) -> dict[str, np.ndarray]:
+    aperturas = generar_aperturas(esp)
+    pesos = 1 / np.arange(1, aperturas.height + 1) ** esp.sesgo
+    indices = rng.choice(aperturas.height, size=num_filas, p=pesos / pesos.sum())
+    return {
+        col: aperturas.get_column(col).to_numpy()[indices] for col in COLUMNAS_APERTURAS
+    }
+
+
+def muestrear_meses(
+    esp: EspecificacionDatos, rng: np.random.Generator, num_filas: int
+) -> np.ndarray:
+    return rng.choice(
+        pl.date_range(esp.mes_inicio, esp.mes_corte, interval="1mo", eager=True),
+        size=num_filas,
+    )
+
+
+def con_apertura_reservas(df: pl.LazyFrame) -> pl.LazyFrame:
+    return df.with_columns(
+        pl.concat_str(COLUMNAS_APERTURAS, separator="_").alias("apertura_reservas")
+    )
+
+
+def generar_siniestros(esp: EspecificacionDatos) -> pl.LazyFrame:
+    rng = generador(esp, 1)
+    num_filas = round(FILAS_SINIESTROS * esp.escala)
+    return pl.LazyFrame(
+        muestrear_aperturas(esp, rng, num_filas)
+        | {
+            "atipico": rng.choice(
+                [0, 1], size=num_filas, p=[1 - esp.pct_atipicos, esp.pct_atipicos]
+            ),
+            "fecha_siniestro": muestrear_meses(esp, rng, num_filas),
+            "fecha_registro": muestrear_meses(esp, rng, num_filas),
+            "pago_bruto": rng.random(size=num_filas) * 1e8,
+            "pago_retenido": rng.random(size=num_filas) * 1e6,
+            "aviso_bruto": rng.random(size=num_filas) * 1e7,
+            "aviso_retenido": rng.random(size=num_filas) * 1e5,
+            "conteo_pago": rng.integers(0, 100, size=num_filas),
+            "conteo_incurrido": rng.integers(0, 110, size=num_filas),
+            "conteo_desistido": rng.integers(0, 10, size=num_filas),
+        }
+    ).pipe(con_apertura_reservas)
+
+
+def generar_primas(esp: EspecificacionDatos) -> pl.LazyFrame:
+    rng = generador(esp, 2)
+    num_filas = round(FILAS_PRIMAS_EXPUESTOS * esp.escala)
+    return pl.LazyFrame(
+        muestrear_aperturas(esp, rng, num_filas)
+        | {
+            "fecha_registro": muestrear_meses(esp, rng, num_filas),
+            "prima_bruta": rng.random(size=num_filas) * 1e8,
+            "prima_retenida": rng.random(size=num_filas) * 1e7,
+            "prima_bruta_devengada": rng.random(size=num_filas) * 1e8,
+            "prima_retenida_devengada": rng.random(size=num_filas) * 1e7,
+        }
+    ).pipe(con_apertura_reservas)
+
+
+def generar_expuestos(esp: EspecificacionDatos) -> pl.LazyFrame:
+    rng = generador(esp, 3)
+    num_filas = round(FILAS_PRIMAS_EXPUESTOS * esp.escala)
+    return (
+        pl.LazyFrame(
+            muestrear_aperturas(esp, rng, num_filas)
+            | {
+                "fecha_registro": muestrear_meses(esp, rng, num_filas),
+                "expuestos": rng.random(size=num_filas) * 1e6,
+                "vigentes": rng.random(size=num_filas) * 1e6,
+            }
+        )
+        .pipe(con_apertura_reservas)
+        .group_by(["apertura_reservas"] + COLUMNAS_APERTURAS + ["fecha_registro"])
+        .mean()
+    )
+
+
+def escribir_segmentacion(esp: EspecificacionDatos, ruta: str) -> None:
+    """Segmentacion equivalente a la de un negocio real: aperturas de cada
+    cantidad y la apertura de cada ramo donde se reparte el cuadre contable.
+    """
+    aperturas = generar_aperturas(esp)
+    cuadre = aperturas.drop("periodicidad_ocurrencia").unique(
+        ["codigo_op", "codigo_ramo_op"], keep="first", maintain_order=True
+    )
+    hojas = {
+        "Aperturas_Siniestros": aperturas,
+        "Aperturas_Primas": aperturas.select(COLUMNAS_APERTURAS),
+        "Aperturas_Expuestos": aperturas.select(COLUMNAS_APERTURAS),
+        "Cuadre_Siniestros": cuadre,
+        "Cuadre_Primas": cuadre,
+    }
+    with xlsxwriter.Workbook(ruta) as wb:
+        for nombre, df in hojas.items():
+            df.write_excel(wb, worksheet=nombre)
+
+
+def mes_id(columna: str) -> pl.Expr:
+    return pl.col(columna).dt.year() * 100 + pl.col(columna).dt.month()
+
+
+def generar_tablas_teradata(esp: EspecificacionDatos) -> dict[str, pl.DataFrame]:
+    """Tablas fuente para el backend local de Teradata, con los nombres que
+    usa la query de tests/benchmarks/queries.
+    """
+    siniestros = generar_siniestros(esp).select(
+        *COLUMNAS_APERTURAS,
+        "fecha_siniestro",
+        "fecha_registro",
+        "pago_bruto",
+        "aviso_bruto",
+        mes_id=mes_id("fecha_registro"),
+    )
+    return {"mdb_seguros_colombia.v_siniestros_sinteticos": siniestros.collect()}
+
+
+def generar_dimensiones_soat(esp: EspecificacionDatos) -> dict[str, pl.DataFrame]:
+    dias = pl.date_range(
+        esp.mes_inicio.replace(year=esp.mes_inicio.year - 1),
+        pl.select(pl.lit(esp.mes_corte).dt.month_end()).item(),
+        eager=True,
+    )
+    return {
+        "v_dia": pl.DataFrame({"dia_dt": dias}).with_columns(mes_id=mes_id("dia_dt")),
+        "v_ramo": pl.DataFrame({"ramo_id": [1], "codigo_ramo_op": ["041"]}),
+        "v_compania": pl.DataFrame({"compania_id": [1]}),
+        "v_producto": pl.DataFrame(
+            {"producto_id": [1], "ramo_id": [1], "compania_id": [1]}
+        ),
+        "v_plan_individual": pl.DataFrame(
+            {"plan_individual_id": [1], "producto_id": [1]}
+        ),
+        "v_amparo": pl.DataFrame(
+            {
+                "amparo_id": [1, 2],
+                "amparo_desc": ["MUERTE ACCIDENTAL", "GASTOS FUNERARIOS"],
+            }
+        ),
+        "v_canal_comercial": pl.DataFrame(
+            {
+                "canal_comercial_id": [1, 2],
+                "nombre_canal_comercial": ["RESTO", "AFFINNITY"],
+            }
+        ),
+        "v_sucursal": pl.DataFrame(
+            {"sucursal_id": [1, 2], "canal_comercial_id": [1, 2]}
+        ),
+    }
+
+
+def generar_tablas_soat(esp: EspecificacionDatos) -> dict[str, pl.DataFrame]:
+    """Tablas fuente de Teradata que leen las queries de data/queries/soat,
+    con todos los registros dentro del periodo y las llaves que las unen.
+    """
+    rng = generador(esp, 5)
+    num_polizas = round(FILAS_PRIMAS_EXPUESTOS * esp.escala)
+    num_siniestros = round(FILAS_SINIESTROS * esp.escala)
+    polizas = pl.DataFrame(
+        {
+            "poliza_id": np.arange(num_polizas),
+            "fecha_inicio": muestrear_meses(esp, rng, num_polizas),
+            "codigo_tarifa_cd": rng.choice(["100", "110", "120"], num_polizas),
+        }
+    )
+    siniestros = pl.DataFrame(
+        {
+            "siniestro_id": np.arange(num_siniestros),
+            "fecha_siniestro": muestrear_meses(esp, rng, num_siniestros),
+            "poliza_id": rng.integers(0, num_polizas, num_siniestros),
+            "amparo_id": rng.integers(1, 3, num_siniestros),
+            "tipo_oper_siniestro_cd": rng.choice(["100", "130"], num_siniestros),
+            "valor_siniestro": rng.random(size=num_siniestros) * 1e6,
+        }
+    ).with_columns(fecha_registro=pl.col("fecha_siniestro"))
+
+    tablas = generar_dimensiones_soat(esp) | {
+        "v_poliza": polizas.select("poliza_id"),
+        # Dos versiones de cada contrato, para que QUALIFY tome la ultima
+        "v_contrato": pl.concat(
+            [
+                polizas.select(
+                    contrato_id="poliza_id",
+                    sucursal_id=pl.lit(version),
+                    agente_lider_id=pl.lit(0),
+                    fecha_ultima_actualizacion=pl.lit(date(2020, version, 1)),
+                )
+                for version in [1, 2]
+            ]
+        ),
+        "vsoat_poliza": polizas.with_columns(
+            fecha_expedicion="fecha_inicio",
+            fecha_fin=pl.col("fecha_inicio").dt.offset_by("1y"),
+            fecha_anulacion=pl.lit(None, pl.Date),
+            clase_soat_cd=pl.lit("1"),
+        ),
+        "v_evento_produccion": polizas.select(
+            "poliza_id",
+            mes_id=mes_id("fecha_inicio"),
+            plan_individual_id=pl.lit(1),
+            valor_prima=pl.lit(1e5),
+            valor_tasa=pl.lit(1.0),
+        ),
+        "v_siniestro": siniestros.select("siniestro_id", "fecha_siniestro"),
+        "v_evento_siniestro_cobertura": siniestros.drop("fecha_siniestro").with_columns(
+            mes_id=mes_id("fecha_registro"),
+            ramo_id=pl.lit(1),
+            plan_individual_id=pl.lit(1),
+            valor_tasa=pl.lit(1.0),
+        ),
+    }
+    return {f"mdb_seguros_colombia.{tabla}": df for tabla, df in tablas.items()}
+
+
+def generar_ramos(esp: EspecificacionDatos) -> pl.DataFrame:
+    """Tabla adicional que la query carga desde la segmentacion."""
+    return (
+        generar_aperturas(esp)
+        .select("codigo_ramo_op")
+        .unique(maintain_order=True)
+        .with_columns(ramo_desc=pl.lit("RAMO ") + pl.col("codigo_ramo_op"))
+    )
+
+
+def generar_incurrido_autonomia(esp: EspecificacionDatos) -> pl.DataFrame:
+    """Base de incurrido de autonomia con registros en todos los casos de la
+    aproximacion del reaseguro: ramo 083 con y sin excepciones de contrato,
+    atipicos, asegurados que superan la prioridad y meses anteriores al corte.
+    """
+    rng = generador(esp, 4)
+    num_filas = round(FILAS_SINIESTROS * esp.escala)
+    ramos = np.array(RAMOS_AUTONOMIA)[rng.integers(0, len(RAMOS_AUTONOMIA), num_filas)]
+    meses_registro = pl.date_range(
+        esp.mes_corte.replace(year=esp.mes_corte.year - 2),
+        esp.mes_corte,
+        interval="1mo",
+        eager=True,
+    )
+    pagos = rng.choice([0.0, 1e6, 5e7, 1.5e8, -2e6], size=num_filas)
+    avisos = rng.choice([0.0, 3e6, 9e7, -4e7], size=num_filas)
+    pct_cedido = rng.uniform(0, 0.6, size=num_filas)
+    return (
+        pl.DataFrame(
+            {
+                "fecha_siniestro": muestrear_meses(esp, rng, num_filas),
+                "fecha_registro": rng.choice(meses_registro, size=num_filas)
+                + rng.integers(0, 28, size=num_filas).astype("timedelta64[D]"),
+                "asegurado_id": rng.choice(["1", "2", "3", "4", "5"], num_filas),
+                "numero_poliza": rng.choice(["083004273427", "P1", "P2"], num_filas),
+                "nombre_tecnico": rng.choice(["PILOTOS", "INPEC", "VIDA"], num_filas),
+                "codigo_op": ramos[:, 0],
+                "codigo_ramo_op": ramos[:, 1],
+                "siniestro_id": rng.integers(0, num_filas // 3, num_filas).astype(str),
+                "atipico": rng.choice(
+                    [0, 1], size=num_filas, p=[1 - esp.pct_atipicos, esp.pct_atipicos]
+                ),
+                "apertura_canal_desc": rng.choice(
+                    ["Banco Agrario", "Banco-L", "No Banca", "Resto"], num_filas
+                ),
+                "nombre_canal_comercial": rng.choice(
+                    ["SUCURSALES", "CORREDORES"], num_filas
+                ),
+                "nombre_sucursal": rng.choice(
+                    ["BANCOLOMBIA DEUDORES CONSUMO Y OTROS", "MEDELLIN"], num_filas
+                ),
+                "apertura_amparo_desc": rng.choice(["RESTO", "VIDA"], num_filas),
+                "pago_bruto": pagos,
+                "aviso_bruto": avisos,
+                "pago_cedido": pagos * pct_cedido,
+                "aviso_cedido": avisos * pct_cedido,
+            }
+        )
+        .with_columns(pl.col("fecha_siniestro", "fecha_registro").cast(pl.Date))
+        .with_columns(
+            incurrido_bruto=pl.col("pago_bruto") + pl.col("aviso_bruto"),
+            incurrido_cedido=pl.col("pago_cedido") + pl.col("aviso_cedido"),
+        )
+        .with_columns(
+            (pl.col(f"{qty}_bruto") - pl.col(f"{qty}_cedido")).alias(f"{qty}_retenido")
+            for qty in ["pago", "aviso", "incurrido"]
+        )
+    )
+
+
+def generar_segmentacion_reaseguro(
+    incurrido: pl.DataFrame, mes_corte: date
+) -> dict[str, pl.DataFrame]:
+    """Hojas de la segmentacion de autonomia que usa la aproximacion del
+    reaseguro. Los cedidos de SAP son un 5% mayores a los de la base.
+    """
+    atipicos = (
+        incurrido.filter(pl.col("atipico") == 1)
+        .unique(["siniestro_id", "codigo_op", "codigo_ramo_op"], keep="first")
+        .sort("siniestro_id")
+        .head(40)
+    )
+    return {
+        "Canal-Poliza": pl.DataFrame(
+            {
+                "compania_id": [3],
+                "codigo_ramo_op": ["083"],
+                "numero_poliza": ["P1"],
+                "apertura_canal_desc": ["Banco-L"],
+            }
+        ),
+        "Canal-Canal": pl.DataFrame(
+            {
+                "compania_id": [3],
+                "codigo_ramo_op": ["083"],
+                "canal_comercial_id": [1],
+                "apertura_canal_desc": ["Banco Agrario"],
+            }
+        ),
+        "Canal-Sucursal": pl.DataFrame(
+            {
+                "compania_id": [4],
+                "codigo_ramo_op": ["081"],
+                "sucursal_id": [1],
+                "apertura_canal_desc": ["No Banca"],
+            }
+        ),
+        "Amparos": pl.DataFrame(
+            {
+                "compania_id": [3, 4],
+                "codigo_ramo_op": ["083", "081"],
+                "apertura_canal_desc": ["Banco Agrario", "No Banca"],
+                "amparo_id": ["1", "1"],
+                "apertura_amparo_desc": ["VIDA", "VIDA"],
+            }
+        ),
+        "Inc_Ced_Atipicos": atipicos.select(
+            pl.col("fecha_registro").alias("Fecha Aviso"),
+            pl.col("siniestro_id").alias("Siniestro_Id"),
+            pl.col("numero_poliza").alias("Numero_Poliza"),
+            pl.col("codigo_op").alias("Sociedad"),
+            pl.col("codigo_ramo_op").alias("Ramo"),
+            Amparo_Id=pl.lit("1"),
+            Sucursal_Id=pl.lit("1"),
+            Canal_Comercial_Id=pl.lit("1"),
+            Pago_Cedido=(pl.col("pago_cedido") * 0.5).cast(pl.Int64),
+            Aviso_Cedido=(pl.col("aviso_cedido") * 0.5).cast(pl.Int64),
+        ),
+        "SAP_Sinis_Ced": incurrido.filter(
+            pl.col("fecha_registro").dt.month_start() == mes_corte
+        )
+        .group_by(["codigo_op", "codigo_ramo_op"])
+        .agg((pl.col("pago_cedido", "aviso_cedido").sum() * 1.05).cast(pl.Int64))
+        .with_columns(fecha_registro=pl.lit(mes_corte))
+        .sort(["codigo_op", "codigo_ramo_op"]),
+    }
@@ -0,0 +1,88 @@
+from datetime import date
+from typing import Literal
+
+import polars as pl
+import pytest
+from src import constantes as ct
+from src import utils
+from src.metodos_plantilla.completar_diagonal import chainladder as cl
+from src.metodos_plantilla.completar_diagonal import factor_completitud as compl
+from src.procesamiento import base_siniestros
+from tests.conftest import vaciar_directorio
+
+
+def factores_completitud_apertura(
+    base_apertura: pl.DataFrame, meses_entre_triangulos: int, mes_corte: int
+) -> dict[str, list[float]]:
+    """Calculo de referencia, triangulo por triangulo, con chainladder."""
+    mes_del_periodo = utils.mes_del_periodo(
+        utils.yyyymm_to_date(mes_corte), 1, meses_entre_triangulos
+    )
+    factores = {}
+    for cantidad in ct.COLUMNAS_QTYS[:4]:
+        triangulo = cl.construir_triangulo(base_apertura, cantidad)
+        acumulados = cl.calcular_factores_acumulados(
+            cl.calcular_factores_desarrollo(triangulo, 1, 12 // meses_entre_triangulos)
+        ).get_column("promedio_ponderado_ventana")
+
+        factores_cantidad = []
+        for numero_periodo in range(triangulo.shape[0]):
+            altura = numero_periodo * meses_entre_triangulos + mes_del_periodo - 1
+            altura_ultimo_mes = (numero_periodo + 1) * meses_entre_triangulos - 1
+            if altura_ultimo_mes < len(acumulados):
+                factores_cantidad.append(
+                    acumulados[altura_ultimo_mes] / acumulados[altura]
+                )
+            else:
+                factores_cantidad.append(1.0)
+        factores[f"factor_completitud_{cantidad}"] = factores_cantidad[::-1]
+
+    return factores
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "periodicidad_ocurrencia", ["Trimestral", "Semestral", "Anual"]
+)
+def test_factores_completitud(
+    periodicidad_ocurrencia: Literal["Trimestral", "Semestral", "Anual"],
+    mock_siniestros: pl.LazyFrame,
+    rango_meses: tuple[date, date],
+):
+    base_triangulos, _, _ = base_siniestros.generar_bases_siniestros(
+        mock_siniestros, "entremes", *rango_meses
+    )
+    base_triangulos.write_parquet("data/processed/base_triangulos.parquet")
+
+    mes_corte = utils.date_to_yyyymm(rango_meses[1])
+    aperturas = pl.LazyFrame(
+        {
+            "apertura_reservas": ["01_001_A_D", "01_002_B_E"],
+            "periodicidad_ocurrencia": [periodicidad_ocurrencia] * 2,
+        }
+    )
+
+    factores = compl.calcular_factores_completitud(aperturas, mes_corte)
+
+    assert factores.collect_schema().names() == [
+        "apertura_reservas",
+        "periodicidad_ocurrencia",
+        "periodo_ocurrencia",
+    ] + [f"factor_completitud_{cantidad}" for cantidad in ct.COLUMNAS_QTYS[:4]]
+
+    for apertura in ["01_001_A_D", "01_002_B_E"]:
+        base_apertura = base_triangulos.filter(
+            (pl.col("apertura_reservas") == apertura)
+            & (pl.col("periodicidad_ocurrencia") == periodicidad_ocurrencia)
+        )
+        esperado = factores_completitud_apertura(
+            base_apertura, ct.PERIODICIDADES[periodicidad_ocurrencia], mes_corte
+        )
+        calculado = factores.filter(pl.col("apertura_reservas") == apertura)
+
+        for columna, valores in esperado.items():
+            diferencias = (calculado.get_column(columna) - pl.Series(valores)).abs()
+            assert diferencias.max() < 1e-9  # type: ignore
+
+    vaciar_directorio("data/raw")
+    vaciar_directorio("data/processed")
@@ -0,0 +1,72 @@
+from datetime import date
+
+import polars as pl
+import pytest
+from src.metodos_plantilla.guardar_traer import manifiesto as mf
+from src.models import ModosPlantilla
+from src.procesamiento import base_siniestros
+from tests.conftest import vaciar_directorio
+
+
+@pytest.mark.unit
+def test_manifiesto(mock_siniestros: pl.LazyFrame, rango_meses: tuple[date, date]):
+    vaciar_directorio("data/db")
+
+    base_triangulos, _, _ = base_siniestros.generar_bases_siniestros(
+        mock_siniestros, "triangulos", *rango_meses
+    )
+    base_triangulos.write_parquet("data/processed/base_triangulos.parquet")
+
+    apertura, atributo, mes_corte = "01_001_A_D", "bruto", 202401
+    modos = ModosPlantilla(
+        apertura=apertura, atributo=atributo, plantilla="plata", modo="guardar_todo"
+    )
+    hash_tri = mf.hash_triangulo(apertura)
+    assert hash_tri == mf.hash_triangulo(apertura)
+    assert hash_tri != mf.hash_triangulo("01_001_A_E")
+
+    manifiesto = mf.leer_manifiesto("wb_test.xlsm")
+    assert not mf.apertura_sin_cambios(manifiesto, modos, mes_corte, hash_tri)
+
+    pl.DataFrame({"a": [1]}).write_parquet(
+        f"data/db/{apertura}_{atributo}_Plata_VENTANAS.parquet"
+    )
+    manifiesto = mf.registrar_apertura(
+        manifiesto,
+        "wb_test.xlsm",
+        mf.crear_registro(modos, mes_corte, "completado", 1.0, hash_tri),
+    )
+
+    # El manifiesto persiste entre corridas
+    manifiesto = mf.leer_manifiesto("wb_test.xlsm")
+    assert manifiesto.shape[0] == 1
+    assert mf.apertura_sin_cambios(manifiesto, modos, mes_corte, hash_tri)
+    assert not mf.apertura_sin_cambios(manifiesto, modos, mes_corte, "otro_hash")
+    assert not mf.apertura_sin_cambios(
+        manifiesto,
+        modos.model_copy(update={"atributo": "retenido"}),
+        mes_corte,
+        hash_tri,
+    )
+
+    # Cambios en los parametros almacenados invalidan el registro
+    pl.DataFrame({"a": [2]}).write_parquet(
+        f"data/db/{apertura}_{atributo}_Plata_VENTANAS.parquet"
+    )
+    assert not mf.apertura_sin_cambios(manifiesto, modos, mes_corte, hash_tri)
+
+    # Un error sobreescribe el registro de la apertura
+    manifiesto = mf.registrar_apertura(
+        manifiesto,
+        "wb_test.xlsm",
+        mf.crear_registro(modos, mes_corte, "error", 1.0, hash_tri),
+    )
+    assert manifiesto.shape[0] == 1
+    assert not mf.apertura_sin_cambios(manifiesto, modos, mes_corte, hash_tri)
+
+    mf.reiniciar_manifiesto("wb_test.xlsm")
+    assert mf.leer_manifiesto("wb_test.xlsm").is_empty()
+
+    vaciar_directorio("data/raw")
+    vaciar_directorio("data/processed")
+    vaciar_directorio("data/db")
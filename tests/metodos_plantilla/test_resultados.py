@@ -1,6 +1,10 @@
+import multiprocessing
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 
+import openpyxl
 import polars as pl
 import pytest
 import xlwings as xw
@@ -9,7 +13,7 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session
 from src import utils
 from src.app import obtener_parametros_usuario
-from src.metodos_plantilla import abrir
+from src.metodos_plantilla import abrir, resultados
 from src.metodos_plantilla.guardar_traer.rangos_parametros import (
     obtener_indice_en_rango,
 )
@@ -144,11 +148,14 @@ def test_actualizar_resultados(
 
     # Verificamos que, en caso de aperturas guardadas por dos usuarios,
     # se lea solamente el archivo mas reciente
-    info_u1 = pl.read_parquet(
-        f"output/resultados/{p1.nombre_plantilla}_{p1.mes_corte}.parquet"
-    )
-    info_u2 = pl.read_parquet(
-        f"output/resultados/{p2.nombre_plantilla}_{p2.mes_corte}.parquet"
+    manifiesto = resultados.leer_manifiesto_resultados()
+    info_u1, info_u2 = (
+        pl.read_parquet(
+            manifiesto.filter(pl.col("plantilla") == p.nombre_plantilla)
+            .get_column("ruta")
+            .item()
+        )
+        for p in (p1, p2)
     )
     filtro_apertura = pl.col("apertura_reservas") == "01_001_A_D"
 
@@ -170,3 +177,198 @@ def test_actualizar_resultados(
     vaciar_directorio("data/processed")
     vaciar_directorio("data/db")
     vaciar_directorio("output/resultados")
+
+
+def mock_resultados(aperturas: list[str], mes_corte: int, valor: float) -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "apertura_reservas": [apertura for apertura in aperturas for _ in range(2)],
+            "periodo_ocurrencia": [202301, 202302] * len(aperturas),
+            "plata_ultimate_bruto": [valor] * 2 * len(aperturas),
+        }
+    ).with_columns(atipico=0, mes_corte=mes_corte)
+
+
+@pytest.mark.unit
+def test_almacen_resultados():
+    vaciar_directorio("output/resultados")
+
+    assert resultados.concatenar_archivos_resultados().is_empty()
+
+    resultados.registrar_resultados(
+        mock_resultados(["A", "B"], 202401, 1), "wb_u1", 202401
+    )
+    resultados.registrar_resultados(mock_resultados(["A"], 202402, 2), "wb_u1", 202402)
+    # El usuario 2 solo estima la apertura A; B queda en ceros
+    resultados.registrar_resultados(
+        mock_resultados(["A"], 202401, 3).vstack(mock_resultados(["B"], 202401, 0)),
+        "wb_u2",
+        202401,
+    )
+
+    manifiesto = resultados.leer_manifiesto_resultados()
+    assert manifiesto.get_column("version").to_list() == [1, 2, 3]
+    assert manifiesto.get_column("plantilla").to_list() == ["wb_u1", "wb_u1", "wb_u2"]
+
+    df = resultados.concatenar_archivos_resultados()
+    assert df.shape[0] == 6
+
+    ultimate = df.group_by(["apertura_reservas", "mes_corte"]).agg(
+        pl.sum("plata_ultimate_bruto")
+    )
+    assert dict(
+        zip(
+            ultimate.select(
+                pl.concat_str("apertura_reservas", "mes_corte", separator="_")
+            ).to_series(),
+            ultimate.get_column("plata_ultimate_bruto"),
+            strict=True,
+        )
+    ) == {"A_202401": 6, "B_202401": 2, "A_202402": 4}
+
+    df_mes = resultados.escanear_resultados([202402]).collect()
+    assert df_mes.get_column("mes_corte").unique().to_list() == [202402]
+
+    vaciar_directorio("output/resultados")
+
+
+@pytest.mark.unit
+def test_registrar_resultados_concurrente():
+    vaciar_directorio("output/resultados")
+
+    with ThreadPoolExecutor(4) as pool:
+        rutas = list(
+            pool.map(
+                lambda i: resultados.registrar_resultados(
+                    mock_resultados(["A"], 202401, i), f"wb_u{i}", 202401
+                ),
+                range(8),
+            )
+        )
+
+    manifiesto = resultados.leer_manifiesto_resultados()
+    assert sorted(manifiesto.get_column("version").to_list()) == list(range(1, 9))
+    assert sorted(manifiesto.get_column("ruta").to_list()) == sorted(rutas)
+    assert not os.path.exists(f"{resultados.RUTA_MANIFIESTO_RESULTADOS}.lock")
+
+    vaciar_directorio("output/resultados")
+
+
+def retener_bloqueo(listo, segundos: float) -> None:
+    with resultados.bloquear_manifiesto_resultados():
+        listo.set()
+        time.sleep(segundos)
+
+
+@pytest.mark.unit
+def test_bloqueo_abandonado_entre_procesos(monkeypatch: pytest.MonkeyPatch):
+    vaciar_directorio("output/resultados")
+    ruta_bloqueo = f"{resultados.RUTA_MANIFIESTO_RESULTADOS}.lock"
+    monkeypatch.setattr(resultados, "ESPERA_MAXIMA_BLOQUEO", 0.5)
+
+    contexto = multiprocessing.get_context("spawn")
+    listo = contexto.Event()
+    proceso = contexto.Process(target=retener_bloqueo, args=(listo, 3))
+    proceso.start()
+    assert listo.wait(30)
+
+    with resultados.bloquear_manifiesto_resultados():
+        with open(ruta_bloqueo) as f:
+            dueno = f.read()
+        assert not dueno.startswith(f"{proceso.pid}_")
+
+        # El proceso que retuvo el bloqueo no debe liberar el que se tomo despues
+        proceso.join()
+        assert proceso.exitcode == 0
+        with open(ruta_bloqueo) as f:
+            assert f.read() == dueno
+
+    assert not os.path.exists(ruta_bloqueo)
+
+    vaciar_directorio("output/resultados")
+
+
+@pytest.mark.unit
+def test_resultados_sin_manifiesto():
+    vaciar_directorio("output/resultados")
+
+    mock_resultados(["A"], 202401, 1).write_parquet(
+        "output/resultados/wb_test_202401.parquet"
+    )
+
+    manifiesto = resultados.leer_manifiesto_resultados()
+    assert manifiesto.get_column("plantilla").to_list() == ["wb_test"]
+    assert manifiesto.get_column("mes_corte").to_list() == [202401]
+    # Leer no escribe: el manifiesto se crea al almacenar el siguiente resultado
+    assert not os.path.exists(resultados.RUTA_MANIFIESTO_RESULTADOS)
+
+    resultados.registrar_resultados(
+        mock_resultados(["A"], 202401, 2), "wb_test", 202401
+    )
+    df = resultados.concatenar_archivos_resultados()
+    assert df.get_column("plata_ultimate_bruto").to_list() == [2, 2]
+    assert pl.read_parquet(resultados.RUTA_MANIFIESTO_RESULTADOS).height == 2
+
+    vaciar_directorio("output/resultados")
+
+
+@pytest.mark.unit
+def test_actualizar_archivo_resultados(tmp_path):
+    vaciar_directorio("output/resultados")
+    ruta_wb = str(tmp_path / "resultados.xlsx")
+    ruta_completo = str(tmp_path / "resultados_completo.xlsx")
+
+    def leer_hoja(ruta: str = ruta_wb) -> pl.DataFrame:
+        return pl.read_excel(ruta, sheet_name="Resultados")
+
+    def planear_escritura_hoja() -> tuple[int, pl.DataFrame, pl.DataFrame]:
+        return resultados.planear_escritura(
+            ruta_wb,
+            *resultados.leer_hoja_openpyxl(
+                openpyxl.load_workbook(ruta_wb)["Resultados"]
+            ),
+            True,
+        )
+
+    resultados.registrar_resultados(
+        mock_resultados(["A", "B"], 202401, 1), "wb_u1", 202401
+    )
+    resultados.actualizar_archivo_resultados(ruta_wb)
+    assert leer_hoja().shape[0] == 4
+
+    # Un mes de corte nuevo de la ultima apertura solo agrega sus filas al final
+    resultados.registrar_resultados(mock_resultados(["B"], 202402, 4), "wb_u1", 202402)
+    _, df_escribir, _ = planear_escritura_hoja()
+    assert df_escribir.shape[0] == 2
+    resultados.actualizar_archivo_resultados(ruta_wb)
+
+    # El de otra apertura se ubica junto a ella, reescribiendo desde ahi
+    resultados.registrar_resultados(mock_resultados(["A"], 202402, 2), "wb_u1", 202402)
+    _, df_escribir, _ = planear_escritura_hoja()
+    assert df_escribir.shape[0] == 6
+    resultados.actualizar_archivo_resultados(ruta_wb)
+    resultados.actualizar_archivo_resultados(ruta_completo, incremental=False)
+    assert leer_hoja().equals(leer_hoja(ruta_completo))
+
+    # Una nueva version de un bloque existente lo reemplaza
+    resultados.registrar_resultados(mock_resultados(["B"], 202401, 3), "wb_u2", 202401)
+    resultados.actualizar_archivo_resultados(ruta_wb)
+
+    hoja = leer_hoja()
+    assert hoja.shape[0] == 8
+    assert (
+        hoja.get_column("plata_ultimate_bruto").to_list()
+        == resultados.concatenar_archivos_resultados()
+        .get_column("plata_ultimate_bruto")
+        .to_list()
+        == [1, 1, 2, 2, 3, 3, 4, 4]
+    )
+
+    # Si la hoja no coincide con el estado registrado, se reescribe completa
+    wb = openpyxl.load_workbook(ruta_wb)
+    wb["Resultados"].delete_rows(2, 1)
+    wb.save(ruta_wb)
+    resultados.actualizar_archivo_resultados(ruta_wb)
+    assert leer_hoja().shape[0] == 8
+
+    vaciar_directorio("output/resultados")
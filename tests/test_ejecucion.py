@@ -0,0 +1,62 @@
+from datetime import date
+from typing import Literal
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from src import ejecucion
+from src.controles_informacion import generacion as ctrl
+from src.logger_config import logger
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("tipo", ["proceso", "hilo"])
+def test_ejecutor(tipo: Literal["proceso", "hilo"], mock_siniestros: pl.LazyFrame):
+    df = mock_siniestros.collect()
+    group_cols, qtys = ["codigo_ramo_op", "apertura_1"], ["pago_bruto"]
+
+    ejecutor = ejecucion.Ejecutor(tipo, 1)
+    resultado = ejecutor.ejecutar(ctrl.reagrupar, df, group_cols, qtys)
+    ejecutor.cerrar()
+
+    assert resultado.equals(ctrl.reagrupar(df, group_cols, qtys))
+
+
+@pytest.mark.unit
+def test_ejecutor_logs_proceso():
+    df_tera = pl.DataFrame(
+        {
+            "codigo_op": ["01"],
+            "codigo_ramo_op": ["001"],
+            "fecha_registro": [date(2024, 1, 1)],
+            "pago_bruto": [100.0],
+        }
+    )
+    df_sap = df_tera.with_columns(pago_bruto=pl.lit(200.0))
+
+    mensajes = []
+    id_sink = logger.add(lambda m: mensajes.append(m.record["message"]))
+
+    ejecutor = ejecucion.Ejecutor("proceso", 1)
+    difs, _ = ejecutor.ejecutar(
+        ctrl.calcular_diferencias_sap_tera, df_tera, df_sap, 202401, ["pago_bruto"]
+    )
+    ejecutor.cerrar()
+    logger.remove(id_sink)
+
+    assert difs.get_column("diferencia_pago_bruto").to_list() == [100.0]
+    # La alerta generada en el otro proceso llega al logger principal
+    assert any("Diferencias significativas" in mensaje for mensaje in mensajes)
+
+
+@pytest.mark.unit
+def test_ejecutor_resultado_tupla(mock_siniestros: pl.LazyFrame):
+    df = mock_siniestros.collect()
+    group_cols, qtys = ["codigo_ramo_op", "apertura_1"], ["pago_bruto"]
+
+    ejecutor = ejecucion.Ejecutor("proceso", 1)
+    resultado = ejecutor.ejecutar(ctrl.calcular_agregados, df, group_cols, qtys)
+    ejecutor.cerrar()
+
+    assert len(resultado) == 3
+    assert_frame_equal(resultado[0], ctrl.reagrupar(df, group_cols, qtys))
@@ -0,0 +1,63 @@
+import os
+
+import polars as pl
+import pytest
+from src import espacio_trabajo as et
+from src.configuracion import configuracion
+from src.models import Parametros
+
+
+def parametros(session_id: str) -> Parametros:
+    return Parametros(
+        negocio="mock",
+        mes_inicio=202001,
+        mes_corte=202312,
+        tipo_analisis="triangulos",
+        nombre_plantilla="wb_test",
+        session_id=session_id,
+    )
+
+
+@pytest.mark.unit
+def test_rutas_espacio(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+
+    with et.usar_espacio(parametros("a")) as raiz:
+        assert raiz == ""
+        assert et.ruta("data/raw/siniestros.parquet") == "data/raw/siniestros.parquet"
+
+    monkeypatch.setattr(configuracion, "espacios_aislados", True)
+    with et.usar_espacio(parametros("a")) as raiz:
+        assert et.ruta("data/raw/siniestros.parquet") == (
+            f"{raiz}/data/raw/siniestros.parquet"
+        )
+        assert et.ruta("data/queries/siniestros.sql") == "data/queries/siniestros.sql"
+        assert os.path.isdir(f"{raiz}/data/controles_informacion/pre_cuadre_contable")
+
+    assert et.ruta("data/raw/siniestros.parquet") == "data/raw/siniestros.parquet"
+
+
+@pytest.mark.unit
+def test_deduplicar(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(configuracion, "espacios_aislados", True)
+    df = pl.DataFrame({"a": [1, 2, 3]})
+
+    rutas = []
+    for session_id in ["a", "b"]:
+        with et.usar_espacio(parametros(session_id)):
+            df.write_parquet(et.ruta_salida("data/raw/siniestros.parquet"))
+            et.deduplicar(et.ruta("data/raw/siniestros.parquet"))
+            rutas.append(et.ruta("data/raw/siniestros.parquet"))
+
+    assert os.path.samefile(*rutas)
+    assert len(os.listdir(et.RUTA_COMPARTIDOS)) == 1
+
+    # Reescribir en un espacio no modifica la copia de los demas
+    with et.usar_espacio(parametros("a")):
+        pl.DataFrame({"a": [4]}).write_parquet(
+            et.ruta_salida("data/raw/siniestros.parquet")
+        )
+
+    assert not os.path.samefile(*rutas)
+    assert pl.read_parquet(rutas[1]).equals(df)
@@ -0,0 +1,74 @@
+import os
+
+import polars as pl
+import pytest
+from src import etapas
+from src.models import Etapa
+
+
+@pytest.fixture
+def directorio_etapas(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/db")
+    os.makedirs("data/processed")
+    pl.DataFrame({"a": [1, 2, 3]}).write_parquet("data/processed/entrada.parquet")
+
+
+@pytest.mark.unit
+def test_correr_etapa(directorio_etapas):
+    ejecuciones = []
+
+    def generar() -> None:
+        ejecuciones.append(1)
+        pl.read_parquet("data/processed/entrada.parquet").write_parquet(
+            "data/processed/salida.parquet"
+        )
+
+    def etapa(mes_corte: int) -> Etapa:
+        return Etapa(
+            nombre="prueba",
+            entradas=["data/processed/entrada.parquet"],
+            parametros={"mes_corte": mes_corte},
+            salidas=["data/processed/salida.parquet"],
+        )
+
+    assert etapas.correr_etapa(etapa(202312), generar)
+    assert not etapas.correr_etapa(etapa(202312), generar)
+    assert len(ejecuciones) == 1
+
+    # Reescribir la entrada con el mismo contenido no vuelve a ejecutar la etapa
+    pl.DataFrame({"a": [1, 2, 3]}).write_parquet("data/processed/entrada.parquet")
+    assert not etapas.correr_etapa(etapa(202312), generar)
+
+    assert etapas.correr_etapa(etapa(202401), generar)
+    razones = etapas.leer_traza().row(0, named=True)["razones"]
+    assert razones == ["cambio parametro:mes_corte (202312 -> 202401)"]
+
+    pl.DataFrame({"a": [4]}).write_parquet("data/processed/entrada.parquet")
+    os.remove("data/processed/salida.parquet")
+    assert etapas.correr_etapa(etapa(202401), generar)
+    assert etapas.leer_traza().row(0, named=True)["razones"] == [
+        "falta la salida data/processed/salida.parquet",
+        "cambio data/processed/entrada.parquet",
+    ]
+    assert len(ejecuciones) == 3
+
+
+@pytest.mark.unit
+def test_correr_etapa_fallida(directorio_etapas):
+    etapa = Etapa(
+        nombre="prueba",
+        entradas=["data/processed/entrada.parquet"],
+        salidas=["data/processed/salida.parquet"],
+    )
+
+    def fallar() -> None:
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        etapas.correr_etapa(etapa, fallar)
+
+    assert etapas.correr_etapa(etapa, lambda: None)
+    assert etapas.leer_traza().row(0, named=True)["razones"] == [
+        "sin ejecucion anterior"
+    ]
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+import pytest
+from src.logger_config import DifusorLogs, logger
+
+
+@pytest.mark.asyncio
+async def test_difusor_logs():
+    difusor = DifusorLogs(capacidad_cliente=5, capacidad_historial=3)
+    id_sink = logger.add(difusor.publicar, level="INFO")
+
+    for n in range(4):
+        logger.info(f"historial {n}")
+
+    # Cada cliente recibe todos los mensajes, comenzando por el historial
+    loop = asyncio.get_running_loop()
+    cliente_1, cliente_2 = difusor.suscribir(loop), difusor.suscribir(loop)
+
+    hilo = threading.Thread(target=lambda: logger.info("desde otro hilo"))
+    hilo.start()
+    hilo.join()
+
+    for cliente in (cliente_1, cliente_2):
+        registros, descartados = await cliente.siguiente_lote(espera=0)
+        assert [r["mensaje"] for r in registros] == [
+            "historial 1",
+            "historial 2",
+            "historial 3",
+            "desde otro hilo",
+        ]
+        assert descartados == 0
+
+    # Un cliente lento pierde los mensajes mas antiguos, sin crecer en memoria
+    for n in range(8):
+        logger.info(f"mensaje {n}")
+    registros, descartados = await cliente_1.siguiente_lote(espera=0)
+    assert [r["mensaje"] for r in registros] == [f"mensaje {n}" for n in range(3, 8)]
+    assert descartados == 3
+
+    difusor.desuscribir(cliente_2)
+    logger.info("sin cliente 2")
+    assert "sin cliente 2" not in [r["mensaje"] for r in cliente_2.buffer]
+
+    logger.remove(id_sink)
@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import polars as pl
+import pytest
+from src import lotes, utils
+from src.models import Lote, TrabajoLote
+
+from tests.conftest import vaciar_directorio
+
+
+@pytest.mark.unit
+def test_agrupar_extracciones():
+    trabajos = [
+        TrabajoLote(
+            negocio="soat",
+            mes_inicio=201901,
+            mes_corte=202312,
+            tipo_analisis="triangulos",
+        ),
+        TrabajoLote(
+            negocio="autonomia",
+            mes_inicio=201801,
+            mes_corte=202312,
+            tipo_analisis="triangulos",
+        ),
+        TrabajoLote(
+            negocio="soat",
+            mes_inicio=202001,
+            mes_corte=202401,
+            tipo_analisis="entremes",
+        ),
+        TrabajoLote(
+            negocio="soat",
+            mes_inicio=202402,
+            mes_corte=202406,
+            tipo_analisis="entremes",
+        ),
+    ]
+
+    grupos = lotes.agrupar_extracciones(trabajos)
+    assert [[t.mes_corte for t in grupo] for grupo in grupos] == [
+        [202312],
+        [202312, 202401],
+        [202406],
+    ]
+
+    p = lotes.parametros_trabajo(grupos[1])
+    assert (p.negocio, p.mes_inicio, p.mes_corte) == ("soat", 201901, 202401)
+
+
+@pytest.mark.unit
+def test_correr_grupos_extraccion_fallida(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    def extraer_grupo(grupo: list[TrabajoLote], ruta: str) -> None:
+        if grupo[0].negocio == "soat":
+            raise ValueError("fallo")
+
+    def correr_trabajo(
+        trabajo: TrabajoLote, ruta_raw: str, ruta: str, lote: Lote
+    ) -> lotes.ResultadoTrabajo:
+        return trabajo.model_dump() | {"estado": "completado", "directorio": ruta}
+
+    monkeypatch.setattr(lotes, "extraer_grupo", extraer_grupo)
+    monkeypatch.setattr(lotes, "correr_trabajo", correr_trabajo)
+
+    lote = Lote(
+        trabajos=[
+            TrabajoLote(
+                negocio=negocio,
+                mes_inicio=201901,
+                mes_corte=202312,
+                tipo_analisis="triangulos",
+            )
+            for negocio in ("soat", "autonomia")
+        ]
+    )
+    grupos = lotes.agrupar_extracciones(lote.trabajos)
+    with ThreadPoolExecutor(2) as pool:
+        resultados = [
+            futuro.result()
+            for futuro in lotes.correr_grupos(pool, grupos, str(tmp_path), lote)
+        ]
+
+    assert {r["negocio"]: r["estado"] for r in resultados} == {
+        "autonomia": "completado",
+        "soat": "error",
+    }
+
+
+@pytest.mark.integration
+def test_correr_lote(
+    bases_ficticias: dict[str, pl.LazyFrame], rango_meses: tuple[date, date], tmp_path
+):
+    for archivo, base in bases_ficticias.items():
+        base.collect().write_parquet(f"data/raw/{archivo}.parquet")
+
+    mes_inicio, mes_corte = (utils.date_to_yyyymm(mes) for mes in rango_meses)
+    mes_corte_anterior = utils.mes_anterior_corte(mes_corte)
+    lote = Lote(
+        trabajos=[
+            TrabajoLote(
+                negocio="mock",
+                mes_inicio=mes_inicio,
+                mes_corte=mes,
+                tipo_analisis="triangulos",
+            )
+            for mes in (mes_corte, mes_corte_anterior)
+        ],
+        extraer=False,
+        controles=False,
+    )
+
+    resumen = lotes.correr_lote(lote, str(tmp_path))
+
+    assert resumen.get_column("estado").to_list() == ["completado", "completado"]
+    for directorio, mes in resumen.select(["directorio", "mes_corte"]).iter_rows():
+        assert os.getcwd() != directorio
+        siniestros = pl.read_parquet(f"{directorio}/data/raw/siniestros.parquet")
+        assert (
+            utils.date_to_yyyymm(siniestros.get_column("fecha_registro").max())  # type: ignore
+            <= mes
+        )
+        assert os.path.exists(f"{directorio}/data/processed/base_triangulos.parquet")
+
+    vaciar_directorio("data/raw")
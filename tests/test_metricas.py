@@ -0,0 +1,56 @@
+import asyncio
+
+import polars as pl
+import pytest
+from src import metricas
+from src.models import ModosPlantilla
+
+
+@metricas.instrumentar("prueba_sync")
+def duplicar(df: pl.DataFrame, modos: ModosPlantilla) -> pl.DataFrame:
+    return pl.concat([df, df])
+
+
+@metricas.instrumentar()
+async def contar_async(df: pl.DataFrame) -> None:
+    metricas.reportar(filas_salida=df.height * 3, detalle="detalle")
+
+
+@pytest.mark.unit
+def test_instrumentar(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setattr(metricas, "RUTA_METRICAS", str(tmp_path / "metrics"))
+    df = pl.DataFrame({"a": range(10)})
+    modos = ModosPlantilla(
+        apertura="01_001", atributo="bruto", plantilla="frecuencia", modo="guardar"
+    )
+
+    with metricas.medir("externa"):
+        duplicar(df, modos)
+        assert metricas.leer_metricas().is_empty()
+
+    asyncio.run(contar_async(df))
+
+    resultado = metricas.leer_metricas()
+    assert resultado.get_column("etapa").to_list() == [
+        "prueba_sync",
+        "externa",
+        "tests.test_metricas.contar_async",
+    ]
+    assert resultado.row(0, named=True) | {
+        "apertura": "01_001",
+        "filas_entrada": 10,
+        "filas_salida": 20,
+        "estado": "completado",
+    } == resultado.row(0, named=True)
+    assert resultado.row(2, named=True)["filas_salida"] == 30
+    assert resultado.row(2, named=True)["detalle"] == "detalle"
+    assert resultado.get_column("memoria_pico_mb").min() > 0  # type: ignore
+
+    with pytest.raises(ValueError), metricas.medir("fallida"):
+        raise ValueError
+    assert metricas.leer_metricas().get_column("estado").to_list()[-1] == "error"
+
+    resumen = metricas.resumir_metricas(metricas.leer_metricas())
+    assert resumen.height == 4
+    # Cada guardado queda en su propio archivo
+    assert len(list(tmp_path.glob("metrics/*.parquet"))) == 3
@@ -0,0 +1,32 @@
+import polars as pl
+import pytest
+from src import metricas, perfiles
+from src.configuracion import configuracion
+
+
+def agrupar(lf: pl.LazyFrame) -> pl.DataFrame:
+    return lf.group_by("b").agg(pl.col("a").sum()).pipe(perfiles.recolectar)
+
+
+@pytest.mark.unit
+def test_recolectar(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setattr(perfiles, "RUTA_PERFILES", str(tmp_path))
+    lf = pl.LazyFrame({"a": [1, 2, 3], "b": [1, 1, 2]})
+
+    assert agrupar(lf).sort("b").equals(pl.DataFrame({"b": [1, 2], "a": [3, 3]}))
+    assert perfiles.listar_corridas() == []
+
+    monkeypatch.setattr(configuracion, "perfilar_consultas", True)
+    with metricas.medir("agrupacion"):
+        df = agrupar(lf)
+    assert df.sort("b").equals(pl.DataFrame({"b": [1, 2], "a": [3, 3]}))
+
+    assert perfiles.listar_corridas() == [perfiles.CORRIDA]
+    perfil = perfiles.leer_perfiles(perfiles.CORRIDA)
+    assert perfil.get_column("etapa").unique().to_list() == ["agrupacion"]
+    assert perfil.get_column("consulta")[0].startswith("tests.test_perfiles.agrupar:")
+    assert "AGGREGATE" in perfil.get_column("plan")[0]
+
+    ranking = perfiles.nodos_mas_lentos(perfil)
+    assert "optimization" not in ranking.get_column("nodo").to_list()
+    assert ranking.height == perfil.height - 1
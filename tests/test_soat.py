@@ -2,7 +2,7 @@ import polars as pl
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
-from src import utils
+from src import utils, versiones_raw
 from src.controles_informacion.sap import consolidar_sap
 from src.models import Parametros
 
@@ -45,8 +45,12 @@ async def test_info_soat(client: TestClient, test_session: Session):
 
     mes_corte_dt = utils.yyyymm_to_date(p.mes_corte)
 
-    df_sinis_pre_cuadre = pl.read_parquet("data/raw/siniestros_pre_cuadre.parquet")
-    df_sinis_post_cuadre = pl.read_parquet("data/raw/siniestros_post_cuadre.parquet")
+    df_sinis_pre_cuadre = versiones_raw.leer_version(
+        "siniestros", "pre_cuadre"
+    ).collect()
+    df_sinis_post_cuadre = versiones_raw.leer_version(
+        "siniestros", "post_cuadre"
+    ).collect()
     df_sinis_post_ajustes = pl.read_parquet("data/raw/siniestros.parquet")
 
     df_ajustes_fraude = (
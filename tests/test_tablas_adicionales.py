@@ -0,0 +1,88 @@
+import time
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+import xlsxwriter
+from polars.testing import assert_frame_equal
+from src import espacio_trabajo as et
+from src.configuracion import configuracion
+from src.extraccion import tablas_adicionales, tera_connect
+
+
+@pytest.fixture
+def segmentacion(tmp_path, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setattr(tablas_adicionales, "registro", {})
+    ruta = str(tmp_path / "segmentacion.xlsx")
+    with xlsxwriter.Workbook(ruta) as wb:
+        for hoja, valor in [("add_s_Canales", "A"), ("add_s_SAP", "B")]:
+            wb.add_worksheet(hoja).write_column(0, 0, ["canal", valor])
+    return ruta
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_tablas_adicionales_en_memoria(
+    segmentacion: str, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(configuracion, "adds_segmentacion_excel", False)
+    sap = pl.DataFrame({"canal": ["C"]})
+    tablas_adicionales.registrar("add_s_SAP", sap, segmentacion)
+    tablas_adicionales.registrar("add_s_Nueva", sap, segmentacion)
+
+    adds = await tera_connect.obtener_segmentaciones(segmentacion, "siniestros")
+
+    assert [add.get_column("canal").to_list() for add in adds] == [["A"], ["C"], ["C"]]
+    assert await tera_connect.obtener_segmentaciones(segmentacion, "primas") == []
+
+
+@pytest.mark.unit
+def test_guardar_tabla_adicional_excel(segmentacion: str):
+    sap = pl.DataFrame({"canal": ["C"]})
+    with patch.object(tablas_adicionales, "crear_hoja_segmentacion") as mock_crear:
+        futuro = tablas_adicionales.registrar("add_s_SAP", sap, segmentacion)
+        assert futuro is not None
+        futuro.result()
+
+    mock_crear.assert_called_once_with(sap, "add_s_SAP", segmentacion)
+    assert_frame_equal(
+        tablas_adicionales.leer_hojas(segmentacion, ["add_s_SAP"])["add_s_SAP"], sap
+    )
+
+
+@pytest.mark.unit
+def test_leer_hojas_despues_de_guardar(segmentacion: str):
+    eventos: list[str] = []
+
+    def crear_hoja(*_: object) -> None:
+        time.sleep(0.2)
+        eventos.append("escritura")
+
+    def leer_excel(*args: object, **kwargs: object) -> dict[str, pl.DataFrame]:
+        eventos.append("lectura")
+        return {"add_s_Canales": pl.DataFrame({"canal": ["A"]})}
+
+    with (
+        patch.object(tablas_adicionales, "crear_hoja_segmentacion", crear_hoja),
+        patch("src.extraccion.tablas_adicionales.pl.read_excel", leer_excel),
+    ):
+        tablas_adicionales.registrar("add_s_SAP", pl.DataFrame(), segmentacion)
+        tablas_adicionales.leer_hojas(segmentacion, ["add_s_Canales"])
+
+    assert eventos == ["escritura", "lectura"]
+
+
+@pytest.mark.unit
+def test_limpiar_registro(segmentacion: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(configuracion, "adds_segmentacion_excel", False)
+    sap = pl.DataFrame({"canal": ["C"]})
+    tablas_adicionales.registrar("add_s_SAP", sap, segmentacion)
+    token = et.raiz_actual.set("espacios/otro")
+    try:
+        tablas_adicionales.registrar("add_s_SAP", sap, segmentacion)
+        tablas_adicionales.limpiar_registro()
+        assert tablas_adicionales.hojas_registradas(segmentacion) == []
+    finally:
+        et.raiz_actual.reset(token)
+
+    assert tablas_adicionales.hojas_registradas(segmentacion) == ["add_s_SAP"]
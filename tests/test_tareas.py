@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from src import tareas
+from src.configuracion import configuracion
+from src.models import Parametros
+
+
+def tarea_con_progreso(inicio: threading.Event, continuar: threading.Event) -> str:
+    inicio.set()
+    continuar.wait(5)
+    tareas.reportar_progreso(0.5, "mitad")
+    continuar.wait(5)
+    return "listo"
+
+
+@pytest.mark.unit
+def test_gestor_tareas():
+    gestor = tareas.GestorTareas()
+    inicio, continuar = threading.Event(), threading.Event()
+
+    tarea = gestor.enviar("prueba", "llave", tarea_con_progreso, inicio, continuar)
+    inicio.wait(5)
+    assert tarea.estado == "en_curso"
+
+    # Envios identicos mientras la tarea esta activa se reutilizan
+    assert gestor.enviar("prueba", "llave", tarea_con_progreso).id == tarea.id
+
+    continuar.set()
+    gestor.futuros[tarea.id].result()
+    tarea = gestor.tareas[tarea.id]
+    assert tarea.estado == "completada"
+    assert tarea.progreso == 1
+    assert tarea.resultado == "listo"
+
+    # Una vez terminada, el mismo envio crea una tarea nueva
+    assert gestor.enviar("prueba", "llave", lambda: None).id != tarea.id
+
+
+@pytest.mark.unit
+def test_cancelar_tarea():
+    gestor = tareas.GestorTareas()
+    inicio, continuar = threading.Event(), threading.Event()
+
+    tarea = gestor.enviar("prueba", "llave", tarea_con_progreso, inicio, continuar)
+    inicio.wait(5)
+    gestor.cancelar(tarea.id)
+    continuar.set()
+    gestor.futuros[tarea.id].result()
+
+    assert tarea.estado == "cancelada"
+    assert tarea.progreso == 0
+
+
+@pytest.mark.unit
+def test_error_tarea():
+    async def fallar() -> None:
+        raise ValueError("fallo")
+
+    gestor = tareas.GestorTareas()
+    tarea = gestor.enviar("prueba", "llave", fallar)
+    gestor.futuros[tarea.id].result()
+
+    assert tarea.estado == "error"
+    assert tarea.error == "fallo"
+
+
+@pytest.mark.unit
+def test_llave_tarea_espacios_aislados(monkeypatch: pytest.MonkeyPatch):
+    sesion_1 = Parametros(
+        negocio="autonomia",
+        mes_inicio=201901,
+        mes_corte=202401,
+        tipo_analisis="triangulos",
+        nombre_plantilla="wb_test",
+        session_id="sesion-1",
+    )
+    sesion_2 = sesion_1.model_copy(update={"session_id": "sesion-2"})
+
+    monkeypatch.setattr(configuracion, "espacios_aislados", False)
+    assert tareas.llave_tarea("t", sesion_1) == tareas.llave_tarea("t", sesion_2)
+
+    monkeypatch.setattr(configuracion, "espacios_aislados", True)
+    assert tareas.llave_tarea("t", sesion_1) != tareas.llave_tarea("t", sesion_2)
+
+
+@pytest.mark.unit
+def test_endpoints_tareas(client: TestClient):
+    tarea = tareas.gestor.enviar("prueba", "llave_endpoints", lambda: [1, 2])
+
+    response = client.get(f"/tareas/{tarea.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["estado"] == "completada"
+
+    response = client.get(f"/tareas/{tarea.id}/resultado")
+    assert response.json() == [1, 2]
+
+    response = client.get("/tareas/no_existe")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
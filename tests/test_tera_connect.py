@@ -81,7 +81,7 @@ def test_crear_particiones_fechas(params: Parametros):
     ],
 )
 @patch("src.extraccion.tera_connect.pd.ExcelFile")
-@patch("src.extraccion.tera_connect.pl.read_excel")
+@patch("src.extraccion.tablas_adicionales.pl.read_excel")
 async def test_cargar_segmentaciones(
     mock_read_excel: MagicMock,
     mock_excel_file: MagicMock,
@@ -90,12 +90,14 @@ async def test_cargar_segmentaciones(
 ):
     mock_excel_file.return_value.sheet_names = [hoja_segm]
 
-    mock_read_excel.return_value = pl.DataFrame({"col1": [1, 2, 3]})
+    mock_read_excel.return_value = {hoja_segm: pl.DataFrame({"col1": [1, 2, 3]})}
 
     result = await tera_connect.obtener_segmentaciones("test_file.xlsx", tipo_query)
 
     assert len(result) == 1
-    mock_read_excel.assert_called_once_with("test_file.xlsx", sheet_name=hoja_segm)
+    mock_read_excel.assert_called_once_with(
+        "test_file.xlsx", sheet_id=None, sheet_name=[hoja_segm]
+    )
     mock_excel_file.assert_called_once_with("test_file.xlsx")
 
 
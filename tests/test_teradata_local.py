@@ -0,0 +1,143 @@
+from datetime import date
+from pathlib import Path
+from typing import Literal
+
+import polars as pl
+import pytest
+from src import utils
+from src.configuracion import configuracion
+from src.extraccion import tera_connect, teradata_local
+from src.models import Parametros
+
+from tests import datos_sinteticos as ds
+
+QUERY_SINIESTROS = "tests/benchmarks/queries/siniestros.sql"
+
+
+@pytest.fixture
+def backend_local(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    carpeta = str(tmp_path / "teradata_local")
+    monkeypatch.setattr(configuracion, "teradata_backend", "local")
+    monkeypatch.setattr(configuracion, "teradata_local_ruta", carpeta)
+    return carpeta
+
+
+@pytest.mark.unit
+def test_traducir_query():
+    query = """
+    CREATE MULTISET VOLATILE TABLE fechas AS
+    (
+        SELECT mes_id FROM mdb_seguros_colombia.v_dia
+        WHERE dia_dt >= (DATE '2020-01-01')
+    ) WITH DATA PRIMARY INDEX (mes_id) ON COMMIT PRESERVE ROWS
+    """
+    traducida = " ".join(teradata_local.traducir_query(query).split())
+    assert traducida == (
+        "CREATE TEMP TABLE fechas AS ( SELECT mes_id FROM mdb_seguros_colombia.v_dia "
+        "WHERE dia_dt >= (DATE '2020-01-01') )"
+    )
+
+    assert (
+        teradata_local.traducir_query(
+            "  -- noqa:\nCOLLECT STATISTICS ON fechas INDEX (mes_id)"
+        )
+        == ""
+    )
+
+
+@pytest.mark.unit
+def test_funciones_teradata(backend_local: str):
+    con, _ = teradata_local.conectar()
+    fila = con.execute(
+        teradata_local.traducir_query(
+            """
+            SELECT
+                LAST_DAY(DATE '2024-02-10')
+                , ADD_MONTHS(DATE '2024-01-31', 1)
+                , EXTRACT(MONTH FROM DATE '2024-03-01')
+                , ZEROIFNULL(NULL)
+                , DATE '2024-03-01' - DATE '2024-02-01'
+            """
+        )
+    ).fetchone()
+    assert fila == (date(2024, 2, 29), date(2024, 2, 29), 3, 0, 29)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_ejecutar_queries_local(backend_local: str):
+    esp = ds.EspecificacionDatos(
+        mes_inicio=date(2020, 1, 1), mes_corte=date(2020, 12, 1), semilla=1
+    )
+    tablas = ds.generar_tablas_teradata(esp)
+    teradata_local.cargar_tablas(tablas)
+
+    p = Parametros(
+        negocio="mock",
+        mes_inicio=202001,
+        mes_corte=202012,
+        tipo_analisis="triangulos",
+        nombre_plantilla="plantilla",
+        session_id="local",
+    )
+    queries = tera_connect.reemplazar_parametros_queries(
+        open(QUERY_SINIESTROS).read(), p
+    )
+    df = await tera_connect.ejecutar_queries(
+        queries.split(";"),
+        tera_connect.crear_particiones_fechas(p.mes_inicio, p.mes_corte),
+        [ds.generar_ramos(esp)],
+    )
+
+    assert df.schema["fecha_registro"] == pl.Date
+    assert df.get_column("fecha_registro").min() == utils.yyyymm_to_date(p.mes_inicio)
+    assert df.get_column("pago_bruto").sum() == pytest.approx(
+        tablas["mdb_seguros_colombia.v_siniestros_sinteticos"]
+        .get_column("pago_bruto")
+        .sum()
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+@pytest.mark.parametrize("cantidad", ["siniestros", "primas", "expuestos"])
+async def test_queries_soat_local(
+    backend_local: str, cantidad: Literal["siniestros", "primas", "expuestos"]
+):
+    esp = ds.EspecificacionDatos(
+        mes_inicio=date(2023, 1, 1), mes_corte=date(2024, 6, 1), escala=0.01, semilla=3
+    )
+    tablas = ds.generar_tablas_soat(esp)
+    teradata_local.cargar_tablas(tablas)
+
+    p = Parametros(
+        negocio="soat",
+        mes_inicio=202301,
+        mes_corte=202406,
+        tipo_analisis="triangulos",
+        nombre_plantilla="plantilla",
+        session_id="local",
+    )
+    queries = tera_connect.reemplazar_parametros_queries(
+        open(f"data/queries/soat/{cantidad}.sql").read(), p
+    )
+    segmentaciones = await tera_connect.obtener_segmentaciones(
+        "data/segmentacion_soat.xlsx", cantidad
+    )
+    df = await tera_connect.ejecutar_queries(
+        queries.split(";"),
+        tera_connect.crear_particiones_fechas(p.mes_inicio, p.mes_corte),
+        segmentaciones,
+    )
+
+    assert not df.is_empty()
+    await tera_connect.verificar_resultado_siniestros_primas_expuestos(
+        cantidad, df, p.negocio, p.mes_inicio, p.mes_corte
+    )
+    if cantidad == "siniestros":
+        eventos = tablas["mdb_seguros_colombia.v_evento_siniestro_cobertura"]
+        assert df.get_column("pago_bruto").sum() == pytest.approx(
+            eventos.filter(pl.col("tipo_oper_siniestro_cd") != "130")
+            .get_column("valor_siniestro")
+            .sum()
+        )
@@ -0,0 +1,98 @@
+import os
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from src import versiones_raw
+from src.configuracion import configuracion
+
+
+@pytest.fixture
+def base() -> pl.DataFrame:
+    return pl.DataFrame(
+        {
+            "apertura": ["A", "A", "B", None],
+            "fecha_registro": [1, 2, 1, 1],
+            "valor": [10.0, 20.0, 30.0, 40.0],
+        }
+    )
+
+
+@pytest.mark.unit
+def test_aplicar_cambios(base: pl.DataFrame):
+    diferencias = pl.DataFrame(
+        {
+            "apertura": ["A", "A", "C", None],
+            "fecha_registro": [2, 2, 1, 1],
+            "valor": [1.0, 2.0, 5.0, -40.0],
+        }
+    )
+
+    cambios = versiones_raw.calcular_cambios(base, diferencias)
+    assert_frame_equal(
+        cambios.sort("apertura", nulls_last=True),
+        pl.DataFrame(
+            {
+                "apertura": ["A", "C", None],
+                "fecha_registro": [2, 1, 1],
+                "valor": [23.0, 5.0, 0.0],
+            }
+        ),
+    )
+
+    cuadrada = versiones_raw.aplicar_cambios(base, cambios)
+    # Las filas sin diferencias quedan como estaban
+    assert_frame_equal(cuadrada.head(2), base.filter(pl.col("fecha_registro") == 1)[:2])
+    assert_frame_equal(
+        cuadrada.lazy().pipe(versiones_raw.aplicar_cambios, cambios.lazy()).collect(),
+        cuadrada,
+    )
+    assert cuadrada.get_column("valor").sum() == pytest.approx(
+        base.get_column("valor").sum() + diferencias.get_column("valor").sum()
+    )
+
+
+@pytest.mark.unit
+def test_versiones(base: pl.DataFrame, monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/raw")
+    base.write_parquet("data/raw/siniestros.parquet")
+    base.write_csv("data/raw/siniestros.csv")
+
+    versiones_raw.iniciar_versiones("siniestros")
+    versiones_raw.guardar_version("siniestros", "pre_cuadre")
+    assert os.stat("data/raw/siniestros.parquet").st_nlink == 3
+
+    cambios = pl.DataFrame({"apertura": ["A"], "fecha_registro": [2], "valor": [25.0]})
+    versiones_raw.guardar_version("siniestros", "post_cuadre", cambios)
+    versiones_raw.guardar_version("siniestros", "post_fraude")
+    versiones_raw.materializar("siniestros")
+
+    esperada = versiones_raw.aplicar_cambios(base, cambios)
+    assert_frame_equal(pl.read_parquet("data/raw/siniestros.parquet"), esperada)
+    assert_frame_equal(pl.read_csv("data/raw/siniestros.csv", separator="\t"), esperada)
+    assert_frame_equal(
+        versiones_raw.leer_version("siniestros", "pre_cuadre").collect(), base
+    )
+    assert_frame_equal(
+        versiones_raw.leer_version("siniestros", "post_fraude").collect(), esperada
+    )
+
+
+@pytest.mark.unit
+def test_materializar_sin_csv(
+    base: pl.DataFrame, monkeypatch: pytest.MonkeyPatch, tmp_path
+):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(configuracion, "versiones_raw_csv", False)
+    os.makedirs("data/raw")
+    base.write_parquet("data/raw/siniestros.parquet")
+    base.write_csv("data/raw/siniestros.csv")
+
+    versiones_raw.iniciar_versiones("siniestros")
+    cambios = pl.DataFrame({"apertura": ["A"], "fecha_registro": [2], "valor": [25.0]})
+    versiones_raw.guardar_version("siniestros", "post_cuadre", cambios)
+    versiones_raw.materializar("siniestros")
+
+    # El CSV de la extraccion ya no corresponde a la base
+    assert not os.path.exists("data/raw/siniestros.csv")